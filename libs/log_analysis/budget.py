@@ -0,0 +1,130 @@
+"""
+Plan the analysis of a log to finish within a time budget.
+
+The throughput of the analysis is measured on the beginning of the log, once analyzing every line (`full_speed`)
+and once skipping the high-volume lines (`scan_speed`), because the lines are still read and filtered when they
+are sampled away. The plan is the highest sampling rate of the high-volume lines that fits in the budget.
+If even the lowest rate doesn't fit, only the most recent part of the log is analyzed.
+
+The beginning of the log may not be like the rest of it, so the plan is only a start: while the log is analyzed,
+the `Pacer` re-plans the rate from the measured throughput, and stops at the deadline if even that isn't enough.
+"""
+
+import re
+import time
+
+# The lowest sampling rate of the high-volume lines. Below it, the estimates are mostly noise.
+MIN_RATE = 0.01
+DURATION_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*$")
+DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600}
+# Seconds between the checks of the throughput. The deadline is checked every `CHECK_LINES` lines.
+REPLAN_SECONDS = 0.25
+CHECK_LINES = 1000
+
+
+def parse_duration(value):
+    """Parse a duration like `120s`, `2m`, `1.5h` or `90` (seconds) into seconds."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = DURATION_PATTERN.match(value)
+    if match is None or float(match.group(1)) <= 0:
+        raise ValueError(f"Invalid time budget '{value}', expecting a duration like 120s, 2m or 1h")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def plan(budget: float, size: int, full_speed: float, scan_speed: float, min_rate: float = MIN_RATE):
+    """
+    Plan the analysis of `size` bytes within `budget` seconds.
+
+    Args:
+        budget (float): The seconds left for the analysis.
+        size (int): The bytes to analyze.
+        full_speed (float): Bytes per second analyzing every line.
+        scan_speed (float): Bytes per second when the high-volume lines are skipped.
+        min_rate (float): The lowest sampling rate.
+
+    Returns:
+        tuple: `(rate, fraction)`, analyze the last `fraction` of the bytes and sample the high-volume lines at `rate`.
+    """
+    full_cost = 1 / full_speed
+    # Skipping lines can't be slower than analyzing them, the difference is measurement noise.
+    scan_cost = min(1 / scan_speed, full_cost)
+    if size * full_cost <= budget:
+        return 1.0, 1.0
+    sampled_cost = full_cost - scan_cost
+    if sampled_cost > 0:
+        rate = (budget / size - scan_cost) / sampled_cost
+        if rate >= min_rate:
+            # Rounded down, to keep some margin
+            return int(rate * 1000) / 1000, 1.0
+    fraction = budget / (size * (scan_cost + min_rate * sampled_cost))
+    return min_rate, min(1.0, fraction)
+
+
+class Pacer:
+    """
+    Keep the analysis of `size` bytes of log lines within the `deadline` (of `time.monotonic`), including the time
+    the report takes for the high-volume lines analyzed (`report_speed`, in bytes of log lines per second). The
+    planned speeds are corrected by the measured throughput, and the `sampler` rate is re-planned (see `plan`),
+    never above `max_rate`. Without a sampler, the lines are only stopped at the deadline.
+    """
+
+    def __init__(self, deadline, size, full_speed, scan_speed, report_speed, sampler=None, max_rate=1.0):
+        self.deadline = deadline
+        self.size = size
+        self.sampler = sampler
+        self.max_rate = max_rate
+        self._full_cost = 1 / full_speed
+        self._scan_cost = min(1 / scan_speed, self._full_cost)
+        self._report_cost = 1 / report_speed
+        # The bytes passed, the seconds their report will take, and if the deadline stopped the lines before the end
+        self.bytes = 0
+        self.report_seconds = 0.0
+        self.stopped = False
+        # The lowest and highest rates used
+        rate = 1.0 if sampler is None else sampler.rate
+        self.rates = (rate, rate)
+
+    def lines(self, lines):
+        """Pass the lines until the deadline, re-planning the rate as they're analyzed."""
+        replanned_at, replanned_bytes = time.monotonic(), 0
+        accounted = 0
+        for count, raw in enumerate(lines):
+            if count % CHECK_LINES == 0:
+                self._account(self.bytes - accounted)
+                accounted = self.bytes
+                now = time.monotonic()
+                if now + self.report_seconds >= self.deadline:
+                    self.stopped = True
+                    return
+                if self.sampler is not None and now - replanned_at >= REPLAN_SECONDS:
+                    self._replan(now, now - replanned_at, self.bytes - replanned_bytes)
+                    replanned_at, replanned_bytes = now, self.bytes
+            self.bytes += len(raw)
+            yield raw
+        self._account(self.bytes - accounted)
+
+    def _account(self, passed: int):
+        """Add the time the report takes for the `passed` bytes, analyzed at the current rate."""
+        rate = 1.0 if self.sampler is None else self.sampler.rate
+        self.report_seconds += passed * rate * self._report_cost
+
+    def _replan(self, now: float, seconds: float, analyzed: int):
+        """Re-plan the rate, given the `analyzed` bytes took `seconds` at the current rate."""
+        if analyzed == 0:
+            return
+        rate = self.sampler.rate
+        expected = analyzed * (self._scan_cost + rate * (self._full_cost - self._scan_cost))
+        # How much slower than planned the analysis is
+        slowdown = seconds / expected
+        rate, _ = plan(
+            max(self.deadline - now - self.report_seconds, 0),
+            max(self.size - self.bytes, 1),
+            1 / (self._full_cost * slowdown + self._report_cost),
+            1 / (self._scan_cost * slowdown),
+        )
+        rate = min(rate, self.max_rate)
+        self.sampler.rate = rate
+        self.rates = (min(self.rates[0], rate), max(self.rates[1], rate))
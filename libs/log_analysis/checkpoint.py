@@ -0,0 +1,103 @@
+"""
+Checkpoints for incremental analysis of an append-only log file.
+
+A checkpoint is a folder holding `state.json` and a copy of the rows each item has written so far.
+`state.json` records the log file (inode and a hash of its head), the byte offset analyzed up to,
+the time span of the analyzed lines and the versioned state of every item (see `BaseItem.get_state`).
+The next run restores the items from the checkpoint and only analyzes the bytes appended since.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from libs.log_analysis.decoder import parse_date
+from libs.utils import to_ejson
+
+CHECKPOINT_VERSION = 1
+STATE_FILE = "state.json"
+# The head of the file identifies it, in case it was rotated or rewritten under the same inode.
+HEAD_SIZE = 4096
+
+
+def _head_hash(file_path, size):
+    with open(file_path, "rb") as f:
+        head = f.read(min(size, HEAD_SIZE))
+    return hashlib.blake2b(head, digest_size=16).hexdigest()
+
+
+def _restore_dates(doc):
+    # Only `$date` values are converted back. Other extended JSON values in the state, e.g. in sample
+    # log lines, were kept raw by the decoder and are written out unchanged again.
+    if len(doc) == 1 and "$date" in doc:
+        return parse_date(doc["$date"])
+    return doc
+
+
+class Checkpoint:
+    def __init__(self, folder: str, settings=None):
+        """
+        Args:
+            folder (str): The checkpoint folder.
+            settings (dict): The analysis settings. A checkpoint saved with other settings is not restored.
+        """
+        self._folder = folder if folder.endswith("/") else f"{folder}/"
+        self._settings = settings or {}
+
+    @property
+    def folder(self):
+        return self._folder
+
+    def restore(self, items, log_file: str):
+        """
+        Restore the items from the checkpoint of the log file.
+
+        Returns:
+            tuple: `(offset, log_start, log_end)` to resume from, or None if there is no usable checkpoint.
+                Then the items are left untouched.
+        """
+        state_file = f"{self._folder}{STATE_FILE}"
+        if not os.path.isfile(state_file):
+            return None
+        with open(state_file, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f, object_hook=_restore_dates)
+        if checkpoint.get("version") != CHECKPOINT_VERSION or checkpoint.get("settings") != self._settings:
+            return None
+        stat = os.stat(log_file)
+        log = checkpoint["log"]
+        offset = log["offset"]
+        if stat.st_ino != log["inode"] or stat.st_size < offset or _head_hash(log_file, offset) != log["head"]:
+            # Rotated, truncated or another file. Start over.
+            return None
+        states = checkpoint["items"]
+        for item in items:
+            saved = states.get(item.__class__.__name__, None)
+            if saved is None or saved.get("version") != item.STATE_VERSION:
+                return None
+        for item in items:
+            item.restore_checkpoint(self._folder, states[item.__class__.__name__])
+        return offset, checkpoint.get("log_start", None), checkpoint.get("log_end", None)
+
+    def save(self, items, log_file: str, offset: int, log_start, log_end):
+        """Save the state of the (not finalized) items, which have analyzed the log file up to `offset`."""
+        tmp_folder = f"{self._folder[:-1]}.tmp/"
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        os.makedirs(tmp_folder)
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "settings": self._settings,
+            "log": {
+                "path": os.path.abspath(log_file),
+                "inode": os.stat(log_file).st_ino,
+                "offset": offset,
+                "head": _head_hash(log_file, offset),
+            },
+            "log_start": log_start,
+            "log_end": log_end,
+            "items": {item.__class__.__name__: item.save_checkpoint(tmp_folder) for item in items},
+        }
+        with open(f"{tmp_folder}{STATE_FILE}", "w", encoding="utf-8") as f:
+            f.write(to_ejson(checkpoint, indent=None))
+        # Replace the previous checkpoint only once the new one is complete
+        shutil.rmtree(self._folder, ignore_errors=True)
+        os.rename(tmp_folder, self._folder)
@@ -0,0 +1,283 @@
+"""
+Decode MongoDB JSON log lines.
+
+`bson.json_util.loads` converts every extended JSON value in a line, which means a Python call for each
+nested document, including the large `command` and `locks` documents of slow queries.
+The log items only rely on the `t` timestamp and a few `$numberLong` counters in `attr`,
+so this decoder parses the line with a plain JSON parser and only converts those.
+Other extended JSON values are kept as they are, e.g. `{"$oid": "..."}`. They are written to the output
+files unchanged, which `json_util` reads back to the same values. Items needing the converted values
+of a (rare) line can call `decode_ejson`.
+
+The decoded line is a `LogRecord`, which only decodes the small header of the line right away.
+`attr`, which can be several kilobytes for slow queries, is decoded when an item accesses it.
+Values several items derive from a line, e.g. its minute, are computed once per line by the `get_*` helpers
+and cached in the `LogRecord`. The helpers accept plain dicts as well.
+"""
+
+from datetime import datetime, timedelta, timezone
+import json
+import sys
+from bson import json_util
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+EPOCH = datetime(1970, 1, 1)
+# Marks a derived value of a `LogRecord` not computed yet. None is a valid value.
+_UNSET = object()
+
+
+def loads(raw):
+    """
+    Decode a log line. Only the header fields (`t`, `s`, `c`, `id`, `ctx` and `msg`) are decoded right away,
+    `attr` and the fields after it are decoded when they are accessed for the first time.
+
+    Args:
+        raw (bytes, memoryview or str): The raw log line.
+
+    Returns:
+        LogRecord: The log line with `t` converted to a (naive UTC) datetime
+            and `$numberLong` values in `attr` converted to int.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    elif isinstance(raw, memoryview):
+        raw = raw.tobytes()
+    pos = raw.find(b',"attr":')
+    if pos > 0:
+        try:
+            # Close the header document right before `attr`. Fails if `,"attr":` appears inside a string.
+            header = _parse_json(raw[:pos] + b"}")
+        except ValueError:
+            header = None
+        if isinstance(header, dict):
+            return LogRecord(_convert(header), b"{" + raw[pos + 1 :])
+    log_line = _parse_json(raw)
+    if not isinstance(log_line, dict):
+        raise ValueError("Log line is not a JSON object")
+    return LogRecord(_convert(log_line))
+
+
+def _parse_json(raw):
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # E.g. invalid UTF-8 or integers out of 64-bit range. Let the standard parser decide.
+            pass
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="ignore")
+    return json.loads(raw)
+
+
+def _convert(doc):
+    t = doc.get("t", None)
+    if isinstance(t, dict) and "$date" in t:
+        doc["t"] = parse_date(t["$date"])
+    attr = doc.get("attr", None)
+    if isinstance(attr, dict):
+        for k, v in attr.items():
+            if isinstance(v, dict) and "$numberLong" in v:
+                attr[k] = int(v["$numberLong"])
+    return doc
+
+
+class LogRecord(dict):
+    """
+    A decoded log line. It behaves like a `dict`, but the body of the line (`attr` and the fields after it)
+    stays raw until a field not in the header is accessed. Items that never look at `attr` for a line
+    don't pay for decoding it.
+    """
+
+    __slots__ = ("_raw_body", "_invalid_body", "_epoch_ms", "_minute", "_ns", "_remote_ip", "_slow_op")
+
+    def __init__(self, header, raw_body=None):
+        super().__init__(header)
+        self._raw_body = raw_body
+        self._invalid_body = False
+        self._epoch_ms = _UNSET
+        self._minute = _UNSET
+        self._ns = _UNSET
+        self._remote_ip = _UNSET
+        self._slow_op = _UNSET
+
+    def _load_body(self):
+        # The body stays raw if it's invalid, so every access raises, not only the first one
+        try:
+            body = _parse_json(self._raw_body)
+        except ValueError:
+            self._invalid_body = True
+            raise
+        if not isinstance(body, dict):
+            self._invalid_body = True
+            raise ValueError("Log line is not a JSON object")
+        self._raw_body = None
+        body = _convert(body)
+        for k, v in body.items():
+            if not dict.__contains__(self, k):
+                dict.__setitem__(self, k, v)
+
+    @property
+    def invalid_body(self):
+        """If decoding the body failed, e.g. a truncated line. Accessing the body raises ValueError then."""
+        return self._invalid_body
+
+    def __missing__(self, key):
+        if self._raw_body is None:
+            raise KeyError(key)
+        self._load_body()
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if self._raw_body is not None and not dict.__contains__(self, key):
+            self._load_body()
+        return dict.get(self, key, default)
+
+    def __contains__(self, key):
+        if self._raw_body is not None and not dict.__contains__(self, key):
+            self._load_body()
+        return dict.__contains__(self, key)
+
+    def __len__(self):
+        if self._raw_body is not None:
+            self._load_body()
+        return dict.__len__(self)
+
+    def __iter__(self):
+        if self._raw_body is not None:
+            self._load_body()
+        return dict.__iter__(self)
+
+    def __eq__(self, other):
+        for record in (self, other):
+            if isinstance(record, LogRecord) and record._raw_body is not None:
+                record._load_body()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        for record in (self, other):
+            if isinstance(record, LogRecord) and record._raw_body is not None:
+                record._load_body()
+        return dict.__ne__(self, other)
+
+    def __repr__(self):
+        if self._raw_body is not None:
+            self._load_body()
+        return dict.__repr__(self)
+
+    def keys(self):
+        if self._raw_body is not None:
+            self._load_body()
+        return dict.keys(self)
+
+    def values(self):
+        if self._raw_body is not None:
+            self._load_body()
+        return dict.values(self)
+
+    def items(self):
+        # Also used by `json.dumps` to serialize `dict` subclasses
+        if self._raw_body is not None:
+            self._load_body()
+        return dict.items(self)
+
+    def copy(self):
+        if self._raw_body is not None:
+            self._load_body()
+        return dict.copy(self)
+
+    def __reduce__(self):
+        # Keep the body raw when pickled, e.g. sent back from a worker process
+        return (self.__class__, (dict(dict.items(self)), self._raw_body))
+
+
+def cached(log_line, slot, compute):
+    """
+    The value `compute(log_line)`, computed once per `LogRecord` and kept in its `slot`.
+    Other log lines, e.g. plain dicts, compute it every time.
+    """
+    if not isinstance(log_line, LogRecord):
+        return compute(log_line)
+    value = getattr(log_line, slot)
+    if value is _UNSET:
+        value = compute(log_line)
+        setattr(log_line, slot, value)
+    return value
+
+
+def _utc_time(log_line):
+    t = log_line.get("t", None)
+    if not isinstance(t, datetime):
+        return None
+    if t.tzinfo is not None:
+        t = t.astimezone(timezone.utc).replace(tzinfo=None)
+    return t
+
+
+def _epoch_ms(log_line):
+    t = _utc_time(log_line)
+    return None if t is None else (t - EPOCH) // timedelta(milliseconds=1)
+
+
+def _minute(log_line):
+    t = _utc_time(log_line)
+    return None if t is None else t.replace(second=0, microsecond=0)
+
+
+def _namespace(log_line):
+    ns = log_line.get("attr", {}).get("ns", None)
+    return sys.intern(ns) if isinstance(ns, str) else None
+
+
+def _remote_ip(log_line):
+    remote = log_line.get("attr", {}).get("remote", None)
+    return sys.intern(remote.split(":")[0]) if isinstance(remote, str) else None
+
+
+def get_epoch_ms(log_line):
+    """The timestamp of the log line in milliseconds since the epoch, or None if it has no timestamp."""
+    return cached(log_line, "_epoch_ms", _epoch_ms)
+
+
+def get_minute(log_line):
+    """The start of the minute of the log line, as a naive UTC datetime, or None if it has no timestamp."""
+    return cached(log_line, "_minute", _minute)
+
+
+def get_namespace(log_line, default=None):
+    """The (interned) namespace `attr.ns` of the log line."""
+    ns = cached(log_line, "_ns", _namespace)
+    return default if ns is None else ns
+
+
+def get_remote_ip(log_line, default=None):
+    """The (interned) IP address of the client `attr.remote` of the log line."""
+    ip = cached(log_line, "_remote_ip", _remote_ip)
+    return default if ip is None else ip
+
+
+def parse_date(value):
+    """Convert the value of an extended JSON `$date` to a naive UTC datetime, the same as `json_util`."""
+    if isinstance(value, str):
+        # `datetime.fromisoformat` doesn't accept the `Z` suffix before Python 3.11
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        dt = datetime.fromisoformat(value)
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return dt
+    if isinstance(value, dict):
+        value = value["$numberLong"]
+    return EPOCH + timedelta(milliseconds=int(value))
+
+
+def decode_ejson(obj):
+    """Convert all extended JSON values in the decoded object, the same way `json_util.loads` does."""
+    if isinstance(obj, dict):
+        return json_util.object_hook({k: decode_ejson(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return [decode_ejson(v) for v in obj]
+    return obj
@@ -0,0 +1,53 @@
+"""Route log lines to the log items interested in them."""
+
+
+class Dispatcher:
+    """
+    Route each log line only to the items that declared interest in its log id (`LOG_IDS`)
+    or its severity (`SEVERITIES`). Items declaring neither receive every line.
+    The routing result is cached per `(id, severity)` pair, so each line costs a single dict lookup.
+    """
+
+    def __init__(self, items):
+        self._items = list(items)
+        self._by_id = {}
+        self._by_severity = {}
+        self._wildcard = []
+        for item in self._items:
+            log_ids = getattr(item, "LOG_IDS", None)
+            severities = getattr(item, "SEVERITIES", None)
+            if log_ids is None and severities is None:
+                self._wildcard.append(item)
+                continue
+            for log_id in log_ids or []:
+                self._by_id.setdefault(log_id, []).append(item)
+            for severity in severities or []:
+                self._by_severity.setdefault(severity, []).append(item)
+        self._routes = {}
+
+    @property
+    def log_ids(self):
+        """All log ids any item is interested in."""
+        return set(self._by_id.keys())
+
+    @property
+    def severities(self):
+        """All severities any item is interested in."""
+        return set(self._by_severity.keys())
+
+    @property
+    def has_wildcard(self):
+        """Whether any item needs to see every log line."""
+        return len(self._wildcard) > 0
+
+    def route(self, log_id, severity):
+        """Return the items that should analyze a line with the given id and severity, in logset order."""
+        key = (log_id, severity)
+        items = self._routes.get(key, None)
+        if items is None:
+            interested = set(self._wildcard)
+            interested.update(self._by_id.get(log_id, []))
+            interested.update(self._by_severity.get(severity, []))
+            items = tuple(item for item in self._items if item in interested)
+            self._routes[key] = items
+        return items
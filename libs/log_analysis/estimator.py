@@ -0,0 +1,38 @@
+"""
+Estimates of the counters and sums of the items when the log lines are sampled (see `Sampler`).
+
+A line kept with probability `p` stands for `1 / p` lines (Horvitz-Thompson estimator). The variance of every
+estimate is accumulated in the `variance` field of the document holding it, assuming the lines are sampled
+independently. Both are sums, so the estimates of partial results are merged by adding them up.
+Nothing is added to the documents when the lines aren't sampled.
+"""
+
+import math
+
+# The z-score of a two-sided 95% confidence interval
+Z_95 = 1.96
+
+
+def add_sample(doc, key, value, probability: float = 1.0):
+    """Add a sampled value, kept with `probability`, to the estimated total `doc[key]`."""
+    if probability >= 1.0:
+        doc[key] += value
+        return
+    doc[key] += value / probability
+    variance = doc.setdefault("variance", {})
+    variance[key] = variance.get(key, 0) + value * value * (1 - probability) / (probability * probability)
+
+
+def merge_estimates(doc, other, keys):
+    """Add the estimates `keys` of `other` and their variances to `doc`."""
+    for key in keys:
+        doc[key] += other[key]
+    if "variance" in other:
+        variance = doc.setdefault("variance", {})
+        for key, value in other["variance"].items():
+            variance[key] = variance.get(key, 0) + value
+
+
+def margin(doc, key):
+    """The half width of the 95% confidence interval of the estimate `doc[key]`. 0 if it's exact."""
+    return Z_95 * math.sqrt(doc.get("variance", {}).get(key, 0))
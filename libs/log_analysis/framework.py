@@ -1,22 +1,201 @@
+import bisect
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
-import random
 import re
+import shutil
+import signal
+import threading
+import time
 from pathlib import Path
 import logging
 import markdown
-from bson import json_util
+from libs.log_analysis import budget, decoder, query_analyzer
+from libs.log_analysis.checkpoint import Checkpoint
+from libs.log_analysis.dispatcher import Dispatcher
+from libs.log_analysis.line_filter import LineFilter
+from libs.log_analysis.log_index import IndexBuilder, LogIndex, file_key
+from libs.log_analysis.reader import (
+    MappedLog,
+    detect_compression,
+    estimate_size,
+    first_timestamp,
+    filter_time,
+    follow_lines,
+    merge_lines,
+    read_window,
+    resolve_log_files,
+    split_ranges,
+    time_window,
+)
+from libs.log_analysis.sampler import Sampler
 from libs.healthcheck.shared import to_json
 from libs.utils import load_classes, bold, green, yellow, cyan, get_script_path, env
 
 logger = logging.getLogger(__name__)
 LOG_CLASSES = load_classes("libs.log_analysis.log_items")
+# The throughput of the analysis is measured for this long, or this share of the time budget if it's shorter.
+PROBE_SECONDS = 5
+PROBE_SHARE = 0.05
+# The share of the time budget kept for finalizing the items and writing the report. The report of the high-volume
+# lines, which depends on the sampling rate, is planned with the analysis (see `budget.Pacer`).
+REPORT_SHARE = 0.2
+
+
+def _create_items(item_names, item_configs, batch_folder, sampler=None):
+    items = [LOG_CLASSES[name](batch_folder, item_configs.get(name, {})) for name in item_names]
+    for item in items:
+        item.sampler = sampler
+    return items
+
+
+def _ingest(items, lines, sampler=None, tick=None):
+    """
+    Pass the raw log lines to the items for analysis. Only the lines kept by the `sampler` are analyzed, if any.
+    `lines` can yield None while waiting for new lines (see `follow_lines`). Then `tick` is called
+    with the first and the last log line seen so far.
+
+    Returns:
+        tuple: The timestamps of the first and the last parsed log line.
+    """
+    first = None
+    log_line = None
+    last_raw = None
+    counter = 0
+    dispatcher = Dispatcher(items)
+    line_filter = LineFilter.from_dispatcher(dispatcher)
+    for raw in lines:
+        if raw is None:
+            if tick is not None and first is not None:
+                if last_raw is not None:
+                    log_line = _parse_line(last_raw) or log_line
+                    last_raw = None
+                tick(first, log_line)
+            continue
+        counter += 1
+        if counter % 10000 == 0:
+            logger.info("%s lines ingested...", green(counter))
+        # Sampling for dealing with large log files. Rare lines are always kept (see `Sampler`).
+        if sampler is not None and not sampler.keep(raw):
+            continue
+        last_raw = raw
+        # Only decode the lines some item is interested in. The first line is always decoded for the start time.
+        if first is not None and not line_filter.accepts(raw):
+            continue
+        log_line = _parse_line(raw)
+        if log_line is None:
+            continue
+        last_raw = None
+        if first is None:
+            first = log_line.get("t", None)
+        for item in dispatcher.route(log_line.get("id", None), log_line.get("s", None)):
+            try:
+                item.analyze(log_line)
+            except Exception as e:
+                # The body is decoded by the first item reading it. If it's invalid, the items after it would fail
+                # on the line as well, or count it as is. Skip the line for them.
+                if log_line.invalid_body:
+                    _warn_unparsed(raw)
+                    break
+                logger.warning(yellow(f"Log analysis item '{item.name}' failed: {e}"))
+                continue
+    if last_raw is not None:
+        # The last line was skipped by the filter. Decode it for the end time.
+        log_line = _parse_line(last_raw) or log_line
+    last = None
+    if log_line is not None:
+        last = log_line.get("t", None)
+        for item in items:
+            try:
+                item.end_of_log(log_line)
+            except Exception as e:
+                logger.warning(yellow(f"Log analysis item '{item.name}' failed: {e}"))
+    return first, last
+
+
+def _limit_lines(lines, stats, deadline=None, count=None):
+    """
+    Pass the lines until the `deadline` (of `time.monotonic`) or until `count` lines are passed.
+    The number of lines and bytes passed are counted in `stats`.
+    """
+    for raw in lines:
+        if count is not None and stats["lines"] >= count:
+            return
+        if deadline is not None and stats["lines"] % 1000 == 0 and time.monotonic() >= deadline:
+            return
+        stats["lines"] += 1
+        stats["bytes"] += len(raw)
+        yield raw
+
+
+def _parse_line(raw):
+    try:
+        return decoder.loads(raw)
+    except Exception:
+        _warn_unparsed(raw)
+        return None
+
+
+def _warn_unparsed(raw):
+    line = bytes(raw).decode("utf-8", errors="ignore")
+    logger.warning(yellow(f"Failed to parse log line as JSON: {line.strip()}"))
+
+
+def _parse_time(value):
+    if value is None:
+        return None
+    try:
+        return decoder.parse_date(value)
+    except ValueError as e:
+        raise ValueError(f"Invalid time '{value}', expecting ISO 8601 like 2025-09-25T21:00:00Z") from e
+
+
+def _ingest_range(task):
+    """
+    Worker process entry. Analyze one byte range and return the partial (not finalized) items, the pacer
+    of the time budget if any, and the part of the log index built from the range if the file has no index yet
+    (`index_key` is its `file_key`). The deadline of the time budget is sent as a time of the wall clock.
+    """
+    item_names, item_configs, part_folder, log_file, start, end, since, until, offsets, index_key, sampler, pace = task
+    Path(part_folder).mkdir(parents=True, exist_ok=True)
+    items = _create_items(item_names, item_configs, part_folder, sampler)
+    lines = read_window(log_file, since, until, start, end, offsets)
+    indexer = None
+    if index_key is not None:
+        indexer = IndexBuilder(index_key, start)
+        lines = indexer.lines(lines)
+    pacer = None
+    if pace is not None:
+        deadline, full_speed, scan_speed, report_speed, max_rate = pace
+        deadline = time.monotonic() + deadline - time.time()
+        pacer = budget.Pacer(deadline, end - start, full_speed, scan_speed, report_speed, sampler, max_rate)
+        lines = pacer.lines(lines)
+    first, last = _ingest(items, lines, sampler)
+    return items, first, last, pacer, indexer
+
+
+def _describe_coverage(part: str, rates):
+    """Describe the `part` of the log analyzed with the lowest and highest sampling `rates`."""
+    low, high = rates
+    if low >= 1.0:
+        return "all the log lines" if part == "the whole log" else f"{part}, with every line analyzed"
+    sampled = f"{low:.1%}" if low == high else f"{low:.1%} to {high:.1%}"
+    return f"{part}, with {sampled} of the high-volume log lines sampled"
 
 
 class Framework:
     _logset_name = ""
 
-    def __init__(self, file_path: str, config: dict):
-        self._file_path = file_path
+    def __init__(self, file_path, config: dict):
+        # `file_path` can be a file, a directory or a glob pattern, or a list of them.
+        self._file_path = file_path if isinstance(file_path, str) else ", ".join(file_path)
+        self._log_files = resolve_log_files(file_path)
+        if len(self._log_files) == 0:
+            raise FileNotFoundError(f"No log file found in: {self._file_path}")
+        # Only analyze the log lines in the time window `[since, until)`
+        self._since = _parse_time(config.get("since", None))
+        self._until = _parse_time(config.get("until", None))
+        # Seconds the analysis should finish in, if any
+        self._time_budget = budget.parse_duration(config.get("time_budget", None))
         self._config = config
         self._logger = logging.getLogger(__name__)
         self._items = []
@@ -25,6 +204,17 @@ class Framework:
         self._logger.debug(to_json(self._config))
         self._log_start = None
         self._log_end = None
+        # Log file -> (LogIndex, offsets of the lines to read), when `index` is enabled
+        self._indexes = {}
+        # Log file -> the `IndexBuilder` of the index built while the file is analyzed, when it has none yet
+        self._indexers = {}
+        # Log file -> the byte range to read at most, when resuming from a checkpoint or within a time budget
+        self._ranges = {}
+        # What part of the log was analyzed, when it's not all of it because of the time budget
+        self._coverage = None
+        # The deadline (of `time.monotonic`) of the analysis within the time budget, the bytes to analyze, the speeds
+        # of a job and of the report (see `budget.Pacer`) and the highest sampling rate, when there is a time budget
+        self._pace = None
         if env == "development":
             self._logger.info(yellow("Running in development mode."))
 
@@ -37,6 +227,7 @@ class Framework:
         return batch_folder
 
     def run_logs_analysis(self, logset_name: str, *args, **kwargs):
+        started = time.monotonic()
         self._logset_name = logset_name
         # Create output folder if it doesn't exist
         output_folder = kwargs.get("output_folder", "output/")
@@ -51,67 +242,432 @@ class Framework:
         ls = logsets[logset_name]
         self._logger.info("Running log checkset: %s", bold(cyan(logset_name)))
 
-        self._items = []
+        item_names = []
         for item_name in ls.get("items", []):
-            item_cls = LOG_CLASSES.get(item_name)
-            if not item_cls:
+            if not LOG_CLASSES.get(item_name):
                 self._logger.warning(yellow(f"Log item '{item_name}' not found. Skipping."))
                 continue
-            # The config for the item can be specified in the `item_config` section, under the item class name.
-            item_config = self._config.get("item_config", {}).get(item_name, {})
-            item = item_cls(batch_folder, item_config)
-            self._items.append(item)
-            self._logger.info("Log analyze item loaded: %s", bold(cyan(item_name)))
-        log_file = self._file_path
-        rate = self._config.get("sample_rate", 1.0)
-        # Read the log file line by line and pass each line to the log items for analysis
-        log_line = None
-        with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
-            counter = 0
-            for line in f:
-                counter += 1
-                if counter % 10000 == 0:
-                    self._logger.info("%s lines ingested...", green(counter))
-                # Sampling based on the rate. For dealing with large log files.
-                if random.random() > rate:
-                    continue
-                try:
-                    log_line = json_util.loads(line)
-                    if self._log_start is None:
-                        self._log_start = log_line.get("t", None)
-                    for item in self._items:
-                        try:
-                            item.analyze(log_line)
-                        except Exception as e:
-                            self._logger.warning(yellow(f"Log analysis item '{item.name}' failed: {e}"))
-                            continue
-                except Exception:
-                    self._logger.warning(yellow(f"Failed to parse log line as JSON: {line.strip()}"))
-                    continue
-        self._log_end = log_line.get("t", None) if log_line else None
+            item_names.append(item_name)
+        # The config for the item can be specified in the `item_config` section, under the item class name.
+        item_configs = self._config.get("item_config", {})
+        sampler = Sampler.from_config(self._config)
+        self._items = _create_items(item_names, item_configs, batch_folder, sampler)
         for item in self._items:
+            self._logger.info("Log analyze item loaded: %s", bold(cyan(item.__class__.__name__)))
+        jobs = max(1, self._config.get("jobs", 1))
+        # Following and checkpoints need a single plain log file
+        single_plain_file = len(self._log_files) == 1
+        for log_file in self._log_files:
+            compression = detect_compression(log_file)
+            if compression is not None:
+                single_plain_file = False
+                self._logger.info("Decompressing %s log file on the fly: %s", bold(cyan(compression)), log_file)
+        if len(self._log_files) > 1:
+            self._logger.info("Merging %s log files by timestamp.", green(len(self._log_files)))
+        if self._since is not None or self._until is not None:
+            since, until = self._window()
+            self._logger.info("Only analyzing the log lines from %s to %s.", green(since), green(until))
+        follow = self._config.get("follow", False)
+        if follow and not single_plain_file:
+            self._logger.warning(yellow("Only a single uncompressed log file can be followed. Analyzing it once."))
+            follow = False
+        if follow:
+            self._follow(batch_folder, sampler, kwargs.get("fmt", "html"))
+        else:
+            if self._config.get("index", False):
+                self._load_indexes()
+            checkpoint = None
+            if self._config.get("checkpoint", False):
+                if not single_plain_file:
+                    self._logger.warning(
+                        yellow("Only a single uncompressed log file can be checkpointed. Analyzing it in full.")
+                    )
+                else:
+                    checkpoint = self._restore_checkpoint(output_folder, logset_name, item_configs)
+            if self._time_budget is not None:
+                if checkpoint is not None:
+                    self._logger.warning(yellow("The time budget is ignored when resuming from a checkpoint."))
+                else:
+                    remaining = self._time_budget * (1 - REPORT_SHARE) - (time.monotonic() - started)
+                    fmt = kwargs.get("fmt", "html")
+                    sampler = self._plan_time_budget(
+                        item_names, item_configs, batch_folder, jobs, sampler, remaining, fmt
+                    )
+                    for item in self._items:
+                        item.sampler = sampler
+            if jobs == 1 or not self._run_parallel(item_names, item_configs, batch_folder, jobs, sampler):
+                lines = merge_lines(
+                    self._log_files, self._since, self._until, self._indexes, self._ranges, self._indexers
+                )
+                pacer = None
+                if self._pace is not None:
+                    deadline, size, full_speed, scan_speed, report_speed, max_rate = self._pace
+                    pacer = budget.Pacer(deadline, size, full_speed, scan_speed, report_speed, sampler, max_rate)
+                    lines = pacer.lines(lines)
+                first, last = _ingest(self._items, lines, sampler)
+                if pacer is not None:
+                    self._reach_coverage([pacer])
+                if self._log_start is None:
+                    self._log_start = first
+                if last is not None:
+                    self._log_end = last
+                shape_cache = query_analyzer.shape_cache
+                self._logger.debug("Query shape cache: %s hits, %s misses.", shape_cache.hits, shape_cache.misses)
+            self._save_indexes()
+            if checkpoint is not None:
+                log_file = self._log_files[0]
+                checkpoint.save(self._items, log_file, self._ranges[log_file][1], self._log_start, self._log_end)
+                self._logger.info("Checkpoint saved: %s", green(checkpoint.folder))
+        self._finalize_items(self._items)
+
+    def _restore_checkpoint(self, output_folder, logset_name, item_configs):
+        """
+        Restore the items from the checkpoint of the previous run, and limit the log file to the complete lines
+        appended since. The checkpoint is only used if the log file, the checkset and the settings are the same.
+        """
+        log_file = self._log_files[0]
+        settings = {
+            "logset": logset_name,
+            "item_config": item_configs,
+            "since": self._since,
+            "until": self._until,
+            "sample_rate": self._config.get("sample_rate", 1.0),
+            "sampled_ids": self._config.get("sampled_ids", None),
+            "sample_seed": self._config.get("sample_seed", 0),
+        }
+        checkpoint = Checkpoint(f"{output_folder}{logset_name}-checkpoint/", settings)
+        with MappedLog(log_file) as log:
+            # A line still being written is analyzed in the next run.
+            end = log.complete_end()
+        restored = checkpoint.restore(self._items, log_file)
+        if restored is None:
+            self._logger.info("No usable checkpoint found. Analyzing the whole log file.")
+            start = 0
+        else:
+            start, self._log_start, self._log_end = restored
+            self._logger.info("Resuming from the checkpoint at byte %s of the log file.", green(start))
+        self._ranges[log_file] = (start, max(start, end))
+        return checkpoint
+
+    def _plan_time_budget(self, item_names, item_configs, batch_folder, jobs, sampler, remaining, fmt):
+        """
+        Measure the throughput on the beginning of the log and plan the analysis to finish within the time budget
+        (see `budget.plan`). The older log files, or the older part of the log, may be left out. The rate is
+        re-planned while the log is analyzed (see `budget.Pacer`).
+
+        Returns:
+            Sampler: The sampler of the planned rate, or `sampler` if it already samples at a lower rate.
+        """
+        probe_seconds = min(PROBE_SECONDS, self._time_budget * PROBE_SHARE)
+        self._logger.info("Measuring the analysis throughput for %s seconds...", green(round(probe_seconds, 1)))
+        probe_started = time.monotonic()
+        speeds = self._probe(item_names, item_configs, batch_folder, probe_seconds, fmt)
+        if speeds is None:
+            return sampler
+        full_speed, scan_speed, report_speed = speeds
+        now = time.monotonic()
+        remaining = max(remaining - (now - probe_started), 0)
+        # Files in time order, with the bytes to analyze in each
+        log_files = self._log_files
+        if len(log_files) > 1:
+            starts = {log_file: first_timestamp(log_file) for log_file in log_files}
+            log_files = sorted(log_files, key=lambda f: starts[f] or datetime.min)
+        windows = {}
+        for log_file in log_files:
+            if detect_compression(log_file) is None:
+                index, _ = self._indexes.get(log_file, (None, None))
+                windows[log_file] = time_window(log_file, self._since, self._until, index)
+        sizes = {
+            log_file: windows[log_file][1] - windows[log_file][0] if log_file in windows else estimate_size(log_file)
+            for log_file in log_files
+        }
+        size = sum(sizes.values())
+        # The report is written by a single process
+        analysis_speed = 1 / (1 / (full_speed * jobs) + 1 / report_speed)
+        rate, fraction = budget.plan(remaining, size, analysis_speed, scan_speed * jobs)
+        max_rate = 1.0 if sampler is None else sampler.rate
+        self._pace = (now + remaining, int(size * fraction), full_speed, scan_speed, report_speed, max_rate)
+        self._coverage = "the whole log"
+        if rate >= 1.0:
+            self._logger.info("The whole log can be analyzed within the time budget.")
+            return sampler
+        if fraction < 1.0:
+            # Leave out the oldest bytes. Compressed files can't be cut, they're analyzed or left out as a whole.
+            skip = int(sum(sizes.values()) * (1 - fraction))
+            for log_file in log_files:
+                if skip <= 0:
+                    break
+                if skip >= sizes[log_file]:
+                    self._log_files.remove(log_file)
+                elif log_file in windows:
+                    start, end = windows[log_file]
+                    with MappedLog(log_file) as log:
+                        self._ranges[log_file] = (log.line_start(start + skip), end)
+                skip -= sizes[log_file]
+            self._coverage = f"the most recent {fraction:.1%} of the log"
+        if sampler is None or rate < sampler.rate:
+            sampler = Sampler(rate, self._config.get("sampled_ids", None), self._config.get("sample_seed", 0))
+        coverage = _describe_coverage(self._coverage, (sampler.rate, sampler.rate))
+        self._logger.info("To finish within the time budget, analyzing %s.", green(coverage))
+        return sampler
+
+    def _reach_coverage(self, pacers):
+        """Describe the part of the log the `pacers` of the byte ranges actually let through, and how sampled."""
+        rates = (min(pacer.rates[0] for pacer in pacers), max(pacer.rates[1] for pacer in pacers))
+        if any(pacer.stopped for pacer in pacers):
+            analyzed = min(1.0, sum(pacer.bytes for pacer in pacers) / max(sum(pacer.size for pacer in pacers), 1))
+            self._coverage = f"{analyzed:.1%} of {self._coverage}, stopped at the time budget"
+            self._logger.warning(yellow(f"The time budget ran out before the end of the log, analyzed {analyzed:.1%}."))
+        self._coverage = _describe_coverage(self._coverage, rates)
+
+    def _probe(self, item_names, item_configs, batch_folder, seconds, fmt):
+        """
+        Analyze the beginning of the log with throwaway items, first every line for half of `seconds`, then the same
+        lines without the high-volume ones (see `Sampler`). The report of both is written in `fmt`, the difference
+        is the time the report of the high-volume lines takes.
+
+        Returns:
+            tuple: The throughputs `(full_speed, scan_speed, report_speed)` in bytes of log lines per second,
+                or None if the log is empty.
+        """
+        probe_folder = f"{batch_folder}probe/"
+        Path(probe_folder).mkdir(parents=True, exist_ok=True)
+
+        def measure(stats, sampler, deadline=None, count=None):
+            items = _create_items(item_names, item_configs, probe_folder)
+            lines = merge_lines(self._log_files, self._since, self._until, self._indexes)
+            probe_started = time.monotonic()
+            _ingest(items, _limit_lines(lines, stats, deadline, count), sampler)
+            ingest_seconds = time.monotonic() - probe_started
+            if stats["bytes"] == 0:
+                for item in items:
+                    item.close()
+                return ingest_seconds, 0
+            report_started = time.monotonic()
+            self._finalize_items(items)
+            self._write_report(items, probe_folder, fmt, announce=False)
+            return ingest_seconds, time.monotonic() - report_started
+
+        try:
+            full, scan = {"lines": 0, "bytes": 0}, {"lines": 0, "bytes": 0}
+            full_seconds, full_report = measure(full, None, deadline=time.monotonic() + seconds / 2)
+            if full["bytes"] == 0:
+                return None
+            sampler = Sampler(0.0, self._config.get("sampled_ids", None))
+            scan_seconds, scan_report = measure(scan, sampler, count=full["lines"])
+        finally:
+            shutil.rmtree(probe_folder, ignore_errors=True)
+        seconds = (full_seconds, scan_seconds, full_report - scan_report)
+        return tuple(full["bytes"] / max(value, 1e-6) for value in seconds)
+
+    def _load_indexes(self):
+        """
+        Load the sidecar index of every plain log file. Each file is mapped to its index and the offsets of the
+        lines the items need. A file with no index, or an outdated one, is indexed while it's analyzed instead
+        (see `_save_indexes`), so it's only read once.
+        """
+        dispatcher = Dispatcher(self._items)
+        for log_file in self._log_files:
+            if detect_compression(log_file) is not None:
+                continue
+            index = LogIndex.load(log_file)
+            if index is None:
+                self._indexers[log_file] = IndexBuilder(file_key(log_file))
+                continue
+            self._logger.info("Using the index of the log file: %s", green(LogIndex.index_path(log_file)))
+            offsets = None
+            if not dispatcher.has_wildcard:
+                offsets = index.offsets(dispatcher.log_ids, dispatcher.severities)
+            self._indexes[log_file] = (index, offsets)
+
+    def _save_indexes(self):
+        """
+        Save the indexes built while the log files were analyzed. The index of a file that wasn't read in full,
+        e.g. because of the time window or the time budget, is built by reading the file again.
+        """
+        for log_file, indexer in self._indexers.items():
+            if indexer.complete:
+                index = indexer.index()
+            else:
+                self._logger.info("Building the index of the log file: %s", green(LogIndex.index_path(log_file)))
+                index = LogIndex.build(log_file)
+            try:
+                index.save(log_file)
+            except OSError as e:
+                self._logger.warning(yellow(f"Failed to save the log index: {e}"))
+                continue
+            self._logger.info("Log index saved: %s", green(LogIndex.index_path(log_file)))
+
+    def _finalize_items(self, items):
+        for item in items:
             try:
                 item.finalize_analysis()
             except Exception as e:
                 self._logger.warning(yellow(f"Log analysis item '{item.name}' finalize failed: {e}"))
                 continue
 
+    def _follow(self, batch_folder, sampler, fmt):
+        """
+        Keep analyzing the lines appended to the log file until interrupted (Ctrl+C).
+        The report is refreshed at the configured interval from snapshots of the items,
+        so the lines already analyzed are never read again.
+        """
+        interval = self._config.get("refresh_interval", 60)
+        snapshot_folder = f"{batch_folder}snapshot/"
+        stop = threading.Event()
+        last_refresh = None
+
+        def refresh(first, log_line):
+            # The first report is written as soon as the existing lines are analyzed, or within a second if that
+            # takes longer. Then it's refreshed every interval, even if the log never pauses (see `follow_lines`).
+            nonlocal last_refresh
+            if last_refresh is not None and time.monotonic() - last_refresh < interval:
+                return
+            last_refresh = time.monotonic()
+            Path(snapshot_folder).mkdir(parents=True, exist_ok=True)
+            items = [item.snapshot(snapshot_folder) for item in self._items]
+            for item in items:
+                item.end_of_log(log_line)
+            self._finalize_items(items)
+            self._log_start, self._log_end = first, log_line.get("t", None)
+            self._write_report(items, batch_folder, fmt)
+
+        self._logger.info(
+            "Following the log file. The report is refreshed every %s seconds. Press %s to stop.",
+            green(interval),
+            bold("Ctrl+C"),
+        )
+        handler = signal.signal(signal.SIGINT, lambda *args: stop.set())
+        try:
+            lines = follow_lines(self._log_files[0], min(1.0, interval), stop)
+            if self._since is not None or self._until is not None:
+                # Following stops at the end of the time window
+                lines = filter_time(lines, self._since, self._until)
+            self._log_start, self._log_end = _ingest(self._items, lines, sampler, tick=refresh)
+        finally:
+            signal.signal(signal.SIGINT, handler)
+            shutil.rmtree(snapshot_folder, ignore_errors=True)
+        self._logger.info("Stopped following the log file.")
+
+    def _run_parallel(self, item_names, item_configs, batch_folder, jobs, sampler):
+        """
+        Analyze the log files in parallel byte ranges. Each byte range is analyzed by a fresh set of items in a
+        worker process. The partial items are sent back and merged in time order, so the result is the same
+        as a serial run.
+
+        Returns:
+            bool: False if the log can't be analyzed in parallel and nothing was done.
+        """
+        log_files = self._log_files
+        if len(log_files) > 1:
+            # Rotated log files follow each other. Order them by their first timestamp.
+            starts = {log_file: first_timestamp(log_file) for log_file in log_files}
+            log_files = sorted(log_files, key=lambda f: starts[f] or datetime.min)
+        tasks = []
+        parts_folder = f"{batch_folder}parts/"
+        pace = None
+        if self._pace is not None:
+            # The workers have their own clocks, see `_ingest_range`
+            # The workers share the report, which is written by a single process
+            deadline, _, full_speed, scan_speed, report_speed, max_rate = self._pace
+            pace = (time.time() + deadline - time.monotonic(), full_speed, scan_speed, report_speed / jobs, max_rate)
+        for log_file in log_files:
+            index, offsets = self._indexes.get(log_file, (None, None))
+            start, end = time_window(log_file, self._since, self._until, index, *self._ranges.get(log_file, (0, None)))
+            for start, end in split_ranges(log_file, jobs, start, end):
+                part_folder = f"{parts_folder}{len(tasks)}/"
+                part_offsets = None
+                if offsets is not None:
+                    part_offsets = offsets[bisect.bisect_left(offsets, start) : bisect.bisect_left(offsets, end)]
+                window = (self._since, self._until)
+                index_key = self._indexers[log_file].key if log_file in self._indexers else None
+                part = (log_file, start, end, *window, part_offsets, index_key)
+                tasks.append((item_names, item_configs, part_folder, *part, sampler, pace))
+        if len(tasks) == 1:
+            return False
+        self._logger.info("Analyzing the log in %s parallel byte ranges...", green(len(tasks)))
+        try:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+                results = list(executor.map(_ingest_range, tasks))
+            if not self._in_time_order(tasks, results):
+                self._logger.warning(
+                    yellow("The log files overlap in time and can't be merged in parallel. Analyzing them serially.")
+                )
+                return False
+            if self._pace is not None:
+                self._reach_coverage([pacer for _, _, _, pacer, _ in results])
+            indexers = {}
+            for task, (part_items, first, last, _, indexer) in zip(tasks, results):
+                if indexer is not None:
+                    # The ranges of a file are in order
+                    log_file = task[3]
+                    if log_file in indexers:
+                        indexers[log_file].merge(indexer)
+                    else:
+                        indexers[log_file] = indexer
+                if self._log_start is None:
+                    self._log_start = first
+                if last is not None:
+                    self._log_end = last
+                for item, part_item in zip(self._items, part_items):
+                    try:
+                        item.merge(part_item)
+                    except Exception as e:
+                        self._logger.warning(yellow(f"Log analysis item '{item.name}' merge failed: {e}"))
+                        continue
+            self._indexers.update(indexers)
+        finally:
+            shutil.rmtree(parts_folder, ignore_errors=True)
+        return True
+
+    @staticmethod
+    def _in_time_order(tasks, results):
+        # The ranges of one file are in order by nature. Check that every file starts after the previous one ends.
+        last = None
+        for i, (_, first, part_last, _, _) in enumerate(results):
+            new_file = i > 0 and tasks[i][3] != tasks[i - 1][3]
+            if new_file and last is not None and first is not None and first < last:
+                return False
+            if part_last is not None:
+                last = part_last
+        return True
+
     def output_results(self, output_folder: str = "output/", fmt: str = "html"):
         batch_folder = self._get_output_folder(output_folder)
+        self._write_report(self._items, batch_folder, fmt)
+
+    def _window(self):
+        since = self._since.isoformat() if self._since is not None else "beginning of log"
+        until = self._until.isoformat() if self._until is not None else "end of log"
+        return since, until
+
+    def _write_report(self, items, batch_folder, fmt, announce=True):
         output_file = f"{batch_folder}report.md"
         template_file = get_script_path(f"templates/{self._config.get('template', 'log/full.html')}")
-        self._logger.info("Saving results to: %s", green(output_file))
+        # The reports of the probe are only measured
+        log = self._logger.info if announce else self._logger.debug
+        log("Saving results to: %s", green(output_file))
 
         with open(output_file, "w", encoding="utf-8") as f:
             f.write("# Log Analysis Report\n")
             f.write(f"Generated at: `{str(datetime.now(tz=timezone.utc))} UTC`\n\n")
             f.write(f"Log path: `{self._file_path}`\n\n")
-            f.write(f"Log analysis period: `{self._log_start.isoformat()}` to `{self._log_end.isoformat()}`\n\n")
+            if len(self._log_files) > 1:
+                f.write(f"Log files: {', '.join(f'`{log_file}`' for log_file in self._log_files)}\n\n")
+            if self._since is not None or self._until is not None:
+                since, until = self._window()
+                f.write(f"Selected time window: `{since}` to `{until}`\n\n")
+            if self._coverage is not None:
+                f.write(f"Coverage within the time budget of `{self._time_budget:g}s`: {self._coverage}\n\n")
+            if self._log_start is not None and self._log_end is not None:
+                f.write(f"Log analysis period: `{self._log_start.isoformat()}` to `{self._log_end.isoformat()}`\n\n")
+            else:
+                f.write("Log analysis period: `N/A` (no log line analyzed)\n\n")
             f.write("Histogram chart instructions:\n\n")
             f.write("- **zoom in/out:** _mouse wheel or pinch_\n")
             f.write("- **pan:** _shift+drag_\n")
             f.write("- **select time frame:** _drag_\n\n")
-            for item in self._items:
+            for item in items:
                 try:
                     item.review_results_markdown(f)
                 except Exception as e:
@@ -120,7 +676,7 @@ class Framework:
 
         if fmt == "html":
             html_file = f"{batch_folder}report.html"
-            self._logger.info("Converting markdown to HTML: %s", green(html_file))
+            log("Converting markdown to HTML: %s", green(html_file))
             with open(html_file, "w", encoding="utf-8") as f:
                 with open(output_file, "r", encoding="utf-8") as md_file:
                     html_content = markdown.markdown(
@@ -0,0 +1,141 @@
+"""
+Bounded tracking of the heaviest entries, e.g. the query shapes seen most often, with the Space-Saving algorithm.
+
+The entries are documents in a dict shared by one `SpaceSaving` summary per ranking key, e.g. the count and the
+total duration. Each summary tracks at most `capacity` of the entries. When a new entry doesn't fit, the lightest
+tracked one is evicted and the new entry inherits its weight as the `error`: the new entry may have been seen that
+much before, while it wasn't tracked. So the true weight of an entry is between `entry[key]` and `upper(entry)`,
+and every entry heavier than the lightest tracked one is tracked. An entry is dropped from the dict once no summary
+tracks it. Like the variance of the estimates (see `estimator`), the errors are kept in an `error` field of the
+entry, only when there is one.
+"""
+
+import heapq
+
+
+def error(entry, key: str):
+    return entry.get("error", {}).get(key, 0)
+
+
+def upper(entry, key: str):
+    """The largest weight the entry may have."""
+    return entry[key] + error(entry, key)
+
+
+def add_error(entry, key: str, value):
+    if value > 0:
+        errors = entry.setdefault("error", {})
+        errors[key] = errors.get(key, 0) + value
+
+
+class SpaceSaving:
+    """Track the `capacity` entries with the largest `key` of a dict of entries."""
+
+    def __init__(self, capacity: int, key: str = "count"):
+        self.capacity = capacity
+        self.key = key
+        self.members = set()
+        # The (weight, id) of the tracked entries, built on the first eviction. The weights only grow,
+        # so an outdated weight is a lower bound, refreshed when it comes up.
+        self._heap = None
+
+    def __contains__(self, entry_id):
+        return entry_id in self.members
+
+    def admit(self, entry_id, entries):
+        """
+        Track the entry `entries[entry_id]`, evicting the lightest tracked entry if the summary is full.
+
+        Returns:
+            tuple: `(evicted_id, weight)` of the evicted entry, or `(None, 0)`.
+        """
+        evicted_id, weight = None, 0
+        if len(self.members) >= self.capacity:
+            evicted_id, weight = self._evict(entries)
+        self.members.add(entry_id)
+        if self._heap is not None:
+            heapq.heappush(self._heap, (upper(entries[entry_id], self.key), entry_id))
+        return evicted_id, weight
+
+    def _evict(self, entries):
+        if self._heap is None:
+            self._heap = [(upper(entries[entry_id], self.key), entry_id) for entry_id in self.members]
+            heapq.heapify(self._heap)
+        while True:
+            weight, entry_id = self._heap[0]
+            current = upper(entries[entry_id], self.key)
+            if current == weight:
+                heapq.heappop(self._heap)
+                self.members.remove(entry_id)
+                return entry_id, weight
+            heapq.heapreplace(self._heap, (current, entry_id))
+
+    def lightest(self, entries):
+        """The weight an untracked entry may have, the weight of the lightest tracked entry if the summary is full."""
+        if len(self.members) < self.capacity:
+            return 0
+        return min(upper(entries[entry_id], self.key) for entry_id in self.members)
+
+    def top(self, entries, n: int):
+        """The ids of the `n` heaviest tracked entries, heaviest first."""
+        return sorted(self.members, key=lambda entry_id: upper(entries[entry_id], self.key), reverse=True)[:n]
+
+    def merge_members(self, entries, other):
+        """Track the entries tracked by `other` too, keeping the heaviest ones. The entries must be merged."""
+        self.members |= other.members
+        if len(self.members) > self.capacity:
+            self.members = set(self.top(entries, self.capacity))
+        self._heap = None
+
+
+def admit(entries, summaries, entry_id, entry):
+    """Add a new entry to the dict, tracked by all the summaries. The entries evicted by all of them are dropped."""
+    entries[entry_id] = entry
+    for summary in summaries:
+        evicted_id, weight = summary.admit(entry_id, entries)
+        add_error(entry, summary.key, weight)
+        if evicted_id is not None and not any(evicted_id in other for other in summaries):
+            del entries[evicted_id]
+
+
+def readmit(entries, summaries, entry_id):
+    """
+    Track an entry of the dict again by the summaries that evicted it. Like a new entry, it takes the place of the
+    evicted one, so its largest weight is raised to the weight of the evicted entry if it's lighter.
+    """
+    entry = entries[entry_id]
+    for summary in summaries:
+        if entry_id not in summary:
+            evicted_id, weight = summary.admit(entry_id, entries)
+            add_error(entry, summary.key, weight - upper(entry, summary.key))
+            if evicted_id is not None and not any(evicted_id in other for other in summaries):
+                del entries[evicted_id]
+
+
+def merge(entries, summaries, other_entries, other_summaries, merge_entry):
+    """
+    Merge the entries and summaries of another item into these, with `merge_entry(entry, other)` for the entries in
+    both (the errors are merged here). An entry missing from the other dict may have been seen there as much as the
+    lightest entry of each full summary, which is added to its errors.
+    """
+    missed = [summary.lightest(entries) for summary in summaries]
+    other_missed = [summary.lightest(other_entries) for summary in other_summaries]
+    for entry_id, entry in entries.items():
+        if entry_id not in other_entries:
+            for summary, weight in zip(summaries, other_missed):
+                add_error(entry, summary.key, weight)
+    for entry_id, other in other_entries.items():
+        entry = entries.get(entry_id, None)
+        if entry is None:
+            for summary, weight in zip(summaries, missed):
+                add_error(other, summary.key, weight)
+            entries[entry_id] = other
+        else:
+            merge_entry(entry, other)
+            for key, value in other.get("error", {}).items():
+                add_error(entry, key, value)
+    for summary, other in zip(summaries, other_summaries):
+        summary.merge_members(entries, other)
+    for entry_id in list(entries):
+        if not any(entry_id in summary for summary in summaries):
+            del entries[entry_id]
@@ -0,0 +1,36 @@
+"""Decide from the raw bytes whether a log line is worth decoding."""
+
+import re
+
+# Both fields are in the log line header, before the `ctx`, `msg` and `attr` fields.
+# Searching only the beginning of the line keeps the cost independent of the line length.
+HEADER_SIZE = 256
+ID_PATTERN = re.compile(rb'"id":\s*(\d+)')
+SEVERITY_PATTERN = re.compile(rb'"s":\s*"(\w+)"')
+
+
+class LineFilter:
+    """
+    Pre-filter raw log lines by their `id` and `s` fields without JSON decoding.
+    A line is accepted if its id or its severity is wanted. Lines whose header can't be read are
+    accepted as well, so the JSON parser gets to decide about them.
+    """
+
+    def __init__(self, log_ids, severities, accept_all=False):
+        self._log_ids = {str(log_id).encode() for log_id in log_ids}
+        self._severities = {severity.encode() for severity in severities}
+        self._accept_all = accept_all
+
+    @classmethod
+    def from_dispatcher(cls, dispatcher):
+        return cls(dispatcher.log_ids, dispatcher.severities, dispatcher.has_wildcard)
+
+    def accepts(self, raw) -> bool:
+        if self._accept_all:
+            return True
+        if self._severities:
+            match = SEVERITY_PATTERN.search(raw, 0, HEADER_SIZE)
+            if match is None or match.group(1) in self._severities:
+                return True
+        match = ID_PATTERN.search(raw, 0, HEADER_SIZE)
+        return match is None or match.group(1) in self._log_ids
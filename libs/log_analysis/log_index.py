@@ -0,0 +1,226 @@
+"""
+A sidecar index for plain log files, so that later runs only read the lines their items need.
+
+The index is saved next to the log file as `<log file>.xray-index` and stores:
+- the offset of the first line of every minute,
+- for every log id and every severity except `I`, the offsets of the lines having it (posting lists),
+- the offsets of the lines whose header can't be read, which are always read.
+
+Posting lists are delta encoded varints, about 2 bytes per line. The index is keyed by the size, inode
+and modification time of the log file, and it's rebuilt if any of them changes. The index is built from the
+lines as the analysis reads them (see `IndexBuilder`), so the file isn't read again just for the index.
+"""
+
+import bisect
+import json
+import os
+from libs.log_analysis.decoder import EPOCH
+from libs.log_analysis.line_filter import HEADER_SIZE, ID_PATTERN, SEVERITY_PATTERN
+from libs.log_analysis.reader import (
+    INDEX_SUFFIX,
+    TIMESTAMP_PATTERN,
+    TIMESTAMP_SEARCH_SIZE,
+    MappedLog,
+    read_timestamp,
+)
+
+INDEX_VERSION = 1
+UNKNOWN = "unknown"
+# Almost every line is informational, an `I` posting list would be as large as the file itself.
+UNINDEXED_SEVERITIES = {"I"}
+
+
+def encode_postings(offsets):
+    """Encode sorted offsets as varints of the deltas between them."""
+    out = bytearray()
+    last = 0
+    for offset in offsets:
+        delta = offset - last
+        last = offset
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def decode_postings(data):
+    """Decode the offsets encoded by `encode_postings`."""
+    offsets = []
+    last = 0
+    delta = 0
+    shift = 0
+    for byte in data:
+        delta |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        last += delta
+        offsets.append(last)
+        delta = 0
+        shift = 0
+    return offsets
+
+
+def file_key(file_path: str):
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "inode": stat.st_ino, "mtime_ns": stat.st_mtime_ns}
+
+
+class LogIndex:
+    """The index of a plain log file. Use `LogIndex.load` or `LogIndex.build` to get one."""
+
+    def __init__(self, key, minutes, postings):
+        self.key = key
+        # Epoch minute -> offset of the first line in the minute
+        self._minutes = minutes
+        self._minute_keys = sorted(minutes.keys())
+        # Posting name (`id:<log id>`, `s:<severity>` or `unknown`) -> encoded offsets
+        self._postings = postings
+
+    @staticmethod
+    def index_path(file_path: str):
+        return f"{file_path}{INDEX_SUFFIX}"
+
+    @classmethod
+    def build(cls, file_path: str):
+        """Scan the raw lines of the file and build the index. Lines are not JSON decoded."""
+        builder = IndexBuilder(file_key(file_path))
+        with MappedLog(file_path) as log:
+            for line in log.lines():
+                builder.add(line)
+        return builder.index()
+
+    @classmethod
+    def load(cls, file_path: str):
+        """Load the index of the file. Returns None if there is none, or if it's outdated or unreadable."""
+        index_path = cls.index_path(file_path)
+        if not os.path.isfile(index_path):
+            return None
+        try:
+            with open(index_path, "rb") as f:
+                header = json.loads(f.readline())
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        if header.get("version") != INDEX_VERSION or header.get("key") != file_key(file_path):
+            return None
+        postings = {}
+        pos = 0
+        for name, length in header["postings"]:
+            postings[name] = data[pos : pos + length]
+            pos += length
+        minutes = {int(minute): offset for minute, offset in header["minutes"]}
+        return cls(header["key"], minutes, postings)
+
+    def save(self, file_path: str):
+        header = {
+            "version": INDEX_VERSION,
+            "key": self.key,
+            "minutes": sorted(self._minutes.items()),
+            "postings": [[name, len(data)] for name, data in self._postings.items()],
+        }
+        with open(self.index_path(file_path), "wb") as f:
+            f.write(json.dumps(header).encode("utf-8"))
+            f.write(b"\n")
+            for data in self._postings.values():
+                f.write(data)
+
+    def offsets(self, log_ids, severities):
+        """
+        The sorted offsets of the lines with one of the log ids or severities, plus the lines whose header
+        can't be read. Returns None if a wanted severity isn't indexed, then all lines must be read.
+        """
+        if any(severity in UNINDEXED_SEVERITIES for severity in severities):
+            return None
+        names = [f"id:{log_id}" for log_id in log_ids] + [f"s:{severity}" for severity in severities] + [UNKNOWN]
+        offsets = set()
+        for name in names:
+            if name in self._postings:
+                offsets.update(decode_postings(self._postings[name]))
+        return sorted(offsets)
+
+    def minute_bounds(self, t):
+        """
+        The offsets of the first line in the minute of `t` and of the first line in a later minute.
+        A search for the first line not before `t` only needs to look between them. None means the end of file.
+        """
+        minute = int((t - EPOCH).total_seconds()) // 60
+        i = bisect.bisect_left(self._minute_keys, minute)
+        j = bisect.bisect_right(self._minute_keys, minute)
+        lo = self._minutes[self._minute_keys[i]] if i < len(self._minute_keys) else None
+        hi = self._minutes[self._minute_keys[j]] if j < len(self._minute_keys) else None
+        return lo, hi
+
+
+class IndexBuilder:
+    """
+    Build the index of a plain log file from its raw lines, consecutive from the offset `start`. The parts of a
+    file read separately, e.g. by parallel jobs, are merged in order. `key` is the `file_key` of the file.
+    """
+
+    def __init__(self, key, start: int = 0):
+        self.key = key
+        self.start = start
+        # The offset after the last line added
+        self.end = start
+        self._minutes = {}
+        self._postings = {}
+        # If lines are missing between the merged parts, e.g. a part stopped early by the time budget
+        self._gap = False
+        # The timestamp of the last line read, but for the seconds, see `add`
+        self._minute_text = None
+
+    def lines(self, lines):
+        """Yield the lines, adding them to the index."""
+        for line in lines:
+            self.add(line)
+            yield line
+
+    def add(self, line):
+        pos = self.end
+        match = TIMESTAMP_PATTERN.search(line, 0, TIMESTAMP_SEARCH_SIZE)
+        if match is not None:
+            # The ISO timestamps of a minute only differ by the seconds, the first one of the minute is enough
+            text = match.group(1)
+            minute_text = None
+            if text is not None and text[16:17] == b":":
+                minute_text = (text[:16], text[19:].lstrip(b".0123456789"))
+            if minute_text is None or minute_text != self._minute_text:
+                t = read_timestamp(line)
+                if t is not None:
+                    self._minute_text = minute_text
+                    minute = int((t - EPOCH).total_seconds()) // 60
+                    if minute not in self._minutes:
+                        self._minutes[minute] = pos
+        postings = self._postings
+        id_match = ID_PATTERN.search(line, 0, HEADER_SIZE)
+        severity_match = SEVERITY_PATTERN.search(line, 0, HEADER_SIZE)
+        if id_match is None or severity_match is None:
+            postings.setdefault(UNKNOWN, []).append(pos)
+        if id_match is not None:
+            postings.setdefault(f"id:{int(id_match.group(1))}", []).append(pos)
+        if severity_match is not None:
+            severity = severity_match.group(1).decode("utf-8")
+            if severity not in UNINDEXED_SEVERITIES:
+                postings.setdefault(f"s:{severity}", []).append(pos)
+        self.end = pos + len(line)
+
+    def merge(self, other):
+        """Add the lines of `other`, which follow the lines of this builder."""
+        if other.start != self.end or other._gap:
+            self._gap = True
+        for minute, offset in other._minutes.items():
+            self._minutes.setdefault(minute, offset)
+        for name, offsets in other._postings.items():
+            self._postings.setdefault(name, []).extend(offsets)
+        self.end = other.end
+
+    @property
+    def complete(self):
+        """If every line of the file was added."""
+        return self.start == 0 and self.end == self.key["size"] and not self._gap
+
+    def index(self):
+        postings = {name: encode_postings(offsets) for name, offsets in self._postings.items()}
+        return LogIndex(self.key, self._minutes, postings)
@@ -1,11 +1,16 @@
+import copy
 import logging
 import os
+import shutil
 from bson import json_util
 from libs.log_analysis.shared import to_json
 from libs.utils import get_script_path
 from libs.version import Version
 from libs.utils import to_ejson
 
+# The buffer of the output file. Rows reach the file when it's full, and when the item is flushed or finalized.
+OUTPUT_BUFFER_SIZE = 1 << 20
+
 
 def get_version(log_line):
     """
@@ -21,6 +26,14 @@ def get_version(log_line):
 
 
 class BaseItem:
+    # The log ids and severities the item analyzes. The framework only passes matching lines to `analyze`.
+    # If both are None, the item receives every log line.
+    LOG_IDS = None
+    SEVERITIES = None
+    # Bump when the format returned by `get_state` changes, so older checkpoints are not restored.
+    STATE_VERSION = 1
+    # The sampler of the log lines, if any (see `Sampler`). Set by the framework, items scale their counters by it.
+    sampler = None
     _cache = None
 
     def __init__(self, output_folder: str, config, **kwargs):
@@ -30,14 +43,30 @@ class BaseItem:
         self._row_count = 0
         self._show_reset = kwargs.get("show_reset", False)
         self._server_version = None
+        # Opened on the first write, and kept open until the item is finalized
+        self._writer = None
         if os.path.isfile(self._output_file):
             os.remove(self._output_file)
 
+    def __getstate__(self):
+        # Items are copied by `snapshot` and sent back from worker processes, the open output file can't be.
+        self._flush_output()
+        state = self.__dict__.copy()
+        state["_writer"] = None
+        return state
+
     def analyze(self, log_line):
         log_id = log_line.get("id", "")
         if log_id == 23403:  # Build Info
             self._server_version = get_version(log_line)
 
+    def end_of_log(self, log_line):
+        """Called with the last log line after all lines are analyzed, whether the item is interested in it or not."""
+
+    def _probability(self, log_id):
+        """The probability that a log line with the log id was kept by the sampler."""
+        return 1.0 if self.sampler is None else self.sampler.probability(log_id)
+
     @property
     def name(self):
         return self._name
@@ -54,8 +83,76 @@ class BaseItem:
     def description(self, value):
         self._description = value
 
+    def merge(self, other):
+        """
+        Merge the partial state of another instance of the same item into this one.
+        `other` must have analyzed the log lines that immediately follow the lines seen by this item,
+        and neither of them has been finalized yet.
+        """
+        if other._server_version is not None:
+            self._server_version = other._server_version
+        # Rows that `other` has already written follow the rows written by this item.
+        other._close_output()
+        if os.path.isfile(other._output_file):
+            self._flush_output()
+            with open(other._output_file, "r", encoding="utf-8") as src:
+                with open(self._output_file, "a", encoding="utf-8") as dst:
+                    shutil.copyfileobj(src, dst)
+            self._row_count += other._row_count
+
+    def get_state(self):
+        """
+        The aggregated state of the (not finalized) item, saved in checkpoints.
+        It must be serializable as extended JSON. Items keeping state outside of `_cache` extend it.
+        """
+        return {
+            "cache": self._cache,
+            "server_version": str(self._server_version) if self._server_version is not None else None,
+            "row_count": self._row_count,
+        }
+
+    def set_state(self, state):
+        """Restore the state returned by `get_state`."""
+        self._cache = state["cache"]
+        server_version = state["server_version"]
+        self._server_version = Version.parse(server_version) if server_version is not None else None
+        self._row_count = state["row_count"]
+
+    def save_checkpoint(self, folder: str):
+        """Copy the rows written so far to the checkpoint folder, and return the versioned state to save."""
+        self._flush_output()
+        if os.path.isfile(self._output_file):
+            shutil.copyfile(self._output_file, os.path.join(folder, os.path.basename(self._output_file)))
+        return {"version": self.STATE_VERSION, "state": self.get_state()}
+
+    def restore_checkpoint(self, folder: str, saved):
+        """Restore the rows and the state saved by `save_checkpoint`."""
+        rows_file = os.path.join(folder, os.path.basename(self._output_file))
+        self._close_output()
+        if os.path.isfile(rows_file):
+            shutil.copyfile(rows_file, self._output_file)
+        self.set_state(saved["state"])
+
+    def snapshot(self, output_folder: str):
+        """
+        Return a copy of the item writing to `output_folder`, including the rows written so far.
+        The copy can be finalized for an intermediate report while this item keeps analyzing.
+        """
+        item = copy.deepcopy(self)
+        item._output_file = os.path.join(output_folder, os.path.basename(self._output_file))
+        if os.path.isfile(self._output_file):
+            shutil.copyfile(self._output_file, item._output_file)
+        elif os.path.isfile(item._output_file):
+            os.remove(item._output_file)
+        return item
+
     def finalize_analysis(self):
         self._write_output()
+        self._close_output()
+
+    def close(self):
+        """Close the output file of an item that is discarded without being finalized."""
+        self._close_output()
 
     def review_results_markdown(self, f):
         # Write JS snippet to the file
@@ -77,10 +174,12 @@ class BaseItem:
         with open(self._output_file, "r", encoding="utf-8") as data:
             for line in data:
                 # The data is in EJSON format, convert it to JSON
-                line_json = json_util.loads(line)
+                line_json = self._report_row(json_util.loads(line))
                 f.write(to_json(line_json))
                 f.write(", \n")
         f.write("];\n")
+        for name, value in self._script_data().items():
+            f.write(f"let {name} = {to_json(value)};\n")
         if os.path.isfile(file_path):
             with open(file_path, "r", encoding="utf-8") as js:
                 for line in js:
@@ -88,30 +187,62 @@ class BaseItem:
         f.write("});\n")
         f.write("</script>\n")
 
+    def _report_row(self, row):
+        """The row of the output file as shown in the report (`data` of the JS snippet)."""
+        return row
+
+    def _script_data(self):
+        """Variables of the JS snippet besides the rows in `data`, e.g. data kept in memory."""
+        return {}
+
+    def _read_output(self):
+        """Read back the rows already written to the output file."""
+        self._flush_output()
+        if not os.path.isfile(self._output_file):
+            return
+        with open(self._output_file, "r", encoding="utf-8") as data:
+            for line in data:
+                yield json_util.loads(line)
+
+    def _open_output(self):
+        if self._writer is None:
+            self._writer = open(self._output_file, "a", encoding="utf-8", buffering=OUTPUT_BUFFER_SIZE)
+        return self._writer
+
+    def _flush_output(self):
+        """Write the buffered rows to the output file, before it's read or copied."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def _close_output(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
     def _write_output(self):
-        # Open file steam and write the cache to file
-        # Even if the cache is None, we still write to indicate no data
-        with open(self._output_file, "a", encoding="utf-8") as f:
-            if self._cache is None:
-                self._logger.debug("Cache is empty, nothing to write for %s", self.__class__.__name__)
-                return
-            if isinstance(self._cache, list):
-                for item in self._cache:
-                    f.write(to_ejson(item, indent=None))
-                    f.write("\n")
-                    self._row_count += 1
-                self._logger.debug(
-                    "Wrote %d records to %s for %s",
-                    len(self._cache),
-                    self._output_file,
-                    self.__class__.__name__,
-                )
-            else:
-                f.write(to_ejson(self._cache, indent=None))
+        # Write the cache to the output file
+        # Even if the cache is None, we still create the file to indicate no data
+        f = self._open_output()
+        if self._cache is None:
+            self._logger.debug("Cache is empty, nothing to write for %s", self.__class__.__name__)
+            return
+        if isinstance(self._cache, list):
+            for item in self._cache:
+                f.write(to_ejson(item, indent=None))
                 f.write("\n")
                 self._row_count += 1
-                self._logger.debug(
-                    "Wrote 1 record to %s for %s",
-                    self._output_file,
-                    self.__class__.__name__,
-                )
+            self._logger.debug(
+                "Wrote %d records to %s for %s",
+                len(self._cache),
+                self._output_file,
+                self.__class__.__name__,
+            )
+        else:
+            f.write(to_ejson(self._cache, indent=None))
+            f.write("\n")
+            self._row_count += 1
+            self._logger.debug(
+                "Wrote 1 record to %s for %s",
+                self._output_file,
+                self.__class__.__name__,
+            )
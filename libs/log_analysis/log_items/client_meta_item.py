@@ -19,6 +19,10 @@ COMPATIBILITY_MATRIX_JSON = "compatibility_matrix.json"
 
 
 class ClientMetaItem(BaseItem):
+    LOG_IDS = [
+        51800,  # Client metadata
+        23403,  # Build Info, for the server version
+    ]
     _driver_matrix = None
 
     def __init__(self, output_folder: str, config):
@@ -48,6 +52,16 @@ class ClientMetaItem(BaseItem):
             self._cache[doc_hash]["ips"] = {}
         self._cache[doc_hash]["ips"][ip] = self._cache[doc_hash]["ips"].get(ip, 0) + 1
 
+    def merge(self, other):
+        super().merge(other)
+        for doc_hash, other_doc in other._cache.items():
+            if doc_hash not in self._cache:
+                self._cache[doc_hash] = other_doc
+                continue
+            ips = self._cache[doc_hash]["ips"]
+            for ip, count in other_doc["ips"].items():
+                ips[ip] = ips.get(ip, 0) + count
+
     def finalize_analysis(self):
         cache = []
         for v in self._cache.values():
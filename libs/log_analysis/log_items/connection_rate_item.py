@@ -2,15 +2,26 @@
 Analyze connection rates from log entries.
 """
 
-from datetime import datetime
-import math
+from libs.log_analysis.decoder import get_epoch_ms, get_minute, get_remote_ip
+from libs.log_analysis.estimator import add_sample, merge_estimates
+from libs.log_analysis.rollup import Rollup
 from libs.log_analysis.log_items.base_item import BaseItem
 
 
 class ConnectionRateItem(BaseItem):
+    """
+    Analyse the connections created and ended per minute, overall and per client IP address.
+    The counts and the number of connections are also rolled up at finer and coarser resolutions than the minute
+    (see `Rollup`), for the chart to zoom in and out of.
+    """
+
+    LOG_IDS = [22943, 22944]  # Connection accepted/ended
+    STATE_VERSION = 2
+
     def __init__(self, output_folder: str, config):
         super().__init__(output_folder, config, show_reset=True)
         self._cache = None
+        self._rollup = Rollup(["created", "ended"], ["total"])
         self.name = "Connection Rate"
         self.description = "Analyse the rate of connections created and ended over a specified time window."
 
@@ -21,9 +32,7 @@ class ConnectionRateItem(BaseItem):
         if self._cache is None:
             self._cache = {}
         counter = "created" if log_id == 22943 else "ended"
-        time = log_line.get("t")
-        ts = math.floor(time.timestamp())
-        time_min = datetime.fromtimestamp(ts - (ts % 60))
+        time_min = get_minute(log_line)
 
         if self._cache.get("time", None) != time_min:
             if self._cache != {}:
@@ -37,12 +46,50 @@ class ConnectionRateItem(BaseItem):
             }
         attr = log_line.get("attr", {})
         conn_count = attr.get("connectionCount", 1)
-        ip = attr["remote"].split(":")[0] if "remote" in attr else "unknown"
-        self._cache[counter] += 1
+        ip = get_remote_ip(log_line, "unknown")
+        probability = self._probability(log_id)
+        add_sample(self._cache, counter, 1, probability)
         self._cache["total"] = conn_count
         if ip not in self._cache["byIp"]:
             self._cache["byIp"][ip] = {"created": 0, "ended": 0}
-        self._cache["byIp"][ip][counter] += 1
+        add_sample(self._cache["byIp"][ip], counter, 1, probability)
+        epoch_ms = get_epoch_ms(log_line)
+        if epoch_ms is not None:
+            values = (1, 0) if counter == "created" else (0, 1)
+            self._rollup.add(epoch_ms, values, probability, (conn_count,))
+
+    def merge(self, other):
+        # The rows written by `other` are complete minute buckets, except that the first one
+        # may continue the bucket this item is still collecting.
+        self._rollup.merge(other._rollup)
+        buckets = list(other._read_output())
+        other.close()
+        if other._cache:
+            buckets.append(other._cache)
+        for bucket in buckets:
+            if self._cache and self._cache["time"] == bucket["time"]:
+                merge_estimates(self._cache, bucket, ["created", "ended"])
+                self._cache["total"] = bucket["total"]
+                for ip, stats in bucket["byIp"].items():
+                    if ip not in self._cache["byIp"]:
+                        self._cache["byIp"][ip] = {"created": 0, "ended": 0}
+                    merge_estimates(self._cache["byIp"][ip], stats, ["created", "ended"])
+                continue
+            if self._cache:
+                self._write_output()
+            self._cache = bucket
+
+    def get_state(self):
+        state = super().get_state()
+        state["rollup"] = self._rollup.get_state()
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self._rollup.set_state(state["rollup"])
+
+    def _script_data(self):
+        return {"rollups": self._rollup.report()}
 
     def review_results_markdown(self, f):
         super().review_results_markdown(f)
@@ -1,29 +1,33 @@
+from libs.log_analysis.decoder import decode_ejson
 from libs.log_analysis.log_items.base_item import BaseItem
 from libs.log_analysis.shared import to_json
 
 
 class InfoItem(BaseItem):
+    LOG_IDS = [
+        20721,  # Process Details
+        20722,  # Node is a member of a replica set
+        5853300,  # current featureCompatibilityVersion value
+        23403,  # Build Info
+        51765,  # Operating System
+        21951,  # Options set by command line
+        4913010,  # Certificate information
+        4615611,  # MongoDB starting
+    ]
+
     def __init__(self, output_folder, config):
         super().__init__(output_folder, config)
         self.name = "Basic Info"
         self.description = "Basic information about the instance."
         self._cache = {}
 
-        self._ids = [
-            20721,  # Process Details
-            20722,  # Node is a member of a replica set
-            5853300,  # current featureCompatibilityVersion value
-            23403,  # Build Info
-            51765,  # Operating System
-            21951,  # Options set by command line
-            4913010,  # Certificate information
-            4615611,  # MongoDB starting
-        ]
-
     def analyze(self, log_line):
         log_id = log_line.get("id", "")
-        index = self._ids.index(log_id) if log_id in self._ids else -1
-        attr = log_line.get("attr", {})
+        index = self.LOG_IDS.index(log_id) if log_id in self.LOG_IDS else -1
+        if index == -1:
+            return
+        # These lines are rare, so we convert all the extended JSON values for the report
+        attr = decode_ejson(log_line.get("attr", {}))
         if index in [0, 7]:
             # Process Details
             self._process_details(attr)
@@ -46,6 +50,11 @@ class InfoItem(BaseItem):
             # Certificate information
             self._process_certificate_info(attr)
 
+    def merge(self, other):
+        super().merge(other)
+        # Later log lines overwrite the information found earlier
+        self._cache.update(other._cache)
+
     def _process_details(self, attr):
         self._cache["process"] = {
             "pid": attr.get("pid", "Unknown"),
@@ -5,6 +5,8 @@ from libs.log_analysis.log_items.base_item import BaseItem
 
 
 class SlowChartItem(BaseItem):
+    LOG_IDS = [51803]  # Slow query
+
     def __init__(self, output_folder, config):
         super().__init__(output_folder, config, show_reset=True)
         self.name = "Slow Operations Chart"
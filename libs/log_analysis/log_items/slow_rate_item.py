@@ -1,41 +1,124 @@
 """Analyze slow query rates from log lines."""
 
-from datetime import datetime
-import math
+from libs.log_analysis.decoder import get_epoch_ms, get_minute
+from libs.log_analysis.estimator import add_sample, merge_estimates
+from libs.log_analysis.rollup import Rollup
+from libs.log_analysis.sketch import add_value, merge_sketch, new_sketch, summarize
+from libs.log_analysis.slow_op import SLOW_QUERY_ID, get_slow_op
 from libs.log_analysis.log_items.base_item import BaseItem
 
 
+def _new_stats():
+    return {"count": 0, "total_slow_ms": 0, "sketch": new_sketch()}
+
+
+def _merge_stats(stats, other):
+    merge_estimates(stats, other, ["count", "total_slow_ms"])
+    merge_sketch(stats["sketch"], other["sketch"])
+
+
 class SlowRateItem(BaseItem):
+    """
+    Analyse the rate of slow queries per minute, overall and per namespace.
+
+    The durations of each minute, and of each namespace within it, are kept in a quantile sketch (see `sketch`),
+    so the latency percentiles are charted over time. The sketches are written with the minute buckets, to merge
+    the buckets of partial results, but only their percentiles are reported. The counts are also rolled up at finer
+    and coarser resolutions than the minute (see `Rollup`), for the chart to zoom in and out of.
+    """
+
+    LOG_IDS = [51803]  # Slow query
+    STATE_VERSION = 3
+
     def __init__(self, output_folder: str, config):
         super().__init__(output_folder, config, show_reset=True)
         self._cache = None
+        self._rollup = Rollup(["count", "total_slow_ms"])
         self.name = "Slow Rate"
         self.description = "Analyse the rate of slow queries."
 
     def analyze(self, log_line):
-        log_id = log_line.get("id", "")
-        if log_id != 51803:  # Slow query
+        op = get_slow_op(log_line)
+        if op is None:
             return
-        time = log_line.get("t")
-        ts = math.floor(time.timestamp())
-        time_min = datetime.fromtimestamp(ts - (ts % 60))
+        time_min = get_minute(log_line)
 
         if self._cache is None or self._cache["time"] != time_min:
             if self._cache is not None:
                 # New minute, write previous minute's data
-                self._write_output()
+                self._write_bucket()
             # First time or new minute bucket
-            self._cache = {"time": time_min, "total_slow_ms": 0, "count": 0, "byNs": {}}
+            self._cache = {"time": time_min, **_new_stats(), "byNs": {}}
 
-        attr = log_line.get("attr", {})
-        slow_ms = attr.get("durationMillis", 0)
-        ns = attr.get("ns", "unknown")
-        self._cache["count"] += 1
-        self._cache["total_slow_ms"] += slow_ms
+        slow_ms = op.duration
+        ns = "unknown" if op.ns is None else op.ns
+        probability = self._probability(SLOW_QUERY_ID)
+        add_sample(self._cache, "count", 1, probability)
+        add_sample(self._cache, "total_slow_ms", slow_ms, probability)
+        add_value(self._cache["sketch"], slow_ms)
         if ns not in self._cache["byNs"]:
-            self._cache["byNs"][ns] = {"count": 0, "total_slow_ms": 0}
-        self._cache["byNs"][ns]["count"] += 1
-        self._cache["byNs"][ns]["total_slow_ms"] += slow_ms
+            self._cache["byNs"][ns] = _new_stats()
+        ns_stats = self._cache["byNs"][ns]
+        add_sample(ns_stats, "count", 1, probability)
+        add_sample(ns_stats, "total_slow_ms", slow_ms, probability)
+        add_value(ns_stats["sketch"], slow_ms)
+        epoch_ms = get_epoch_ms(log_line)
+        if epoch_ms is not None:
+            self._rollup.add(epoch_ms, (1, slow_ms), probability)
+
+    def merge(self, other):
+        # The rows written by `other` are complete minute buckets, except that the first one
+        # may continue the bucket this item is still collecting.
+        self._rollup.merge(other._rollup)
+        buckets = list(other._read_output())
+        other.close()
+        if other._cache is not None:
+            buckets.append(other._cache)
+        for bucket in buckets:
+            if self._cache is not None and self._cache["time"] == bucket["time"]:
+                _merge_stats(self._cache, bucket)
+                for ns, stats in bucket["byNs"].items():
+                    if ns not in self._cache["byNs"]:
+                        self._cache["byNs"][ns] = _new_stats()
+                    _merge_stats(self._cache["byNs"][ns], stats)
+                continue
+            if self._cache is not None:
+                self._write_bucket()
+            self._cache = bucket
+
+    def get_state(self):
+        state = super().get_state()
+        state["rollup"] = self._rollup.get_state()
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self._rollup.set_state(state["rollup"])
+
+    def _report_row(self, row):
+        # The sketches are only needed to merge the rows
+        del row["sketch"]
+        for stats in row["byNs"].values():
+            del stats["sketch"]
+        return row
+
+    def _script_data(self):
+        return {"rollups": self._rollup.report()}
+
+    def _add_quantiles(self):
+        """Add the latency percentiles of the sketches to the minute bucket, before it's written."""
+        self._cache["quantiles"] = summarize(self._cache["sketch"])
+        for stats in self._cache["byNs"].values():
+            stats["quantiles"] = summarize(stats["sketch"])
+
+    def _write_bucket(self):
+        self._add_quantiles()
+        self._write_output()
+
+    def finalize_analysis(self):
+        if self._cache is not None:
+            self._add_quantiles()
+        super().finalize_analysis()
 
     def review_results_markdown(self, f):
         super().review_results_markdown(f)
@@ -135,6 +135,42 @@ class StateTraceItem(BaseItem):
                 }
             )
 
+    def end_of_log(self, log_line):
+        # Lines not in `LOG_IDS` are not routed here, but the last one still marks the end of the chart.
+        self._last_log = log_line
+
+    def merge(self, other):
+        super().merge(other)
+        if other._last_log is not None:
+            self._last_log = other._last_log
+        if other._cache is None:
+            return
+        if self._cache is None:
+            self._cache = {}
+        for host, events in other._cache.items():
+            if host == "self":
+                # `other` hadn't seen the startup log line when these events happened.
+                # They belong to the member identified by the lines before.
+                host = self._myself
+                for event in events:
+                    event["host"] = host
+            if host not in self._cache:
+                self._cache[host] = []
+            self._cache[host].extend(events)
+        if other._myself != "self":
+            self._myself = other._myself
+
+    def get_state(self):
+        state = super().get_state()
+        state["myself"] = self._myself
+        state["last_log"] = self._last_log
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self._myself = state["myself"]
+        self._last_log = state["last_log"]
+
     def finalize_analysis(self):
         if self._last_log:
             # Because we are using line chart to describe the state changes,
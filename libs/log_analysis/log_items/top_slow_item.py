@@ -1,72 +1,160 @@
 """Identify the top N slowest operations from the log entries."""
 
 from bson import json_util
-from libs.log_analysis.query_analyzer import analyze_query_pattern
+from libs.log_analysis.estimator import add_sample, margin, merge_estimates
+from libs.log_analysis.heavy_hitters import SpaceSaving, admit, error, merge, readmit, upper
+from libs.log_analysis.sketch import add_value, merge_sketch, new_sketch, summarize
+from libs.log_analysis.slow_op import SLOW_QUERY_ID, get_slow_op
 from libs.log_analysis.log_items.base_item import BaseItem
-from libs.utils import escape_markdown, format_json_md, json_hash
+from libs.utils import escape_markdown, format_json_md
+
+# The totals of a query shape, estimated when the slow queries are sampled
+ESTIMATES = ["duration", "n_returned", "keys_examined", "docs_examined", "bytes_read", "cost", "count"]
+# The query shapes tracked at most per ranking, the others are evicted (see `SpaceSaving`)
+DEFAULT_CAPACITY = 2000
+# The keys the query shapes are ranked by, and their names in the report
+RANKINGS = {
+    "count": "Count",
+    "duration": "Total Duration",
+    "docs_examined": "Docs Examined",
+    "bytes_read": "Bytes Read",
+    "cost": "Cost",
+}
+# The cost of a slow query is the weighted sum of what it spent, in milliseconds of duration.
+# A query reading 100 documents or 100 KB from disk costs about as much as one running for 1 ms.
+DEFAULT_COST_WEIGHTS = {"duration": 1, "docs_examined": 0.01, "keys_examined": 0.001, "bytes_read": 0.00001}
+# The distributions of a query shape, kept in quantile sketches, and their names in the report
+SKETCHES = {"duration": "Duration (ms)", "docs_examined": "Docs Examined", "keys_examined": "Keys Examined"}
+
+
+def _with_margin(doc, key):
+    """The estimate `doc[key]`, followed by the margin of its 95% confidence interval if it's sampled."""
+    value = doc.get(key, 0)
+    if "variance" not in doc:
+        # E.g. the cost, a weighted sum
+        return round(value, 2) if isinstance(value, float) else value
+    return f"{round(value, 2)} +/- {round(margin(doc, key), 2)}"
+
+
+def _merge_query(slow_query, other_query):
+    # The latest values win, as they do in `analyze`
+    slow_query["ns"] = other_query["ns"]
+    slow_query["query_pattern"] = other_query["query_pattern"]
+    slow_query["has_sort"] = slow_query["has_sort"] or other_query["has_sort"]
+    merge_estimates(slow_query, other_query, ESTIMATES)
+    for key in SKETCHES:
+        merge_sketch(slow_query["sketches"][key], other_query["sketches"][key])
 
 
 class TopSlowItem(BaseItem):
     """
     Identify the top N slowest operations from the log entries.
+
+    The query shapes are ranked by each key of `RANKINGS`, e.g. by count or by total duration, and the report
+    shows the top N of any of them. For each ranking, only the `capacity` heaviest query shapes are tracked,
+    with their sample line. When a shape is evicted to make room for a new one, the totals of the new shape are
+    known within the `error` it inherits.
     """
 
+    LOG_IDS = [51803]  # Slow query
+    STATE_VERSION = 3
+
     def __init__(self, output_folder: str, config):
         super().__init__(output_folder, config)
         self._top_n = config.get("top", 10)
+        self._capacity = max(config.get("capacity", DEFAULT_CAPACITY), self._top_n)
+        self._summaries = [SpaceSaving(self._capacity, key) for key in RANKINGS]
+        self._cost_weights = {**DEFAULT_COST_WEIGHTS, **config.get("cost_weights", {})}
         self.name = "Top Slow Operations"
         self.description = f"Identify the top `{self._top_n}` slowest operations from the log entries."
         self._cache = {}
 
     def analyze(self, log_line):
-        log_id = log_line.get("id", "")
-        if log_id != 51803:  # Slow query
+        op = get_slow_op(log_line)
+        if op is None:
             return
-        attr = log_line.get("attr", {})
-        ns = attr.get("ns", "")
+        ns = "" if op.ns is None else op.ns
         # Skip system namespaces
         if ns.startswith("admin.") or ns.startswith("local.") or ns.startswith("config."):
             return
-        duration = attr.get("durationMillis", 0)
-        has_sort = attr.get("hasSortStage", False)
-        query_hash = attr.get("queryHash", "")
-        n_returned = attr.get("nreturned", 0)
-        keys_examined = attr.get("keysExamined", 0)
-        docs_examined = attr.get("docsExamined", 0)
-        plan_summary = attr.get("planSummary", "")
-        query_pattern = analyze_query_pattern(log_line)
-        if query_hash == "":
-            # Some command doesn't have queryHash, e.g., getMore
-            # If so, we generate one based on the query shape and sort
-            query_hash = json_hash(query_pattern if query_pattern else {}, 4)
-            # query_hash = query_pattern.get("hash", "N/A") if query_pattern else "N/A"
+        query_hash = op.query_hash
+        query_pattern = op.query_pattern
         slow_query = self._cache.get(query_hash, None)
         if slow_query is None:
-            slow_query = {}
-            self._cache[query_hash] = slow_query
-        slow_query.update(
-            {
+            slow_query = {
                 "query_hash": query_hash,
                 "ns": ns,
                 "query_pattern": query_pattern,
-                "duration": slow_query.get("duration", 0) + duration,
-                "n_returned": slow_query.get("n_returned", 0) + n_returned,
-                "keys_examined": slow_query.get("keys_examined", 0) + keys_examined,
-                "docs_examined": slow_query.get("docs_examined", 0) + docs_examined,
-                "plan_summary": (plan_summary if "plan_summary" not in slow_query else slow_query["plan_summary"]),
-                "has_sort": has_sort or slow_query.get("has_sort", False),
-                "count": slow_query.get("count", 0) + 1,
-                "sample": (log_line if "sample" not in slow_query else slow_query["sample"]),
+                "duration": 0,
+                "n_returned": 0,
+                "keys_examined": 0,
+                "docs_examined": 0,
+                "bytes_read": 0,
+                "cost": 0,
+                "plan_summary": op.plan_summary,
+                "has_sort": False,
+                "count": 0,
+                "sample": log_line,
+                "sketches": {key: new_sketch() for key in SKETCHES},
             }
+            admit(self._cache, self._summaries, query_hash, slow_query)
+        elif not all(query_hash in summary for summary in self._summaries):
+            # Evicted by some of the rankings, but still tracked by others
+            readmit(self._cache, self._summaries, query_hash)
+        slow_query["ns"] = ns
+        slow_query["query_pattern"] = query_pattern
+        slow_query["has_sort"] = op.has_sort or slow_query["has_sort"]
+        probability = self._probability(SLOW_QUERY_ID)
+        weights = self._cost_weights
+        cost = (
+            op.duration * weights["duration"]
+            + op.docs_examined * weights["docs_examined"]
+            + op.keys_examined * weights["keys_examined"]
+            + op.bytes_read * weights["bytes_read"]
         )
+        values = [op.duration, op.n_returned, op.keys_examined, op.docs_examined, op.bytes_read, cost, 1]
+        for key, value in zip(ESTIMATES, values):
+            add_sample(slow_query, key, value, probability)
+        sketches = slow_query["sketches"]
+        add_value(sketches["duration"], op.duration)
+        add_value(sketches["docs_examined"], op.docs_examined)
+        add_value(sketches["keys_examined"], op.keys_examined)
+
+    def merge(self, other):
+        super().merge(other)
+        merge(self._cache, self._summaries, other._cache, other._summaries, _merge_query)
+
+    def get_state(self):
+        state = super().get_state()
+        state["members"] = {summary.key: sorted(summary.members) for summary in self._summaries}
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self._summaries = [SpaceSaving(self._capacity, key) for key in RANKINGS]
+        for summary in self._summaries:
+            summary.members = set(state["members"][summary.key])
 
     def finalize_analysis(self):
-        self._cache = list(sorted(self._cache.values(), key=lambda item: item["count"], reverse=True)[: self._top_n])
-        # self._cache = list(sorted(self._cache.values(), key=lambda item: item["duration"], reverse=True)[:self._top_n])
+        # The rows of the top N of every ranking, starting with the top N by count.
+        # `ranks` is the position of the row in each ranking it's in the top N of.
+        rows = {}
+        for key in RANKINGS:
+            ranked = sorted(self._cache.values(), key=lambda item, key=key: upper(item, key), reverse=True)
+            for rank, slow_query in enumerate(ranked[: self._top_n], start=1):
+                rows[slow_query["query_hash"]] = slow_query
+                slow_query.setdefault("ranks", {})[key] = rank
+        self._cache = list(rows.values())
+        # Only the quantiles of the sketches are reported
+        for slow_query in self._cache:
+            sketches = slow_query.pop("sketches")
+            slow_query["quantiles"] = {key: summarize(sketch) for key, sketch in sketches.items()}
         super().finalize_analysis()
 
     def review_results_markdown(self, f):
         super().review_results_markdown(f)
+        links = " | ".join(f'<a href="#" data-ranking="{key}">{name}</a>' for key, name in RANKINGS.items())
+        f.write(f'<div id="top_slow_rankings">Rank by: {links}</div>\n\n')
         f.write('<div id="top_slow_positioner"></div>\n\n')
         f.write("|Query Hash|Op|Pattern|Details|Plan Summary|\n")
         f.write("|---|---|---|---|---|\n")
@@ -91,13 +179,24 @@ class TopSlowItem(BaseItem):
                 scanned_per_returned = round(keys_examined / n_returned, 2) if n_returned > 0 else keys_examined
                 scannedobj_per_returned = round(docs_examined / n_returned, 2) if n_returned > 0 else docs_examined
                 details = {
-                    "Total Duration (ms)": duration,
-                    "Count": count,
+                    "Total Duration (ms)": _with_margin(line_json, "duration"),
+                    "Count": _with_margin(line_json, "count"),
                     "Avg Duration (ms)": avg_duration,
+                    "Bytes Read": _with_margin(line_json, "bytes_read"),
+                    "Cost": _with_margin(line_json, "cost"),
                     "Targeting": scanned_per_returned,
                     "Targeting (Obj)": scannedobj_per_returned,
                     "Has Sort": has_sort,
                 }
+                ranks = line_json.get("ranks", {})
+                details["Rank"] = ", ".join(f"{RANKINGS[key]} #{rank}" for key, rank in ranks.items())
+                if error(line_json, "count") > 0:
+                    # The shape was tracked after some of its queries were seen
+                    details["Count Upper Bound"] = round(upper(line_json, "count"), 2)
+                for key, name in SKETCHES.items():
+                    quantiles = line_json.get("quantiles", {}).get(key, None)
+                    if quantiles is not None:
+                        details[f"{name} p50/p95/p99/max"] = " / ".join(str(v) for v in quantiles.values())
                 plan_summary = line_json.get("plan_summary", "N/A")
                 plan_summary = escape_markdown(plan_summary if plan_summary != "" else "N/A")
                 cols = [
@@ -5,6 +5,8 @@ from libs.utils import green, bold, yellow, escape_markdown, env
 
 
 class WEFItem(BaseItem):
+    SEVERITIES = ["W", "E", "F"]
+
     def __init__(self, output_folder, config):
         super().__init__(output_folder, config)
         self._cache = {}
@@ -30,6 +32,24 @@ class WEFItem(BaseItem):
         else:
             self._cache[log_id]["timestamp"].append(timestamp)
 
+    def merge(self, other):
+        super().merge(other)
+        for log_id, other_log in other._cache.items():
+            if log_id not in self._cache:
+                self._cache[log_id] = other_log
+            else:
+                self._cache[log_id]["timestamp"].extend(other_log["timestamp"])
+
+    def get_state(self):
+        state = super().get_state()
+        # The log ids are integer keys, which JSON can't keep
+        state["cache"] = list(self._cache.values())
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self._cache = {log["id"]: log for log in state["cache"]}
+
     def finalize_analysis(self):
         self._cache = list(self._cache.values())
         cache = self._cache
@@ -1,10 +1,16 @@
 """
 Analyze MongoDB query patterns from log entries.
+
+A few query shapes make up most of the slow queries, so the patterns are memoized in `shape_cache`. A pattern is
+looked up by a structural fingerprint of the query, which is cheaper to build than the pattern and its hash.
+The `queryHash` of the server isn't used as the key: it's computed over a normalized shape, e.g. the same for
+another order of the fields, which has another pattern. The hash of the pattern is cached with it, so lines
+aren't hashed either.
 """
 
+from collections import OrderedDict
 from libs.utils import json_hash
 
-
 DATA_TYPES = [
     "$binary",
     "$date",
@@ -99,14 +105,61 @@ COMPLEX_OPERATORS = [
 ]
 
 
+SHAPE_CACHE_SIZE = 4096
+
+
+class ShapeCache:
+    """A least recently used cache of query patterns and their hashes, counting its hits and misses."""
+
+    def __init__(self, max_size: int = SHAPE_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._shapes = OrderedDict()
+
+    def get(self, key):
+        shape = self._shapes.get(key, None)
+        if shape is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._shapes.move_to_end(key)
+        return shape
+
+    def put(self, key, shape):
+        self._shapes[key] = shape
+        if len(self._shapes) > self.max_size:
+            self._shapes.popitem(last=False)
+
+    def clear(self):
+        self.hits = 0
+        self.misses = 0
+        self._shapes.clear()
+
+
+shape_cache = ShapeCache()
+
+
 def analyze_query_pattern(log_line):
-    query_type = "command"
-    query = {}
-    sort = {}
     msg = log_line.get("msg", "")
     if msg != "Slow query":
         return None
-    attr = log_line.get("attr", {})
+    return analyze_slow_query(log_line.get("attr", {}))
+
+
+def analyze_slow_query(attr):
+    """The query pattern of the `attr` of a slow query log line."""
+    return query_shape(attr)[0]
+
+
+def query_shape(attr):
+    """
+    The query pattern of the `attr` of a slow query log line, and the hash of the pattern, which identifies
+    the queries without a `queryHash`, e.g. getMore.
+    """
+    query_type = "command"
+    query = {}
+    sort = {}
     op_type = attr.get("type", "")
     command = attr.get("command", {})
     if op_type == "update":
@@ -147,6 +200,16 @@ def analyze_query_pattern(log_line):
         query = command.get("query", {})
         sort = command.get("sort", {})
 
+    key = (query_type, _fingerprint(query), _freeze(sort))
+    shape = shape_cache.get(key)
+    if shape is None:
+        pattern = _build_pattern(query_type, query, sort)
+        shape = (pattern, json_hash(pattern, 4))
+        shape_cache.put(key, shape)
+    return shape
+
+
+def _build_pattern(query_type, query, sort):
     if isinstance(query, list):
         # For list of queries, e.g., update.$cmd, remove.$cmd
         patterns = {}
@@ -169,6 +232,30 @@ def analyze_query_pattern(log_line):
     }
 
 
+def _fingerprint(query):
+    """
+    A hashable fingerprint of the query, the same for queries with the same pattern. Scalar values are left out,
+    as they never change the pattern, and so are the lengths of lists of scalars, e.g. of `$in`.
+    """
+    if isinstance(query, dict):
+        return tuple((k, _fingerprint(v)) for k, v in query.items())
+    if isinstance(query, list):
+        fingerprints = [_fingerprint(i) for i in query]
+        if all(i is None for i in fingerprints):
+            return ("[]",)
+        return ("[",) + tuple(fingerprints)
+    return None
+
+
+def _freeze(obj):
+    """A hashable copy of the object, e.g. the sort document, which is part of the pattern as it is."""
+    if isinstance(obj, dict):
+        return tuple((k, _freeze(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return ("[",) + tuple(_freeze(i) for i in obj)
+    return (type(obj).__name__, obj)
+
+
 def query_to_pattern(query):
     shape = {}
     if isinstance(query, list):
@@ -0,0 +1,609 @@
+"""
+Read MongoDB log files as raw lines, optionally restricted to a byte range.
+
+Plain log files are memory-mapped (`MappedLog`). Lines are found on the mapping and returned as `memoryview`
+slices, so only the lines some item is interested in are ever copied and decoded.
+
+Several log files, e.g. the files rotated by `logRotate`, are read as one stream ordered by timestamp.
+
+Compressed logs (gzip, bzip2, xz and zstd) are detected by their magic bytes and decompressed on the fly.
+For compressed files the byte ranges are offsets in the compressed file. Only gzip files consisting of
+multiple members can be split into several ranges, one range starting at each chosen member.
+"""
+
+import bisect
+import bz2
+import functools
+import glob
+import gzip
+import heapq
+import io
+import lzma
+import mmap
+import os
+import re
+import time
+import zlib
+from datetime import datetime
+from operator import itemgetter
+from libs.log_analysis.decoder import parse_date
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC_BYTES = {
+    "gzip": b"\x1f\x8b",
+    "bzip2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+GZIP_MEMBER_MAGIC = b"\x1f\x8b\x08"
+# Decompressing this much data without an error is enough to trust a gzip member header found by scanning.
+GZIP_VERIFY_SIZE = 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+# The timestamp is the first field of a log line
+TIMESTAMP_PATTERN = re.compile(rb'"t":\s*\{\s*"\$date":\s*(?:"([^"]+)"|\{\s*"\$numberLong":\s*"(-?\d+)"\s*\})')
+TIMESTAMP_SEARCH_SIZE = 128
+# Compressed bytes decompressed to estimate the compression ratio of a log file
+SIZE_PROBE_SIZE = 1 << 20
+# Suffix of the sidecar index files (see `LogIndex`), which are not log files
+INDEX_SUFFIX = ".xray-index"
+
+
+def detect_compression(file_path: str):
+    """Return the compression format of the file (`gzip`, `bzip2`, `xz` or `zstd`), or None for plain text."""
+    with open(file_path, "rb") as f:
+        head = f.read(6)
+    for fmt, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return fmt
+    return None
+
+
+def open_log(file_path: str):
+    """Open the log file as a binary stream, decompressing it if needed."""
+    fmt = detect_compression(file_path)
+    if fmt == "gzip":
+        return gzip.open(file_path, "rb")
+    if fmt == "bzip2":
+        return bz2.open(file_path, "rb")
+    if fmt == "xz":
+        return lzma.open(file_path, "rb")
+    if fmt == "zstd":
+        if zstandard is None:
+            raise ValueError(f"Reading zstd compressed log '{file_path}' requires the `zstandard` package.")
+        f = open(file_path, "rb")
+        reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=True)
+        return io.BufferedReader(reader)
+    return open(file_path, "rb")
+
+
+def estimate_size(file_path: str):
+    """
+    The size of the log file once decompressed. For compressed files, it's extrapolated from the
+    compression ratio of the first `SIZE_PROBE_SIZE` bytes.
+    """
+    size = os.path.getsize(file_path)
+    fmt = detect_compression(file_path)
+    if fmt is None:
+        return size
+    if fmt == "gzip":
+        factory = functools.partial(zlib.decompressobj, zlib.MAX_WBITS | 16)
+    elif fmt == "bzip2":
+        factory = bz2.BZ2Decompressor
+    elif fmt == "xz":
+        factory = lzma.LZMADecompressor
+    elif zstandard is not None:
+        factory = zstandard.ZstdDecompressor().decompressobj
+    else:
+        return size
+    with open(file_path, "rb") as f:
+        data = head = f.read(SIZE_PROBE_SIZE)
+    decompressed = 0
+    try:
+        # The file can be made of several members or frames
+        while data:
+            decompressor = factory()
+            decompressed += len(decompressor.decompress(data))
+            data = decompressor.unused_data if getattr(decompressor, "eof", False) else b""
+    except (OSError, EOFError, ValueError, lzma.LZMAError, zlib.error):
+        return size
+    # Blocks still being decompressed are not counted. If nothing came out yet, the ratio is unknown.
+    return size * decompressed // len(head) if decompressed > 0 else size
+
+
+class MappedLog:
+    """
+    A plain log file mapped into memory. Line boundaries are searched on the mapping and lines are returned
+    as `memoryview` slices without copying. The mapping is released when the last slice is gone.
+    """
+
+    def __init__(self, file_path: str):
+        with open(file_path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            # An empty file can't be mapped
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size > 0 else b""
+        self._view = memoryview(self._map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        try:
+            self._view.release()
+            if isinstance(self._map, mmap.mmap):
+                self._map.close()
+        except BufferError:
+            # Some lines are still referenced. The mapping is closed when they are garbage collected.
+            pass
+
+    def line_start(self, pos: int) -> int:
+        """The offset of the first line starting at or after `pos`."""
+        if pos <= 0:
+            return 0
+        if pos >= self.size:
+            return self.size
+        # If `pos` is already a line start, the byte before it is a newline.
+        newline = self._map.find(b"\n", pos - 1)
+        return self.size if newline < 0 else newline + 1
+
+    def line_end(self, pos: int) -> int:
+        """The offset right after the line starting at `pos`, including its newline."""
+        newline = self._map.find(b"\n", pos)
+        return self.size if newline < 0 else newline + 1
+
+    def last_line_start(self, start: int, end: int) -> int:
+        """The offset of the last line starting in `[start, end)`, where `end` is a line start."""
+        newline = self._map.rfind(b"\n", start, end - 1)
+        return start if newline < 0 else newline + 1
+
+    def complete_end(self) -> int:
+        """The offset right after the last complete line. A line still being written has no newline yet."""
+        return self._map.rfind(b"\n") + 1
+
+    def line(self, pos: int):
+        """The line starting at `pos`."""
+        return self._view[pos : self.line_end(pos)]
+
+    def lines(self, start: int = 0, end: int = None):
+        """Yield the lines starting in `[start, end)`."""
+        end = self.size if end is None else min(end, self.size)
+        view = self._view
+        find = self._map.find
+        size = self.size
+        pos = start
+        while pos < end:
+            newline = find(b"\n", pos)
+            line_end = size if newline < 0 else newline + 1
+            yield view[pos:line_end]
+            pos = line_end
+
+
+def split_ranges(file_path: str, parts: int, start: int = 0, end: int = None):
+    """
+    Split the file into at most `parts` byte ranges of similar size.
+    Every range starts at the beginning of a line (or a gzip member for compressed files),
+    so each line belongs to exactly one range.
+
+    Args:
+        file_path (str): The log file.
+        parts (int): The number of ranges wanted.
+        start (int): Only split the lines from this offset, e.g. the result of `time_window`.
+        end (int): Only split the lines before this offset. Compressed files are always split as a whole.
+
+    Returns:
+        list: A list of `(start, end)` tuples covering `[start, end)`.
+    """
+    size = os.path.getsize(file_path)
+    fmt = detect_compression(file_path) if size > 0 else None
+    if fmt is not None:
+        if parts <= 1 or fmt != "gzip":
+            return [(0, size)]
+        bounds = _split_gzip_members(file_path, size, parts)
+        bounds.append(size)
+    else:
+        end = size if end is None else min(end, size)
+        if parts <= 1 or end <= start:
+            return [(start, end)]
+        bounds = _split_lines(file_path, start, end, parts)
+        bounds.append(end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _split_lines(file_path, start, end, parts):
+    bounds = [start]
+    with MappedLog(file_path) as log:
+        for i in range(1, parts):
+            pos = log.line_start(start + (end - start) * i // parts)
+            if pos >= end:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    return bounds
+
+
+def _split_gzip_members(file_path, size, parts):
+    bounds = [0]
+    with open(file_path, "rb") as f:
+        for i in range(1, parts):
+            pos = max(size * i // parts, bounds[-1] + 1)
+            limit = size * (i + 1) // parts
+            member = _find_gzip_member(f, pos, limit)
+            if member is not None and member > bounds[-1]:
+                bounds.append(member)
+    return bounds
+
+
+def _find_gzip_member(f, pos, limit):
+    """Find the first verified gzip member header in `[pos, limit)`."""
+    while pos < limit:
+        f.seek(pos)
+        block = f.read(min(CHUNK_SIZE, limit - pos) + len(GZIP_MEMBER_MAGIC) - 1)
+        offset = block.find(GZIP_MEMBER_MAGIC)
+        while offset >= 0:
+            if _is_gzip_member(f, pos + offset):
+                return pos + offset
+            offset = block.find(GZIP_MEMBER_MAGIC, offset + 1)
+        pos += CHUNK_SIZE
+    return None
+
+
+def _is_gzip_member(f, pos):
+    # The magic bytes can also appear inside compressed data, so try to decompress from there.
+    f.seek(pos)
+    data = f.read(GZIP_VERIFY_SIZE)
+    if len(data) < 10 or data[3] & 0xE0:
+        # Reserved flag bits must be zero
+        return False
+    decompressor = zlib.decompressobj(31)
+    try:
+        decompressor.decompress(data)
+    except zlib.error:
+        return False
+    return True
+
+
+def read_lines(file_path: str, start: int = 0, end: int = None):
+    """
+    Yield the raw lines that start in the byte range `[start, end)`.
+    `start` must be the beginning of a line, e.g. a boundary returned by `split_ranges`.
+    Lines of plain files are `memoryview` slices, lines of compressed files are `bytes`.
+    """
+    fmt = detect_compression(file_path)
+    if fmt == "gzip" and (start > 0 or (end is not None and end < os.path.getsize(file_path))):
+        yield from _read_gzip_lines(file_path, start, end)
+        return
+    if fmt is not None:
+        with open_log(file_path) as f:
+            yield from f
+        return
+    with MappedLog(file_path) as log:
+        yield from log.lines(start, end)
+
+
+def _read_gzip_lines(file_path, start, end):
+    """
+    Yield the lines of the gzip members starting in `[start, end)`.
+    Members don't have to end at a line boundary, so a line belongs to the range containing its newline.
+    Unless the range starts at the beginning of the file, the data up to the first newline belongs to the
+    previous range. At the end, we keep decompressing the next members until the first newline.
+    """
+    skip = start > 0
+    pending = b""
+    for out, past_end in _decompress_gzip_members(file_path, start, end):
+        if skip:
+            newline = out.find(b"\n")
+            if newline < 0:
+                continue
+            skip = False
+            if past_end:
+                # The line was completed by the previous range, nothing left for this one.
+                return
+            out = out[newline + 1 :]
+        if past_end:
+            newline = out.find(b"\n")
+            if newline >= 0:
+                yield pending + out[: newline + 1]
+                return
+            pending += out
+            continue
+        lines = (pending + out).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if pending:
+        yield pending
+
+
+def _decompress_gzip_members(file_path, start, end):
+    """Yield `(data, past_end)` for the decompressed data of the gzip members from `start` to the end of file."""
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        member_start = start
+        decompressor = zlib.decompressobj(31)
+        data = f.read(CHUNK_SIZE)
+        while data:
+            out = decompressor.decompress(data)
+            yield out, end is not None and member_start >= end
+            if not decompressor.eof:
+                data = f.read(CHUNK_SIZE)
+                continue
+            data = decompressor.unused_data
+            member_start = f.tell() - len(data)
+            if len(data) < len(GZIP_MEMBER_MAGIC):
+                data += f.read(CHUNK_SIZE)
+            if not data.startswith(MAGIC_BYTES["gzip"]):
+                # End of file, or trailing garbage after the last member
+                return
+            decompressor = zlib.decompressobj(31)
+
+
+def resolve_log_files(paths):
+    """
+    Expand the log paths given by the user to a list of files.
+    A path can be a file, a directory (all files in it, except hidden ones and indexes) or a glob pattern.
+
+    Args:
+        paths (str or list): One path or a list of paths.
+
+    Returns:
+        list: The log files, without duplicates.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = [entry.path for entry in os.scandir(path) if entry.is_file() and not entry.name.startswith(".")]
+        elif glob.has_magic(path):
+            found = [f for f in glob.glob(path) if os.path.isfile(f)]
+        else:
+            found = [path]
+        for f in sorted(found):
+            if f.endswith(INDEX_SUFFIX) and f != path:
+                continue
+            if f not in files:
+                files.append(f)
+    return files
+
+
+def read_timestamp(raw):
+    """Read the timestamp of a raw log line without decoding the line. Returns None if it can't be read."""
+    match = TIMESTAMP_PATTERN.search(raw, 0, TIMESTAMP_SEARCH_SIZE)
+    if match is None:
+        return None
+    try:
+        if match.group(1) is not None:
+            return parse_date(match.group(1).decode("utf-8"))
+        return parse_date({"$numberLong": match.group(2).decode("utf-8")})
+    except (ValueError, OverflowError):
+        return None
+
+
+def first_timestamp(file_path: str):
+    """The timestamp of the first log line in the file that has one, or None."""
+    for raw in read_lines(file_path):
+        t = read_timestamp(raw)
+        if t is not None:
+            return t
+    return None
+
+
+def time_window(file_path: str, since=None, until=None, index=None, start: int = 0, end: int = None):
+    """
+    Find the byte range of the lines in the time window `[since, until)` with a binary search
+    on the line timestamps. Log files are in time order, so only a few lines are read.
+    Compressed files can't be searched, the whole file is returned and `read_window` filters the lines.
+
+    Args:
+        file_path (str): The log file.
+        since (datetime): The start of the window (naive UTC), or None for the beginning of the file.
+        until (datetime): The end of the window (naive UTC), or None for the end of the file.
+        index (LogIndex): The index of the file, if any. Its minute offsets narrow down the search.
+        start (int): Only search from this line start, e.g. where a checkpoint left off.
+        end (int): Only search up to this line start. None for the end of the file.
+
+    Returns:
+        tuple: The byte range `(start, end)`.
+    """
+    size = os.path.getsize(file_path)
+    if size == 0 or detect_compression(file_path) is not None:
+        return 0, size
+    end = size if end is None else min(end, size)
+    with MappedLog(file_path) as log:
+        if since is not None:
+            start = _find_time(log, since, start, index)
+        if until is not None:
+            end = min(end, _find_time(log, until, start, index))
+    return min(start, end), end
+
+
+def _find_time(log, t, lo, index=None):
+    """The offset of the first line from `lo` with a timestamp not before `t`."""
+    # Lines starting before `lo` are before `t`. Lines starting from `hi` are not.
+    hi = log.size
+    if index is not None:
+        minute_lo, minute_hi = index.minute_bounds(t)
+        minute_lo = log.size if minute_lo is None else minute_lo
+        minute_hi = log.size if minute_hi is None else minute_hi
+        if lo <= minute_lo <= minute_hi:
+            lo, hi = minute_lo, minute_hi
+    while lo < hi:
+        mid = log.line_start((lo + hi) // 2)
+        if mid >= hi:
+            mid = lo
+        # Lines without a timestamp go with the next line having one.
+        pos = mid
+        line_t = None
+        while pos < hi and line_t is None:
+            line_t = read_timestamp(log.line(pos))
+            pos = log.line_end(pos)
+        if line_t is not None and line_t < t:
+            lo = pos
+        else:
+            hi = mid
+    return lo
+
+
+def filter_time(lines, since=None, until=None):
+    """
+    Only pass the lines in the time window `[since, until)`, reading the timestamp from the raw lines.
+    Lines without a timestamp go with the line before them. Stops at the first line after the window.
+    None (see `follow_lines`) is passed through.
+    """
+    keep = since is None
+    for raw in lines:
+        if raw is not None:
+            t = read_timestamp(raw)
+            if t is not None:
+                if until is not None and t >= until:
+                    return
+                keep = since is None or t >= since
+            if not keep:
+                continue
+        yield raw
+
+
+def read_offsets(file_path: str, offsets, start: int = 0, end: int = None):
+    """
+    Yield the lines starting at the sorted `offsets` in `[start, end)`, e.g. from a `LogIndex`.
+    The first and the last line of the range are always included, for the time span of the log.
+    """
+    with MappedLog(file_path) as log:
+        end = log.size if end is None else min(end, log.size)
+        if start >= end:
+            return
+        last = log.last_line_start(start, end)
+        i = bisect.bisect_left(offsets, start)
+        j = bisect.bisect_left(offsets, end)
+        if i == j or offsets[i] != start:
+            yield log.line(start)
+        for pos in offsets[i:j]:
+            yield log.line(pos)
+        if last != start and (i == j or offsets[j - 1] != last):
+            yield log.line(last)
+
+
+def read_window(file_path: str, since=None, until=None, start: int = 0, end: int = None, offsets=None):
+    """
+    Yield the raw lines in the time window `[since, until)`, from the byte range `[start, end)`
+    returned by `time_window`, or a part of it returned by `split_ranges`.
+    If `offsets` are given, only the lines starting there are read (see `read_offsets`).
+    """
+    if offsets is not None:
+        lines = read_offsets(file_path, offsets, start, end)
+    else:
+        lines = read_lines(file_path, start, end)
+    if (since is not None or until is not None) and detect_compression(file_path) is not None:
+        lines = filter_time(lines, since, until)
+    yield from lines
+
+
+def merge_lines(file_paths, since=None, until=None, indexes=None, ranges=None, indexers=None):
+    """
+    Yield the raw lines of all the files in the time window `[since, until)` as one stream ordered by timestamp.
+    The files are merged lazily with a k-way heap merge, each file is expected to be in time order already.
+    Lines without a readable timestamp stay right after the line before them in the same file.
+    `indexes` optionally maps a file to `(index, offsets)`, to only read the lines at the offsets.
+    `ranges` optionally maps a plain file to the byte range `(start, end)` to read at most.
+    `indexers` optionally maps a plain file read from its beginning to an `IndexBuilder` (see `log_index`)
+    the lines are added to as they're read.
+    """
+    indexes = indexes or {}
+    ranges = ranges or {}
+    indexers = indexers or {}
+    streams = []
+    for file_path in file_paths:
+        index, offsets = indexes.get(file_path, (None, None))
+        lines = _window_lines(file_path, since, until, index, offsets, *ranges.get(file_path, (0, None)))
+        if file_path in indexers:
+            lines = indexers[file_path].lines(lines)
+        streams.append(lines)
+    if len(streams) == 1:
+        yield from streams[0]
+        return
+    streams = [_timestamped_lines(lines) for lines in streams]
+    for _, raw in heapq.merge(*streams, key=itemgetter(0)):
+        yield raw
+
+
+def _window_lines(file_path, since, until, index, offsets, start, end):
+    start, end = time_window(file_path, since, until, index, start, end)
+    return read_window(file_path, since, until, start, end, offsets)
+
+
+def _timestamped_lines(lines):
+    last = datetime.min
+    for raw in lines:
+        t = read_timestamp(raw)
+        if t is not None:
+            last = t
+        yield last, raw
+
+
+def follow_lines(file_path: str, poll_interval: float = 1.0, stop=None):
+    """
+    Yield the raw lines of a growing log file like `tail -F`, starting from the beginning of the file.
+    When there is no new complete line, yield None every `poll_interval` seconds, so the caller can do
+    periodic work while waiting. A busy log never waits, so None is also yielded between the lines once
+    `poll_interval` seconds have passed since the last None. If the file is rotated (replaced by a new file)
+    or truncated, the rest of the old file is read and the new file is followed from its beginning.
+
+    Args:
+        file_path (str): The log file to follow.
+        poll_interval (float): Seconds to wait for new lines before checking the file again.
+        stop (threading.Event): Stop following when the event is set. Without it, follow forever.
+    """
+    f = None
+    pending = b""
+    count = 0
+    next_tick = time.monotonic() + poll_interval
+    try:
+        while stop is None or not stop.is_set():
+            if f is None:
+                try:
+                    f = open(file_path, "rb")
+                except FileNotFoundError:
+                    # Between the rotation and the creation of the new file
+                    yield None
+                    time.sleep(poll_interval)
+                    continue
+            line = f.readline()
+            if line.endswith(b"\n"):
+                yield pending + line
+                pending = b""
+                count += 1
+                if count % 1000 == 0 and time.monotonic() >= next_tick:
+                    yield None
+                    next_tick = time.monotonic() + poll_interval
+                continue
+            # A partial line is completed when the writer flushes the rest.
+            pending += line
+            if _is_rotated(f, file_path):
+                # Drain what was written to the old file before it was rotated.
+                rest = pending + f.read()
+                f.close()
+                f = None
+                pending = b""
+                yield from rest.splitlines(keepends=True)
+                continue
+            yield None
+            time.sleep(poll_interval)
+            next_tick = time.monotonic() + poll_interval
+    finally:
+        if f is not None:
+            f.close()
+
+
+def _is_rotated(f, file_path):
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        # Renamed, but the new file doesn't exist yet. Keep reading the old one.
+        return False
+    return stat.st_ino != os.fstat(f.fileno()).st_ino or stat.st_size < f.tell()
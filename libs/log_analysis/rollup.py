@@ -0,0 +1,225 @@
+"""
+Counters of the log lines over time at several resolutions, e.g. the slow queries per second and per hour.
+
+A one-week log is charted by the hour, and a 5-minute incident in it by the second, without reading the log again.
+Lines are counted in the buckets of the finest resolution, which are kept in pages of `PAGE_SIZE` consecutive
+buckets, each page an array of floats holding, per bucket, the number of lines, the counters and the gauges.
+Only the pages holding lines exist, so gaps in the log cost nothing. The coarser resolutions are rolled up from
+the finest one for the reports: adding a line to a single bucket keeps the cost per line low.
+
+Counters are sums, scaled when the lines are sampled like the other estimates (see `estimator`). Their variances
+are kept in pages of their own, only created when the lines are sampled. Gauges are the latest value in the
+bucket, e.g. the number of open connections.
+
+A week by the second is too many buckets for a report. A resolution with too many of them is only reported in
+chunks of consecutive buckets, the ones with the most lines first: the busy periods can still be charted by the
+second, the rest of the log at the next coarser resolution.
+"""
+
+from array import array
+
+# The resolutions of the rollups, in seconds. Each one is a multiple of the first, the finest one.
+RESOLUTIONS = [1, 10, 60, 600, 3600]
+# The buckets of a page
+PAGE_SIZE = 256
+# The buckets of a resolution in a report. The coarsest resolution is always reported in full.
+MAX_POINTS = 100000
+# The buckets of a chunk of a resolution with too many buckets to report them all. The charts show at most
+# `MAX_DATA_POINTS` (see the template) of the buckets at a time, so a chunk holds a chart of the resolution.
+CHUNK_SIZE = 1024
+
+
+def _new_page(width: int):
+    return array("d", bytes(8 * PAGE_SIZE * width))
+
+
+def _number(value: float):
+    return int(value) if value.is_integer() else value
+
+
+def _chunk_ranges(chunks, resolution: int):
+    """The `[start, end)` time ranges in ms of the sorted chunks of the resolution, adjacent ones merged."""
+    span = CHUNK_SIZE * resolution * 1000
+    ranges = []
+    for chunk in chunks:
+        if ranges and ranges[-1][1] == chunk * span:
+            ranges[-1][1] += span
+        else:
+            ranges.append([chunk * span, (chunk + 1) * span])
+    return ranges
+
+
+class Rollup:
+    """The counters and gauges of the log lines, per bucket of each of the `resolutions` (in seconds)."""
+
+    def __init__(self, counters, gauges=(), resolutions=None):
+        self.counters = list(counters)
+        self.gauges = list(gauges)
+        self.resolutions = list(RESOLUTIONS if resolutions is None else resolutions)
+        # The number of lines, the counters and the gauges of a bucket
+        self._width = 1 + len(self.counters) + len(self.gauges)
+        self._resolution_ms = self.resolutions[0] * 1000
+        # The pages of the finest resolution, by page index, and the pages of the variances of the counters
+        self._pages = {}
+        self._variance_pages = {}
+
+    def add(self, epoch_ms: int, values, probability: float = 1.0, gauges=()):
+        """
+        Add a log line at `epoch_ms` to the buckets.
+
+        Args:
+            values: The values of the counters, in the order of `counters`.
+            probability: The probability the line was kept by the sampler.
+            gauges: The values of the gauges, in the order of `gauges`.
+        """
+        page_index, offset = divmod(epoch_ms // self._resolution_ms, PAGE_SIZE)
+        page = self._pages.get(page_index, None)
+        if page is None:
+            page = self._pages[page_index] = _new_page(self._width)
+        i = offset * self._width
+        page[i] += 1
+        if probability < 1.0:
+            n = len(self.counters)
+            variance_page = self._variance_pages.get(page_index, None)
+            if variance_page is None:
+                variance_page = self._variance_pages[page_index] = _new_page(n)
+            for k, value in enumerate(values):
+                page[i + 1 + k] += value / probability
+                variance_page[offset * n + k] += value * value * (1 - probability) / (probability * probability)
+        else:
+            for k, value in enumerate(values, i + 1):
+                page[k] += value
+        for k, value in enumerate(gauges, i + 1 + len(self.counters)):
+            page[k] = value
+
+    def merge(self, other):
+        """Add the lines of `other`, which follow the lines of this rollup, to the buckets."""
+        width = self._width
+        gauge_start = 1 + len(self.counters)
+        for page_index, other_page in other._pages.items():
+            page = self._pages.get(page_index, None)
+            if page is None:
+                self._pages[page_index] = other_page
+                continue
+            # The page of the bucket both rollups have lines in
+            for i in range(0, PAGE_SIZE * width, width):
+                if other_page[i] == 0:
+                    continue
+                for k in range(i, i + gauge_start):
+                    page[k] += other_page[k]
+                # The latest gauges win
+                page[i + gauge_start : i + width] = other_page[i + gauge_start : i + width]
+        for page_index, other_page in other._variance_pages.items():
+            page = self._variance_pages.get(page_index, None)
+            if page is None:
+                self._variance_pages[page_index] = other_page
+                continue
+            for k, value in enumerate(other_page):
+                page[k] += value
+
+    def _buckets(self):
+        """The (bucket, values, variances) of the buckets holding lines, in time order."""
+        width = self._width
+        n = len(self.counters)
+        for page_index in sorted(self._pages):
+            page = self._pages[page_index]
+            variance_page = self._variance_pages.get(page_index, None)
+            for offset in range(PAGE_SIZE):
+                i = offset * width
+                if page[i] != 0:
+                    variances = None if variance_page is None else variance_page[offset * n : (offset + 1) * n]
+                    yield page_index * PAGE_SIZE + offset, page[i : i + width], variances
+
+    def get_state(self):
+        """The buckets holding lines, as `[bucket, *values, *variances]` lists, saved in checkpoints."""
+        return [[bucket, *values, *(variances or [])] for bucket, values, variances in self._buckets()]
+
+    def set_state(self, state):
+        width = self._width
+        n = len(self.counters)
+        self._pages, self._variance_pages = {}, {}
+        for bucket, *values in state:
+            page_index, offset = divmod(bucket, PAGE_SIZE)
+            page = self._pages.get(page_index, None)
+            if page is None:
+                page = self._pages[page_index] = _new_page(width)
+            page[offset * width : (offset + 1) * width] = array("d", values[:width])
+            if len(values) > width:
+                page = self._variance_pages.get(page_index, None)
+                if page is None:
+                    page = self._variance_pages[page_index] = _new_page(n)
+                page[offset * n : (offset + 1) * n] = array("d", values[width:])
+
+    def _roll_up(self, buckets, factor: int):
+        """The buckets of a resolution `factor` times coarser than `buckets`."""
+        gauge_start = 1 + len(self.counters)
+        rolled_up = []
+        for bucket, values, variances in buckets:
+            bucket //= factor
+            if not rolled_up or rolled_up[-1][0] != bucket:
+                rolled_up.append((bucket, array("d", values), None if variances is None else array("d", variances)))
+                continue
+            _, row, row_variances = rolled_up[-1]
+            for k in range(gauge_start):
+                row[k] += values[k]
+            row[gauge_start:] = values[gauge_start:]
+            if variances is not None:
+                if row_variances is None:
+                    rolled_up[-1] = (bucket, row, array("d", variances))
+                else:
+                    for k, value in enumerate(variances):
+                        row_variances[k] += value
+        return rolled_up
+
+    def report(self, max_points: int = MAX_POINTS):
+        """
+        The buckets holding lines of each resolution, for the charts. A resolution with more than `max_points` of
+        them, but the coarsest, is only reported in the chunks of `CHUNK_SIZE` buckets with the most lines that fit
+        in `max_points` buckets (see `_busiest_chunks`).
+
+        Each resolution is a document of columns: `time` (the start of the buckets in ms since the epoch), `lines`,
+        the counters and the gauges, and the `variance` of the counters if the lines are sampled. The document of a
+        resolution reported in chunks has their `[start, end)` time ranges in ms in `chunks`, adjacent ones merged.
+        """
+        report = {}
+        buckets = list(self._buckets())
+        previous = self.resolutions[0]
+        for tier, resolution in enumerate(self.resolutions):
+            buckets = self._roll_up(buckets, resolution // previous)
+            previous = resolution
+            chunks = None
+            reported = buckets
+            if len(buckets) > max_points and tier < len(self.resolutions) - 1:
+                chunks = self._busiest_chunks(buckets, max_points)
+                if not chunks:
+                    continue
+                reported = [bucket for bucket in buckets if bucket[0] // CHUNK_SIZE in chunks]
+            columns = ["lines"] + self.counters + self.gauges
+            doc = {"resolution": resolution, "time": [bucket * resolution * 1000 for bucket, _, _ in reported]}
+            for k, column in enumerate(columns):
+                doc[column] = [_number(values[k]) for _, values, _ in reported]
+            if self._variance_pages:
+                doc["variance"] = {
+                    counter: [0 if variances is None else _number(variances[k]) for _, _, variances in reported]
+                    for k, counter in enumerate(self.counters)
+                }
+            if chunks is not None:
+                doc["chunks"] = _chunk_ranges(sorted(chunks), resolution)
+            report[str(resolution)] = doc
+        return report
+
+    @staticmethod
+    def _busiest_chunks(buckets, max_points: int):
+        """The chunks of the buckets (bucket // `CHUNK_SIZE`) with the most lines, with at most `max_points` buckets."""
+        lines, sizes = {}, {}
+        for bucket, values, _ in buckets:
+            chunk = bucket // CHUNK_SIZE
+            lines[chunk] = lines.get(chunk, 0) + values[0]
+            sizes[chunk] = sizes.get(chunk, 0) + 1
+        chunks = set()
+        points = 0
+        for chunk in sorted(lines, key=lambda chunk: (-lines[chunk], chunk)):
+            if points + sizes[chunk] <= max_points:
+                chunks.add(chunk)
+                points += sizes[chunk]
+        return chunks
@@ -0,0 +1,66 @@
+"""Stratified sampling of the raw log lines, when `sample_rate` is below 1."""
+
+import random
+from libs.log_analysis.line_filter import HEADER_SIZE, ID_PATTERN
+from libs.log_analysis.reader import TIMESTAMP_PATTERN, TIMESTAMP_SEARCH_SIZE
+
+# Connections accepted/ended and slow queries make up most of a busy log. The other lines, e.g. warnings,
+# state transitions and build info, are rare and items can't do without them, so they are always kept.
+SAMPLED_IDS = [22943, 22944, 51803]
+
+
+def _minute(raw):
+    """The minute of the raw log line, as the timestamp text up to the minute, or None."""
+    match = TIMESTAMP_PATTERN.search(raw, 0, TIMESTAMP_SEARCH_SIZE)
+    if match is None:
+        return None
+    if match.group(1) is not None:
+        return match.group(1)[:16].decode("utf-8", errors="replace")
+    return str(int(match.group(2)) // 60000)
+
+
+class Sampler:
+    """
+    Sample the lines of the high-volume log ids at `rate`, and keep all the other lines.
+
+    The lines are sampled in strata of the same log id and minute. In every stratum, one line out of `1 / rate`
+    is kept, from a random start. So each line is kept with probability `rate`, every minute keeps its share of
+    the lines, and no line is held back. The start is drawn from a generator seeded with `seed`, the log id and
+    the minute, so the same lines are kept in every run.
+    """
+
+    def __init__(self, rate: float, sampled_ids=None, seed=0):
+        self.rate = rate
+        sampled_ids = SAMPLED_IDS if sampled_ids is None else sampled_ids
+        self._sampled_ids = {str(log_id).encode() for log_id in sampled_ids}
+        self._sampled_int_ids = {int(log_id) for log_id in sampled_ids}
+        self._seed = seed
+        # Log id -> (minute, position in the stratum)
+        self._strata = {}
+
+    @classmethod
+    def from_config(cls, config):
+        """The sampler configured by `sample_rate`, `sampled_ids` and `sample_seed`, or None to keep every line."""
+        rate = config.get("sample_rate", 1.0)
+        if rate >= 1.0:
+            return None
+        return cls(rate, config.get("sampled_ids", None), config.get("sample_seed", 0))
+
+    def probability(self, log_id) -> float:
+        """The probability that a line with the log id is kept."""
+        return self.rate if log_id in self._sampled_int_ids else 1.0
+
+    def keep(self, raw) -> bool:
+        match = ID_PATTERN.search(raw, 0, HEADER_SIZE)
+        if match is None or match.group(1) not in self._sampled_ids:
+            return True
+        log_id = match.group(1)
+        minute = _minute(raw)
+        stratum = self._strata.get(log_id, None)
+        if stratum is None or stratum[0] != minute:
+            position = random.Random(f"{self._seed}:{log_id.decode()}:{minute}").random()
+        else:
+            position = stratum[1]
+        self._strata[log_id] = (minute, position + self.rate)
+        # Keep the line whenever the position passes an integer
+        return int(position + self.rate) > int(position)
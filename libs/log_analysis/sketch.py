@@ -0,0 +1,89 @@
+"""
+Quantile sketches of the values of the items, e.g. the durations of the slow queries of a query shape.
+
+A sketch is a log-linear histogram, like HDR histograms: every power of 2 is split into `SUB_BUCKETS` buckets
+of the same width, so a value is known within 1 / `SUB_BUCKETS` of itself (about 3%). Only the buckets holding
+values are kept, and there are at most `SUB_BUCKETS` of them per power of 2 of the 64-bit range, however many
+values are added. Sketches of partial results are merged by adding up their buckets.
+
+The sketch is a plain document, `{"count": n, "max": m, "buckets": {index: count}}`, so it's saved in
+checkpoints and output rows as it is. The bucket indexes are strings, the keys of JSON objects. The buckets are
+a sparse dict rather than a fixed-size array of counters: the durations of a minute fall in a few dozen buckets
+out of the `64 * SUB_BUCKETS` of the range, so the rows only hold those.
+"""
+
+import math
+
+SUB_BUCKETS = 32
+# The quantiles shown in the reports
+QUANTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+
+def new_sketch():
+    return {"count": 0, "max": 0, "buckets": {}}
+
+
+def _index(value) -> int:
+    if value < 1:
+        # Zero, the durations below 1 ms
+        return 0
+    mantissa, exponent = math.frexp(value)
+    return exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+
+
+def _value(index: int):
+    """The middle of the bucket, or the integer in it if it's narrower than 1, e.g. a small duration."""
+    if index == 0:
+        return 0
+    exponent, sub_bucket = divmod(index, SUB_BUCKETS)
+    width = 2.0**exponent / (2 * SUB_BUCKETS)
+    low = 2.0 ** (exponent - 1) + sub_bucket * width
+    if width <= 1:
+        return math.ceil(low)
+    return low + width / 2
+
+
+def add_value(sketch, value, count: int = 1):
+    """Add `count` times the value to the sketch."""
+    key = str(_index(value))
+    buckets = sketch["buckets"]
+    buckets[key] = buckets.get(key, 0) + count
+    sketch["count"] += count
+    if value > sketch["max"]:
+        sketch["max"] = value
+
+
+def merge_sketch(sketch, other):
+    """Add the values of `other` to `sketch`."""
+    buckets = sketch["buckets"]
+    for key, count in other["buckets"].items():
+        buckets[key] = buckets.get(key, 0) + count
+    sketch["count"] += other["count"]
+    sketch["max"] = max(sketch["max"], other["max"])
+
+
+def quantile(sketch, q: float):
+    """The value below which a share `q` of the values fall, or None if the sketch is empty."""
+    if sketch["count"] == 0:
+        return None
+    rank = q * sketch["count"]
+    seen = 0
+    for index in sorted(int(key) for key in sketch["buckets"]):
+        seen += sketch["buckets"][str(index)]
+        if seen >= rank:
+            # The middle of the bucket may be above the largest value
+            return min(_value(index), sketch["max"])
+    return sketch["max"]
+
+
+def summarize(sketch):
+    """The quantiles `QUANTILES` and the maximum of the sketch, rounded for the reports."""
+    summary = {}
+    for name, q in QUANTILES.items():
+        value = quantile(sketch, q)
+        if value is not None:
+            # The decimals of larger values are below the accuracy of the sketch
+            value = round(value) if value >= 10 else round(value, 2)
+        summary[name] = value
+    summary["max"] = sketch["max"]
+    return summary
@@ -0,0 +1,83 @@
+"""
+Extract the features of slow query lines (log id 51803) for the items analyzing slow queries.
+
+The features of a line are extracted once, however many items read them, and cached in its `LogRecord`.
+The query pattern, the most expensive feature, is only computed if an item asks for it.
+"""
+
+from libs.log_analysis.decoder import cached, get_namespace
+from libs.log_analysis.query_analyzer import query_shape
+from libs.utils import json_hash
+
+SLOW_QUERY_ID = 51803
+# The hash of lines without a query pattern
+EMPTY_PATTERN_HASH = json_hash({}, 4)
+
+
+class SlowOp:
+    """The features of a slow query log line."""
+
+    __slots__ = (
+        "ns",
+        "duration",
+        "keys_examined",
+        "docs_examined",
+        "n_returned",
+        "bytes_read",
+        "plan_summary",
+        "has_sort",
+        "_attr",
+        "_is_query",
+        "_query_hash",
+        "_shape",
+    )
+
+    def __init__(self, log_line):
+        attr = log_line.get("attr", {})
+        self.ns = get_namespace(log_line)
+        self.duration = attr.get("durationMillis", 0)
+        self.keys_examined = attr.get("keysExamined", 0)
+        self.docs_examined = attr.get("docsExamined", 0)
+        self.n_returned = attr.get("nreturned", 0)
+        self.bytes_read = _bytes_read(attr)
+        self.plan_summary = attr.get("planSummary", "")
+        self.has_sort = attr.get("hasSortStage", False)
+        self._attr = attr
+        self._is_query = log_line.get("msg", "") == "Slow query"
+        self._query_hash = attr.get("queryHash", "")
+        self._shape = None
+
+    def _query_shape(self):
+        if self._shape is None:
+            self._shape = query_shape(self._attr) if self._is_query else (None, EMPTY_PATTERN_HASH)
+        return self._shape
+
+    @property
+    def query_pattern(self):
+        """The query pattern, see `analyze_query_pattern`."""
+        return self._query_shape()[0]
+
+    @property
+    def query_hash(self):
+        """The `queryHash` of the line, or a hash of the query pattern for commands without one, e.g. getMore."""
+        if self._query_hash == "":
+            self._query_hash = self._query_shape()[1]
+        return self._query_hash
+
+
+def _bytes_read(attr):
+    """The bytes read from disk by the storage engine, `storage.data.bytesRead`."""
+    storage = attr.get("storage", None)
+    data = storage.get("data", None) if isinstance(storage, dict) else None
+    bytes_read = data.get("bytesRead", 0) if isinstance(data, dict) else 0
+    # Nested `$numberLong` values are not converted by the decoder
+    return int(bytes_read["$numberLong"]) if isinstance(bytes_read, dict) else bytes_read
+
+
+def _slow_op(log_line):
+    return SlowOp(log_line) if log_line.get("id", "") == SLOW_QUERY_ID else None
+
+
+def get_slow_op(log_line):
+    """The features of the slow query log line, or None if it's not a slow query."""
+    return cached(log_line, "_slow_op", _slow_op)
@@ -202,8 +202,20 @@ def to_ejson(obj, **kwargs):
     return json.dumps(obj, indent=indent, separators=separators, default=custom_serializer)
 
 
+def _hash_default(o):
+    if isinstance(o, Enum):
+        return o.name
+    if isinstance(o, Version):
+        return str(o)
+    return json_util.default(o)
+
+
+# Reused by `json_hash`, which is called for every client metadata line. The output is the same as `to_ejson`.
+_HASH_ENCODER = json.JSONEncoder(default=_hash_default)
+
+
 def json_hash(data, digest_size=8):
-    json_str = to_ejson(data, indent=None)
+    json_str = _HASH_ENCODER.encode(data)
     h = hashlib.blake2b(json_str.encode("utf-8"), digest_size=digest_size)
     return h.digest().hex().upper()
 
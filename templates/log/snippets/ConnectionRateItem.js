@@ -1,46 +1,65 @@
-var labels = [];
-var created = [];
-var ended = [];
-var total = [];
-data.forEach(d => {
-    labels.push(d.time);
-    created.push(d.created);
-    ended.push(-d.ended);
-    total.push(d.total);
-});
+// The connections over time, from the rollup at the resolution of the visible time range
+function connectionDatasets(tier, from, to) {
+    var datasets = [
+        {
+            label: 'Connections Created',
+            data: rollupPoints(tier, tier.created, from, to),
+            type: 'bar',
+            stack: 'Stack 0',
+            backgroundColor: 'rgba(54, 162, 235, 0.7)'
+        },
+        {
+            label: 'Connections Ended',
+            data: rollupPoints(tier, tier.ended, from, to, -1),
+            type: 'bar',
+            stack: 'Stack 0',
+            backgroundColor: 'rgba(255, 99, 132, 0.7)'
+        },
+        {
+            label: 'Total Connections',
+            data: rollupPoints(tier, tier.total, from, to),
+            type: 'line',
+            borderColor: 'rgba(255, 206, 86, 1)',
+            backgroundColor: 'rgba(255, 206, 86, 0.2)',
+            fill: false,
+            yAxisID: 'y1',
+            tension: 0.3,
+            pointRadius: 2
+        }
+    ];
+    // When the connection logs are sampled, the counters are estimates. Show their 95% confidence interval as a band.
+    // Ended connections are drawn below the axis, `direction` is -1 for them.
+    function ciBand(label, key, color, direction) {
+        var start = rollupRange(tier, from, to)[0];
+        var bounds = [1, -1].map(sign => rollupPoints(tier, tier[key], from, to).map((point, i) => {
+            var margin = 1.96 * Math.sqrt(tier.variance[key][start + i]);
+            return { x: point.x, y: direction * (point.y + sign * margin) };
+        }));
+        return [
+            { label: label, data: bounds[0], type: 'line', fill: '+1', backgroundColor: color, borderWidth: 0, pointRadius: 0 },
+            { label: '', data: bounds[1], type: 'line', fill: false, borderWidth: 0, pointRadius: 0 }
+        ];
+    }
+    if (tier.variance) {
+        datasets.push(...ciBand('Connections Created 95% CI', 'created', 'rgba(54, 162, 235, 0.2)', 1));
+        datasets.push(...ciBand('Connections Ended 95% CI', 'ended', 'rgba(255, 99, 132, 0.2)', -1));
+    }
+    return datasets;
+}
+
+function updateConnectionChart(from, to) {
+    var tier = rollupTier(rollups, from, to);
+    chart1.data.datasets = connectionDatasets(tier, from, to);
+    chart1.options.scales.y.title.text = `Connections per ${tier.resolution}s`;
+    chart1.update('none');
+}
 
+var tier = rollupTier(rollups);
 const ctx = document.getElementById('canvas_{name}').getContext('2d');
 var chart1 = new Chart(ctx, {
     type: 'bar',
     data: {
-        labels: labels,
-        datasets: [
-            {
-                label: 'Connections Created',
-                data: created,
-                type: 'bar',
-                stack: 'Stack 0',
-                backgroundColor: 'rgba(54, 162, 235, 0.7)'
-            },
-            {
-                label: 'Connections Ended',
-                data: ended,
-                type: 'bar',
-                stack: 'Stack 0',
-                backgroundColor: 'rgba(255, 99, 132, 0.7)'
-            },
-            {
-                label: 'Total Connections',
-                data: total,
-                type: 'line',
-                borderColor: 'rgba(255, 206, 86, 1)',
-                backgroundColor: 'rgba(255, 206, 86, 0.2)',
-                fill: false,
-                yAxisID: 'y1',
-                tension: 0.3,
-                pointRadius: 2
-            }
-        ]
+        datasets: connectionDatasets(tier)
     },
     options: {
         responsive: true,
@@ -56,15 +75,22 @@ var chart1 = new Chart(ctx, {
                 position: 'top',
                 labels: {
                     usePointStyle: true,
-                    generateLabels: genDefaultLegendLabels
+                    generateLabels: genDefaultLegendLabels,
+                    filter: item => item.text !== ''
+                }
+            },
+            tooltip: {
+                callbacks: {
+                    title: items => formatTime(items[0].parsed.x)
                 }
             },
-            zoom: ZOOM_OPTIONS
+            zoom: rollupZoomOptions(updateConnectionChart)
         },
         scales: {
+            x: { ...TIME_SCALE },
             y: {
                 beginAtZero: true,
-                title: { display: true, text: 'Connections per minute' }
+                title: { display: true, text: `Connections per ${tier.resolution}s` }
             },
             y1: {
                 beginAtZero: true,
@@ -77,39 +103,64 @@ var chart1 = new Chart(ctx, {
 });
 charts.push(chart1);
 
-var labels = data.map(d => d.time);
+var times = data.map(d => Date.parse(d.time + 'Z'));
 var ipSet = new Set();
 data.forEach(d => Object.keys(d.byIp).forEach(ip => ipSet.add(ip)));
 const ips = Array.from(ipSet);
 
-const datasets_byip = [];
-ips.forEach(ip => {
-    // created
-    datasets_byip.push({
-        label: ip + ' created',
-        data: data.map(d => d.byIp[ip]?.created || 0),
-        stack: "Stack 0"
+// The rows are per minute. Add them up in groups of as many minutes as needed to show at most MAX_DATA_POINTS
+// groups in the visible time range.
+function ipDatasets(from, to) {
+    var rows = data.filter((d, i) => {
+        return (from === undefined || times[i] >= from - 60000) && (to === undefined || times[i] <= to);
     });
-    // ended
-    datasets_byip.push({
-        label: ip + ' ended',
-        data: data.map(d => -(d.byIp[ip]?.ended || 0)),
-        stack: "Stack 0"
+    var rowTimes = rows.map(d => Date.parse(d.time + 'Z'));
+    var span = rowTimes.length ? rowTimes[rowTimes.length - 1] - rowTimes[0] : 0;
+    var groupMs = 60000 * Math.ceil((span / 60000 + 1) / MAX_DATA_POINTS);
+    var groups = new Map();
+    rows.forEach((d, i) => {
+        var time = Math.floor(rowTimes[i] / groupMs) * groupMs;
+        if (!groups.has(time)) {
+            groups.set(time, {});
+        }
+        var group = groups.get(time);
+        Object.entries(d.byIp).forEach(([ip, val]) => {
+            group[ip] = group[ip] || { created: 0, ended: 0 };
+            group[ip].created += val.created || 0;
+            group[ip].ended += val.ended || 0;
+        });
     });
-});
+    var datasets = [];
+    ips.forEach(ip => {
+        // created
+        datasets.push({
+            label: ip + ' created',
+            data: Array.from(groups, ([time, group]) => ({ x: time, y: group[ip]?.created || 0 })),
+            type: 'bar',
+            stack: "Stack 0"
+        });
+        // ended
+        datasets.push({
+            label: ip + ' ended',
+            data: Array.from(groups, ([time, group]) => ({ x: time, y: -(group[ip]?.ended || 0) })),
+            type: 'bar',
+            stack: "Stack 0"
+        });
+    });
+    return datasets;
+}
+
+function updateIpChart(from, to) {
+    chart2.data.datasets = ipDatasets(from, to);
+    chart2.update('none');
+}
 
 const ctx_byip = document.getElementById('canvas_{name}_byip').getContext('2d');
-const displayLegend = datasets_byip.length <= MAX_LEGENDS;
+const displayLegend = ips.length * 2 <= MAX_LEGENDS;
 var chart2 = new Chart(ctx_byip, {
     type: 'bar',
     data: {
-        labels: labels,
-        datasets: datasets_byip.map(ds => ({
-            label: ds.label,
-            data: ds.data,
-            type: 'bar',
-            stack: ds.stack
-        }))
+        datasets: ipDatasets()
     },
     options: {
         plugins: {
@@ -125,14 +176,19 @@ var chart2 = new Chart(ctx_byip, {
                     generateLabels: genDefaultLegendLabels
                 }
             },
-            zoom: ZOOM_OPTIONS
+            tooltip: {
+                callbacks: {
+                    title: items => formatTime(items[0].parsed.x)
+                }
+            },
+            zoom: rollupZoomOptions(updateIpChart)
         },
         responsive: true,
         animation: {
             duration: ANIMATION_DURATION
         },
         scales: {
-            x: { stacked: true },
+            x: { ...TIME_SCALE, stacked: true },
             y: {
                 stacked: true,
                 beginAtZero: true,
@@ -146,4 +202,6 @@ charts.push(chart2);
 resetButton.onclick = function () {
     chart1.resetZoom();
     chart2.resetZoom();
+    updateConnectionChart();
+    updateIpChart();
 }
\ No newline at end of file
@@ -1,37 +1,73 @@
-var bar_labels = [];
-var count = [];
-var total_slow_ms = [];
-data.forEach(d => {
-    bar_labels.push(d.time);
-    count.push(d.count);
-    total_slow_ms.push(d.total_slow_ms);
-});
+// The slow queries over time, from the rollup at the resolution of the visible time range
+function slowDatasets(tier, from, to) {
+    var datasets = [
+        {
+            label: 'Slow Count',
+            data: rollupPoints(tier, tier.count, from, to),
+            type: 'bar',
+            backgroundColor: 'rgba(54, 162, 235, 0.7)',
+            yAxisID: 'y'
+        },
+        {
+            label: 'Total Slow (ms)',
+            data: rollupPoints(tier, tier.total_slow_ms, from, to),
+            type: 'line',
+            borderColor: 'rgba(255, 99, 132, 1)',
+            backgroundColor: 'rgba(255, 99, 132, 0.2)',
+            fill: false,
+            yAxisID: 'y1',
+            tension: 0.3,
+            pointRadius: 2
+        }
+    ];
+    // When the slow queries are sampled, the counters are estimates. Show their 95% confidence interval as a band.
+    function ciBand(label, key, color, yAxisID) {
+        var start = rollupRange(tier, from, to)[0];
+        var bounds = [1, -1].map(sign => rollupPoints(tier, tier[key], from, to).map((point, i) => {
+            var margin = 1.96 * Math.sqrt(tier.variance[key][start + i]);
+            return { x: point.x, y: point.y + sign * margin };
+        }));
+        return [
+            { label: label, data: bounds[0], type: 'line', fill: '+1', backgroundColor: color, borderWidth: 0, pointRadius: 0, yAxisID: yAxisID },
+            { label: '', data: bounds[1], type: 'line', fill: false, borderWidth: 0, pointRadius: 0, yAxisID: yAxisID }
+        ];
+    }
+    if (tier.variance) {
+        datasets.push(...ciBand('Slow Count 95% CI', 'count', 'rgba(54, 162, 235, 0.2)', 'y'));
+        datasets.push(...ciBand('Total Slow (ms) 95% CI', 'total_slow_ms', 'rgba(255, 99, 132, 0.2)', 'y1'));
+    }
+    // The latency percentiles of each minute, from the sketches of the durations. Decimated by Chart.js.
+    var percentileColors = { p50: 'rgba(75, 192, 192, 1)', p95: 'rgba(255, 159, 64, 1)', p99: 'rgba(153, 102, 255, 1)' };
+    Object.entries(percentileColors).forEach(([p, color]) => {
+        datasets.push({
+            label: `${p} (ms)`,
+            data: data.filter(d => d.quantiles).map(d => ({ x: Date.parse(d.time + 'Z'), y: d.quantiles[p] })),
+            type: 'line',
+            parsing: false,
+            borderColor: color,
+            backgroundColor: color,
+            borderDash: [4, 2],
+            fill: false,
+            yAxisID: 'y2',
+            pointRadius: 1
+        });
+    });
+    return datasets;
+}
 
+function updateSlowChart(from, to) {
+    var tier = rollupTier(rollups, from, to);
+    chart1.data.datasets = slowDatasets(tier, from, to);
+    chart1.options.scales.y.title.text = `Count per ${tier.resolution}s`;
+    chart1.update('none');
+}
+
+var tier = rollupTier(rollups);
 const ctx = document.getElementById('canvas_{name}').getContext('2d');
 chart1 = new Chart(ctx, {
     type: 'bar',
     data: {
-        labels: bar_labels,
-        datasets: [
-            {
-                label: 'Slow Count',
-                data: count,
-                type: 'bar',
-                backgroundColor: 'rgba(54, 162, 235, 0.7)',
-                yAxisID: 'y'
-            },
-            {
-                label: 'Total Slow (ms)',
-                data: total_slow_ms,
-                type: 'line',
-                borderColor: 'rgba(255, 99, 132, 1)',
-                backgroundColor: 'rgba(255, 99, 132, 0.2)',
-                fill: false,
-                yAxisID: 'y1',
-                tension: 0.3,
-                pointRadius: 2
-            }
-        ]
+        datasets: slowDatasets(tier)
     },
     options: {
         responsive: true,
@@ -43,21 +79,38 @@ chart1 = new Chart(ctx, {
                 position: 'top',
                 labels: {
                     usePointStyle: true,
-                    generateLabels: genDefaultLegendLabels
+                    generateLabels: genDefaultLegendLabels,
+                    filter: item => item.text !== ''
+                }
+            },
+            tooltip: {
+                callbacks: {
+                    title: items => formatTime(items[0].parsed.x)
                 }
             },
-            zoom: ZOOM_OPTIONS
+            decimation: {
+                enabled: true,
+                algorithm: 'min-max'
+            },
+            zoom: rollupZoomOptions(updateSlowChart)
         },
         scales: {
+            x: { ...TIME_SCALE },
             y: {
                 beginAtZero: true,
-                title: { display: true, text: 'Count' }
+                title: { display: true, text: `Count per ${tier.resolution}s` }
             },
             y1: {
                 beginAtZero: true,
                 position: 'right',
                 title: { display: true, text: 'Total Slow (ms)' },
                 grid: { drawOnChartArea: false }
+            },
+            y2: {
+                beginAtZero: true,
+                position: 'right',
+                title: { display: true, text: 'Latency (ms)' },
+                grid: { drawOnChartArea: false }
             }
         }
     }
@@ -140,4 +193,5 @@ var chart3 = new Chart(ctx_byns_ms, {
 charts.push(chart3);
 resetButton.onclick = function () {
     chart1.resetZoom();
+    updateSlowChart();
 }
\ No newline at end of file
@@ -20,4 +20,31 @@ for (var i = 0; i < anchors.length; i++) {
         hljs.highlightElement(sample);
         sample.scrollIntoView({behavior: "smooth"});
     });
-}
\ No newline at end of file
+}
+
+// Show the top N of a ranking, in its order. Rows not in its top N are hidden.
+var rankings = document.getElementById("top_slow_rankings").getElementsByTagName("a");
+var body = table.tBodies[0];
+var rows = Array.prototype.slice.call(body.rows);
+function rankBy(key) {
+    var ranked = [];
+    for (var i = 0; i < rows.length; i++) {
+        var rank = (data[i].ranks || {})[key];
+        rows[i].style.display = rank === undefined ? "none" : "";
+        ranked.push({row: rows[i], rank: rank === undefined ? Infinity : rank});
+    }
+    ranked.sort(function(a, b) { return a.rank - b.rank; });
+    for (var i = 0; i < ranked.length; i++) {
+        body.appendChild(ranked[i].row);
+    }
+    for (var i = 0; i < rankings.length; i++) {
+        rankings[i].style.fontWeight = rankings[i].dataset.ranking == key ? "bold" : "normal";
+    }
+}
+for (var i = 0; i < rankings.length; i++) {
+    rankings[i].addEventListener("click", function(event) {
+        event.preventDefault();
+        rankBy(this.dataset.ranking);
+    });
+}
+rankBy("count");
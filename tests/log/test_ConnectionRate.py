@@ -43,3 +43,9 @@ def test_connection_rate_item():
     assert result["total"] == 20
     assert result["byIp"]["127.0.0.1"]["created"] == 1
     assert result["byIp"]["127.0.0.1"]["ended"] == 0
+
+    # The rollup of the hour holds both minutes, with the latest number of connections
+    hours = item._script_data()["rollups"]["3600"]
+    assert hours["created"] == [2, 1]
+    assert hours["ended"] == [1, 0]
+    assert hours["total"] == [2, 20]
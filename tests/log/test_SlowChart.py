@@ -33,3 +33,21 @@ def test_slow_chart_item():
     result = output[2]
     assert result["attr"]["ns"] == "admin.$cmd"
     assert result["attr"]["durationMillis"] == 0
+
+
+def test_slow_chart_item_buffered_output(tmp_path):
+    (tmp_path / "snapshot").mkdir()
+    item = SlowChartItem(output_folder=str(tmp_path), config={})
+    for log in LOGS:
+        item.analyze(log)
+    # The rows are buffered in the open output file, and flushed when read back
+    assert item._writer is not None
+    assert [row["t"] for row in item._read_output()] == [log["t"] for log in LOGS]
+    snapshot = item.snapshot(str(tmp_path / "snapshot"))
+    assert snapshot._writer is None
+    assert len(list(snapshot._read_output())) == len(LOGS)
+    item.finalize_analysis()
+    assert item._writer is None
+    with open(item._output_file, "r", encoding="utf-8") as f:
+        rows = [json_util.loads(line) for line in f]
+    assert rows == LOGS
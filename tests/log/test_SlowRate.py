@@ -1,5 +1,7 @@
+import io
 from bson import json_util
 from libs.log_analysis.log_items.slow_rate_item import SlowRateItem
+from libs.log_analysis.sampler import Sampler
 from tests.log.mocking import gen_mock_write_output
 
 LOGS = [
@@ -52,3 +54,81 @@ def test_slow_rate_item():
     assert result["time"].isoformat() == "2025-09-25T21:56:00"
     assert result["total_slow_ms"] == 4
     assert result["count"] == 2
+
+
+def test_slow_rate_item_quantiles():
+    item = SlowRateItem(output_folder="/tmp", config={})
+    output, item._write_output = gen_mock_write_output(item)
+    for log in LOGS:
+        item.analyze(log)
+    item.finalize_analysis()
+
+    durations = [log["attr"]["durationMillis"] for log in LOGS[2:5]]
+    quantiles = output[1]["quantiles"]
+    assert quantiles["max"] == max(durations)
+    assert quantiles["p50"] == sorted(durations)[1]
+    assert output[1]["byNs"]["admin.$cmd"]["quantiles"]["max"] == max(durations)
+
+
+def test_slow_rate_item_merge(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    item = SlowRateItem(output_folder=str(tmp_path / "a"), config={})
+    other = SlowRateItem(output_folder=str(tmp_path / "b"), config={})
+    # Split in the middle of the 21:41 bucket
+    for log in LOGS[:3]:
+        item.analyze(log)
+    for log in LOGS[3:]:
+        other.analyze(log)
+    item.merge(other)
+    item.finalize_analysis()
+
+    output = list(item._read_output())
+    assert len(output) == 3
+    assert [result["count"] for result in output] == [2, 3, 2]
+    assert [result["total_slow_ms"] for result in output] == [4, 5, 4]
+    assert output[1]["byNs"]["admin.$cmd"]["count"] == 3
+    # The sketches of the split bucket are merged too
+    assert output[1]["sketch"]["count"] == 3
+    assert output[1]["byNs"]["admin.$cmd"]["sketch"]["count"] == 3
+    # And the rollups charted at other resolutions
+    minutes = item._script_data()["rollups"]["60"]
+    assert minutes["count"] == [2, 3, 2]
+    assert minutes["total_slow_ms"] == [4, 5, 4]
+    # Only the percentiles of the sketches are reported
+    report = io.StringIO()
+    item.review_results_markdown(report)
+    assert '"quantiles"' in report.getvalue()
+    assert '"sketch"' not in report.getvalue()
+
+
+def test_slow_rate_item_snapshot(tmp_path):
+    (tmp_path / "snapshot").mkdir()
+    item = SlowRateItem(output_folder=str(tmp_path), config={})
+    for log in LOGS[:5]:
+        item.analyze(log)
+    snapshot = item.snapshot(str(tmp_path / "snapshot"))
+    snapshot.finalize_analysis()
+    assert [result["count"] for result in snapshot._read_output()] == [2, 3]
+    # The item keeps analyzing as if there was no snapshot
+    for log in LOGS[5:]:
+        item.analyze(log)
+    item.finalize_analysis()
+    assert [result["count"] for result in item._read_output()] == [2, 3, 2]
+
+
+def test_slow_rate_item_sampled():
+    item = SlowRateItem(output_folder="/tmp", config={})
+    item.sampler = Sampler(0.5)
+    output, item._write_output = gen_mock_write_output(item)
+    # Each analyzed line stands for 2 slow queries
+    for log in LOGS:
+        item.analyze(log)
+    item.finalize_analysis()
+
+    result = output[0]
+    assert result["count"] == 4
+    assert result["total_slow_ms"] == 8
+    assert result["variance"] == {"count": 4, "total_slow_ms": 32}
+    assert result["byNs"]["admin.$cmd"]["count"] == 2
+    assert result["byNs"]["admin.$cmd"]["variance"] == {"count": 2, "total_slow_ms": 32}
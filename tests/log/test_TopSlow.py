@@ -1,3 +1,4 @@
+import copy
 from bson import json_util
 from libs.log_analysis.log_items.top_slow_item import TopSlowItem
 from tests.log.mocking import gen_mock_write_output
@@ -40,3 +41,51 @@ def test_top_slow_item():
     assert result["count"] == 1
     assert result["ns"] == "Restaurant.pizzas"
     assert result["duration"] == 20
+
+
+def test_top_slow_item_quantiles():
+    item = TopSlowItem(output_folder="/tmp", config={})
+    other = TopSlowItem(output_folder="/tmp", config={})
+    output, item._write_output = gen_mock_write_output(item)
+    item.analyze(LOGS[1])
+    other.analyze(LOGS[3])
+    item.merge(other)
+    item.finalize_analysis()
+
+    quantiles = output[0]["quantiles"]
+    assert quantiles["duration"] == {"p50": 10, "p95": 40, "p99": 40, "max": 40}
+    assert quantiles["docs_examined"]["max"] == 1
+    assert "sketches" not in output[0]
+
+
+def test_top_slow_item_capacity():
+    item = TopSlowItem(output_folder="/tmp", config={"top": 1, "capacity": 1})
+    output, item._write_output = gen_mock_write_output(item)
+    for log in LOGS:
+        item.analyze(log)
+    item.finalize_analysis()
+
+    # The find query was evicted for the getMore, which inherits its count as the error
+    assert len(output) == 1
+    result = output[0]
+    assert result["query_hash"] == "7178B674"
+    assert result["count"] == 2
+    assert result["error"]["count"] == 1
+
+
+def test_top_slow_item_rankings():
+    item = TopSlowItem(output_folder="/tmp", config={"top": 1, "cost_weights": {"duration": 0, "docs_examined": 1}})
+    output, item._write_output = gen_mock_write_output(item)
+    find = copy.deepcopy(LOGS[0])
+    find["attr"]["durationMillis"] = 100
+    for log in [find] + LOGS[1:]:
+        item.analyze(log)
+    item.finalize_analysis()
+
+    # The getMore is the top 1 by count and cost, the find by duration
+    assert [result["query_hash"] for result in output] == ["7178B674", "904CC0B3"]
+    assert output[0]["ranks"]["count"] == 1
+    assert output[0]["ranks"]["cost"] == 1
+    assert output[0]["cost"] == 2
+    assert output[1]["ranks"]["duration"] == 1
+    assert "duration" not in output[0]["ranks"]
@@ -0,0 +1,68 @@
+import time
+import pytest
+from libs.log_analysis import budget
+from libs.log_analysis.budget import MIN_RATE, Pacer, parse_duration, plan
+from libs.log_analysis.sampler import Sampler
+
+
+def test_parse_duration():
+    assert parse_duration("120s") == 120
+    assert parse_duration("2m") == 120
+    assert parse_duration("1.5h") == 5400
+    assert parse_duration("90") == 90
+    assert parse_duration(30) == 30
+    assert parse_duration(None) is None
+    for value in ["soon", "0s", "-5s", "2d"]:
+        with pytest.raises(ValueError):
+            parse_duration(value)
+
+
+def test_plan():
+    # 100 MB/s analyzing every line, 400 MB/s skipping the high-volume lines
+    full_speed, scan_speed = 100e6, 400e6
+    assert plan(10, 1e9, full_speed, scan_speed) == (1.0, 1.0)
+    # 1 GB is scanned in 2.5s, the remaining 2.5s are enough for a third of the 7.5s of analysis
+    assert plan(5, 1e9, full_speed, scan_speed) == (0.333, 1.0)
+    # Scanning alone takes too long, only the most recent part of the log is analyzed
+    rate, fraction = plan(1, 1e9, full_speed, scan_speed)
+    assert rate == MIN_RATE
+    assert fraction == pytest.approx(1 / (2.5 + MIN_RATE * 7.5))
+    # Skipping lines doesn't help if all lines are analyzed anyway
+    rate, fraction = plan(5, 1e9, full_speed, full_speed)
+    assert (rate, fraction) == (MIN_RATE, 0.5)
+
+
+def _slow_lines(count, seconds):
+    for _ in range(count):
+        time.sleep(seconds)
+        yield b"x" * 99 + b"\n"
+
+
+def test_pacer(monkeypatch):
+    monkeypatch.setattr(budget, "CHECK_LINES", 1)
+    monkeypatch.setattr(budget, "REPLAN_SECONDS", 0.01)
+    # 1 MB planned at 1 MB/s in 1s, but a line of 100 bytes takes 1 ms: 10 times slower
+    sampler = Sampler(0.5)
+    pacer = Pacer(time.monotonic() + 1, 1000000, 1e6, 1e7, 1e9, sampler)
+    assert len(list(pacer.lines(_slow_lines(50, 0.001)))) == 50
+    assert not pacer.stopped
+    assert pacer.rates[0] < 0.5 and pacer.rates[1] == 0.5
+    assert pacer.bytes == 5000
+    # Faster than planned, up to the highest rate
+    sampler = Sampler(0.1)
+    pacer = Pacer(time.monotonic() + 10, 10000, 1e3, 1e4, 1e9, sampler, max_rate=0.8)
+    list(pacer.lines(_slow_lines(50, 0.001)))
+    assert sampler.rate == 0.8
+    assert pacer.rates == (0.1, 0.8)
+
+
+def test_pacer_deadline(monkeypatch):
+    monkeypatch.setattr(budget, "CHECK_LINES", 1)
+    pacer = Pacer(time.monotonic() + 0.05, 10000, 1e6, 1e7, 1e9)
+    assert 0 < len(list(pacer.lines(_slow_lines(100, 0.001)))) < 100
+    assert pacer.stopped
+    # The report of the lines analyzed takes 1 ms per 100 bytes, so the lines stop earlier
+    pacer = Pacer(time.monotonic() + 0.05, 10000, 1e6, 1e7, 1e5)
+    lines = list(pacer.lines(_slow_lines(100, 0.001)))
+    assert pacer.stopped and len(lines) < 30
+    assert pacer.report_seconds == pytest.approx(len(lines) * 0.001)
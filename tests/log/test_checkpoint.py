@@ -0,0 +1,89 @@
+import os
+from libs.log_analysis.checkpoint import Checkpoint
+from libs.log_analysis.framework import _ingest
+from libs.log_analysis.log_items.slow_rate_item import SlowRateItem
+from libs.log_analysis.log_items.state_trace_item import StateTraceItem
+from libs.log_analysis.log_items.wef_item import WEFItem
+from libs.log_analysis.reader import read_lines
+
+LINES = [
+    b'{"t":{"$date":"2025-09-25T23:41:00.000+02:00"},"s":"I","c":"REPL","id":4615611,'
+    b'"msg":"Starting","attr":{"host":"db1","port":27017}}\n',
+    b'{"t":{"$date":"2025-09-25T23:41:10.000+02:00"},"s":"W","c":"NETWORK","id":4615610,"msg":"Warning"}\n',
+    b'{"t":{"$date":"2025-09-25T23:41:20.000+02:00"},"s":"I","c":"COMMAND","id":51803,"msg":"Slow query",'
+    b'"attr":{"ns":"test.a","durationMillis":100}}\n',
+    b'{"t":{"$date":"2025-09-25T23:41:30.000+02:00"},"s":"I","c":"REPL","id":20722,'
+    b'"msg":"New state","attr":{"memberState":"PRIMARY"}}\n',
+    b'{"t":{"$date":"2025-09-25T23:41:40.000+02:00"},"s":"I","c":"COMMAND","id":51803,"msg":"Slow query",'
+    b'"attr":{"ns":"test.a","durationMillis":200}}\n',
+    b'{"t":{"$date":"2025-09-25T23:42:10.000+02:00"},"s":"W","c":"NETWORK","id":4615610,"msg":"Warning",'
+    b'"attr":{"count":{"$numberLong":"5"}}}\n',
+    b'{"t":{"$date":"2025-09-25T23:42:20.000+02:00"},"s":"I","c":"COMMAND","id":51803,"msg":"Slow query",'
+    b'"attr":{"ns":"test.b","durationMillis":300}}\n',
+]
+SETTINGS = {"logset": "default", "since": None}
+
+
+def _create_items(folder):
+    os.makedirs(folder, exist_ok=True)
+    return [WEFItem(folder, {}), SlowRateItem(folder, {}), StateTraceItem(folder, {})]
+
+
+def _finalize(items):
+    rows = {}
+    for item in items:
+        item.finalize_analysis()
+        rows[item.__class__.__name__] = list(item._read_output())
+    return rows
+
+
+def _analyze(log_file, checkpoint, folder):
+    """Resume from the checkpoint, analyze the rest of the file and save a new checkpoint."""
+    items = _create_items(folder)
+    offset, log_start, log_end = checkpoint.restore(items, log_file) or (0, None, None)
+    first, last = _ingest(items, read_lines(log_file, offset))
+    checkpoint.save(items, log_file, os.path.getsize(log_file), log_start or first, last or log_end)
+    return items, log_start or first, last or log_end
+
+
+def test_checkpoint_resume(tmp_path):
+    log_file = str(tmp_path / "mongod.log")
+    with open(log_file, "wb") as f:
+        f.write(b"".join(LINES))
+    items, expected_start, expected_end = _analyze(log_file, Checkpoint(str(tmp_path / "full")), tmp_path / "a")
+    expected = _finalize(items)
+
+    # Every split of the log gives the same result as analyzing it at once
+    for split in range(len(LINES)):
+        checkpoint = Checkpoint(str(tmp_path / f"cp{split}"), SETTINGS)
+        with open(log_file, "wb") as f:
+            f.write(b"".join(LINES[:split]))
+        _analyze(log_file, checkpoint, tmp_path / "b")
+        with open(log_file, "ab") as f:
+            f.write(b"".join(LINES[split:]))
+        items, log_start, log_end = _analyze(log_file, checkpoint, tmp_path / "b")
+        assert (log_start, log_end) == (expected_start, expected_end)
+        assert _finalize(items) == expected
+
+
+def test_checkpoint_invalidation(tmp_path):
+    log_file = str(tmp_path / "mongod.log")
+    with open(log_file, "wb") as f:
+        f.write(b"".join(LINES[:4]))
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint"), SETTINGS)
+    _analyze(log_file, checkpoint, tmp_path / "a")
+    assert checkpoint.restore(_create_items(tmp_path / "b"), log_file)[0] == os.path.getsize(log_file)
+    # Other settings
+    assert Checkpoint(checkpoint.folder, {"logset": "other"}).restore(_create_items(tmp_path / "b"), log_file) is None
+    # A new version of an item state
+    items = _create_items(tmp_path / "b")
+    items[1].STATE_VERSION += 1
+    assert checkpoint.restore(items, log_file) is None
+    # Truncated
+    with open(log_file, "wb") as f:
+        f.write(LINES[0])
+    assert checkpoint.restore(_create_items(tmp_path / "b"), log_file) is None
+    # Rewritten with other lines of the same size
+    with open(log_file, "wb") as f:
+        f.write(b"".join(LINES[:4]).replace(b"23:41", b"23:51"))
+    assert checkpoint.restore(_create_items(tmp_path / "b"), log_file) is None
@@ -0,0 +1,114 @@
+import pytest
+from bson import json_util
+from libs.log_analysis import decoder
+from libs.log_analysis.framework import _ingest
+from libs.log_analysis.log_items.slow_rate_item import SlowRateItem
+from libs.log_analysis.log_items.top_slow_item import TopSlowItem
+from libs.utils import get_script_path
+
+
+def test_loads():
+    raw = b'{"t":{"$date":"2025-09-25T23:41:05.344+02:00"},"s":"I",  "c":"COMMAND",  "id":51803,   "ctx":"conn26","msg":"Slow query","attr":{"ns":"Restaurant.pizzas","cursorid":{"$numberLong":"4878020600984711450"},"command":{"lsid":{"id":{"$uuid":"eef6660c-6ef9-4492-a285-fab357f0b335"}}},"durationMillis":20}}\n'
+    log_line = decoder.loads(raw)
+    expected = json_util.loads(raw.decode())
+    assert log_line["t"] == expected["t"]
+    assert log_line["t"].isoformat() == "2025-09-25T21:41:05.344000"
+    assert log_line["attr"]["cursorid"] == expected["attr"]["cursorid"]
+    assert log_line["attr"]["durationMillis"] == 20
+    # Nested extended JSON values are kept as they are
+    assert log_line["attr"]["command"]["lsid"]["id"] == {"$uuid": "eef6660c-6ef9-4492-a285-fab357f0b335"}
+    assert decoder.decode_ejson(log_line["attr"]["command"]) == expected["attr"]["command"]
+    # Lines from the memory-mapped reader and text lines
+    assert decoder.loads(memoryview(raw)) == log_line
+    assert decoder.loads(raw.decode()) == log_line
+
+
+def test_parse_date():
+    assert decoder.parse_date("2025-09-25T21:41:05.344Z").isoformat() == "2025-09-25T21:41:05.344000"
+    assert decoder.parse_date({"$numberLong": "1758836465344"}).isoformat() == "2025-09-25T21:41:05.344000"
+
+
+def test_loads_same_as_json_util():
+    with open(get_script_path("misc/example.log"), "rb") as f:
+        for raw in f:
+            try:
+                expected = json_util.loads(raw.decode())
+            except Exception:
+                # json_util fails on some dates out of range
+                continue
+            log_line = decoder.loads(raw)
+            assert decoder.decode_ejson(log_line) == expected
+
+
+def test_log_record_lazy_body():
+    import json
+    import pickle
+
+    raw = b'{"t":{"$date":"2025-09-25T23:39:51.199+02:00"},"s":"I",  "c":"NETWORK",  "id":22943,   "ctx":"listener","msg":"Connection accepted","attr":{"remote":"127.0.0.1:51011","connectionCount":{"$numberLong":"1"}}}\n'
+    log_line = decoder.loads(raw)
+    assert log_line._raw_body is not None
+    assert log_line.get("id") == 22943
+    assert log_line["msg"] == "Connection accepted"
+    # Still not decoded after reading the header
+    assert log_line._raw_body is not None
+    # Pickling keeps the body raw
+    copied = pickle.loads(pickle.dumps(log_line))
+    assert copied._raw_body is not None
+    assert copied == log_line
+    assert log_line.get("attr", {})["connectionCount"] == 1
+    assert log_line._raw_body is None
+    assert list(log_line.keys()) == ["t", "s", "c", "id", "ctx", "msg", "attr"]
+
+    log_line = decoder.loads(raw)
+    assert log_line["attr"]["remote"] == "127.0.0.1:51011"
+    log_line = decoder.loads(raw)
+    assert "attr" in log_line
+    log_line = decoder.loads(raw)
+    # `json.dumps` serializes the whole line
+    assert json.loads(json.dumps(log_line, default=str))["attr"]["remote"] == "127.0.0.1:51011"
+
+    # `,"attr":` in the message falls back to decoding the whole line
+    raw = b'{"t":{"$date":"2025-09-25T23:39:51.199+02:00"},"s":"I","id":1,"msg":"a,\\"attr\\":b","attr":{"x":1}}'
+    log_line = decoder.loads(raw)
+    assert log_line["msg"] == 'a,"attr":b'
+    assert log_line["attr"] == {"x": 1}
+
+
+def test_log_record_truncated_body():
+    raw = b'{"t":{"$date":"2025-09-25T23:39:51.199+02:00"},"s":"I","c":"NETWORK","id":22943,"ctx":"listener","msg":"Connection accepted","attr":{"remote":"127.0.0.1:5'
+    log_line = decoder.loads(raw)
+    assert log_line["id"] == 22943
+    # Every access fails, not only the first one
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            log_line.get("attr", {})
+    assert log_line.invalid_body
+
+
+def test_ingest_skips_invalid_body(tmp_path):
+    valid = b'{"t":{"$date":"2025-09-25T23:41:05.344+02:00"},"s":"I","c":"COMMAND","id":51803,"ctx":"conn26","msg":"Slow query","attr":{"type":"command","ns":"Restaurant.pizzas","durationMillis":20}}'
+    truncated = valid[:-40]
+    items = [SlowRateItem(str(tmp_path), {}), TopSlowItem(str(tmp_path), {})]
+    _ingest(items, [valid, truncated, valid])
+    assert items[0]._cache["count"] == 2
+    assert items[0]._cache["byNs"] == {"Restaurant.pizzas": items[0]._cache["byNs"]["Restaurant.pizzas"]}
+    assert sum(query["count"] for query in items[1]._cache.values()) == 2
+
+
+def test_derived_values():
+    raw = b'{"t":{"$date":"2025-09-25T23:39:51.199+02:00"},"s":"I",  "c":"NETWORK",  "id":22943,   "ctx":"listener","msg":"Connection accepted","attr":{"remote":"127.0.0.1:51011","ns":"test.a"}}\n'
+    for log_line in [decoder.loads(raw), json_util.loads(raw.decode())]:
+        # The minute is in UTC, whatever the local timezone
+        assert decoder.get_minute(log_line).isoformat() == "2025-09-25T21:39:00"
+        assert decoder.get_epoch_ms(log_line) == 1758836391199
+        assert decoder.get_namespace(log_line) == "test.a"
+        assert decoder.get_remote_ip(log_line) == "127.0.0.1"
+    # Computed once per record
+    log_line = decoder.loads(raw)
+    assert decoder.get_minute(log_line) is decoder.get_minute(log_line)
+    assert log_line._minute is not decoder._UNSET
+    # Missing values
+    log_line = decoder.loads(b'{"s":"I","id":1,"attr":{}}')
+    assert decoder.get_minute(log_line) is None
+    assert decoder.get_namespace(log_line, "unknown") == "unknown"
+    assert decoder.get_remote_ip({}, "unknown") == "unknown"
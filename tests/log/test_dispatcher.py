@@ -0,0 +1,33 @@
+from libs.log_analysis.dispatcher import Dispatcher
+from libs.log_analysis.log_items.connection_rate_item import ConnectionRateItem
+from libs.log_analysis.log_items.slow_rate_item import SlowRateItem
+from libs.log_analysis.log_items.state_trace_item import StateTraceItem
+from libs.log_analysis.log_items.wef_item import WEFItem
+
+
+class AllLinesItem:
+    name = "All Lines"
+
+
+def test_dispatcher():
+    slow_rate = SlowRateItem(output_folder="/tmp", config={})
+    conn_rate = ConnectionRateItem(output_folder="/tmp", config={})
+    wef = WEFItem(output_folder="/tmp", config={})
+    state_trace = StateTraceItem(output_folder="/tmp", config={})
+    dispatcher = Dispatcher([slow_rate, conn_rate, wef, state_trace])
+
+    assert dispatcher.route(51803, "I") == (slow_rate,)
+    assert dispatcher.route(22944, "I") == (conn_rate,)
+    assert dispatcher.route(51803, "W") == (slow_rate, wef)
+    assert dispatcher.route(21358, "I") == (state_trace,)
+    assert dispatcher.route(12345, "I") == ()
+    assert not dispatcher.has_wildcard
+    assert {51803, 22943, 22944, 21358}.issubset(dispatcher.log_ids)
+    assert dispatcher.severities == {"W", "E", "F"}
+
+    # Items without LOG_IDS and SEVERITIES receive every line
+    all_lines = AllLinesItem()
+    dispatcher = Dispatcher([all_lines, slow_rate])
+    assert dispatcher.has_wildcard
+    assert dispatcher.route(12345, "I") == (all_lines,)
+    assert dispatcher.route(51803, "I") == (all_lines, slow_rate)
@@ -0,0 +1,25 @@
+from libs.log_analysis.estimator import Z_95, add_sample, margin, merge_estimates
+
+
+def test_add_sample():
+    doc = {"count": 0, "total": 0}
+    add_sample(doc, "count", 1)
+    add_sample(doc, "total", 5)
+    # Not sampled, the totals are exact
+    assert doc == {"count": 1, "total": 5}
+    assert margin(doc, "count") == 0
+    add_sample(doc, "count", 1, 0.25)
+    add_sample(doc, "total", 2, 0.25)
+    assert doc["count"] == 5 and doc["total"] == 13
+    assert doc["variance"] == {"count": 12, "total": 48}
+    assert margin(doc, "total") == Z_95 * 48**0.5
+
+
+def test_merge_estimates():
+    doc = {"count": 1}
+    other = {"count": 0}
+    add_sample(other, "count", 1, 0.5)
+    merge_estimates(doc, other, ["count"])
+    assert doc == {"count": 3, "variance": {"count": 2}}
+    merge_estimates(doc, other, ["count"])
+    assert doc == {"count": 5, "variance": {"count": 4}}
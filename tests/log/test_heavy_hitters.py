@@ -0,0 +1,129 @@
+import random
+from libs.log_analysis.heavy_hitters import SpaceSaving, admit, error, merge, readmit, upper
+
+
+def _count(entries, summaries, entry_id, weight=1):
+    entry = entries.get(entry_id, None)
+    if entry is None:
+        entry = {"count": 0, "weight": 0}
+        admit(entries, summaries, entry_id, entry)
+    elif not all(entry_id in summary for summary in summaries):
+        readmit(entries, summaries, entry_id)
+    entry["count"] += 1
+    entry["weight"] += weight
+
+
+def _stream():
+    # 5 heavy entries among many rare ones
+    rng = random.Random(0)
+    stream = [f"heavy{i}" for i in range(5) for _ in range(200 - i * 20)]
+    stream += [f"rare{rng.randrange(2000)}" for _ in range(3000)]
+    rng.shuffle(stream)
+    return stream
+
+
+def test_space_saving():
+    stream = _stream()
+    entries, summary = {}, SpaceSaving(50)
+    for entry_id in stream:
+        _count(entries, [summary], entry_id)
+    assert len(entries) == 50
+    top = sorted(entries, key=lambda entry_id: upper(entries[entry_id], "count"), reverse=True)[:5]
+    assert sorted(top) == [f"heavy{i}" for i in range(5)]
+    # The true counts are within the error bounds
+    for entry_id, entry in entries.items():
+        assert entry["count"] <= stream.count(entry_id) <= upper(entry, "count")
+    assert error(entries["heavy0"], "count") < 200
+
+
+def test_space_saving_merge():
+    stream = _stream()
+    half = len(stream) // 2
+    entries, summary = {}, SpaceSaving(50)
+    other_entries, other_summary = {}, SpaceSaving(50)
+    for entry_id in stream[:half]:
+        _count(entries, [summary], entry_id)
+    for entry_id in stream[half:]:
+        _count(other_entries, [other_summary], entry_id)
+
+    def merge_entry(entry, other):
+        entry["count"] += other["count"]
+
+    merge(entries, [summary], other_entries, [other_summary], merge_entry)
+    assert len(entries) == 50
+    for entry_id, entry in entries.items():
+        assert entry["count"] <= stream.count(entry_id) <= upper(entry, "count")
+    top = sorted(entries, key=lambda entry_id: upper(entries[entry_id], "count"), reverse=True)[:5]
+    assert sorted(top) == [f"heavy{i}" for i in range(5)]
+    # Still counting after the merge
+    _count(entries, [summary], "new")
+    assert len(entries) == 50
+
+
+def test_space_saving_rankings():
+    # The rare entries are heavy by weight, the heavy entries by count
+    rng = random.Random(1)
+    stream = _stream()
+    weights = {entry_id: 1 for entry_id in stream}
+    heavy_weights = {f"rare{i}": 1000 for i in rng.sample(range(2000), 5)}
+    weights.update(heavy_weights)
+    stream += list(heavy_weights)
+    rng.shuffle(stream)
+    entries = {}
+    summaries = [SpaceSaving(50, "count"), SpaceSaving(50, "weight")]
+    for entry_id in stream:
+        _count(entries, summaries, entry_id, weights[entry_id])
+    # Only the entries tracked by a ranking are kept
+    assert set(entries) == summaries[0].members | summaries[1].members
+    assert len(summaries[1].members) == 50
+    assert sorted(summaries[0].top(entries, 5)) == [f"heavy{i}" for i in range(5)]
+    assert sorted(summaries[1].top(entries, 5)) == sorted(heavy_weights)
+    for entry_id, entry in entries.items():
+        assert entry["count"] <= stream.count(entry_id) <= upper(entry, "count")
+        assert entry["weight"] <= stream.count(entry_id) * weights[entry_id] <= upper(entry, "weight")
+
+
+def _check_bounds(entries, summaries, exact):
+    for key in ("count", "weight"):
+        for entry_id, entry in entries.items():
+            assert entry[key] <= exact[entry_id][key] <= upper(entry, key)
+    # Every untracked entry is at most as heavy as the lightest tracked one
+    for summary in summaries:
+        lightest = summary.lightest(entries)
+        for entry_id, weights in exact.items():
+            if entry_id not in entries:
+                assert weights[summary.key] <= lightest
+
+
+def test_space_saving_rankings_bounds():
+    def merge_entry(entry, other):
+        entry["count"] += other["count"]
+        entry["weight"] += other["weight"]
+
+    for seed in range(20):
+        rng = random.Random(seed)
+        # Skewed counts with weights unrelated to the counts, so the rankings evict different entries
+        stream = [(f"e{int(rng.paretovariate(1.2))}", rng.choice([1, 1, 1, 100])) for _ in range(2000)]
+        half = rng.randrange(len(stream))
+        exact = {}
+        parts = []
+        for part in (stream[:half], stream[half:], stream):
+            entries, summaries = {}, [SpaceSaving(8, "count"), SpaceSaving(8, "weight")]
+            for entry_id, weight in part:
+                _count(entries, summaries, entry_id, weight)
+            parts.append((entries, summaries))
+        for entry_id, weight in stream:
+            weights = exact.setdefault(entry_id, {"count": 0, "weight": 0})
+            weights["count"] += 1
+            weights["weight"] += weight
+        _check_bounds(*parts[2], exact)
+        entries, summaries = parts[0]
+        merge(entries, summaries, *parts[1], merge_entry)
+        _check_bounds(entries, summaries, exact)
+        # Still within the bounds when counting after the merge
+        for entry_id, weight in stream[:500]:
+            _count(entries, summaries, entry_id, weight)
+            weights = exact[entry_id]
+            weights["count"] += 1
+            weights["weight"] += weight
+        _check_bounds(entries, summaries, exact)
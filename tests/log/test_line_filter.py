@@ -0,0 +1,22 @@
+from libs.log_analysis.line_filter import LineFilter
+
+SLOW_QUERY = b'{"t":{"$date":"2025-09-25T23:41:05.344+02:00"},"s":"I",  "c":"COMMAND",  "id":51803,   "ctx":"conn26","msg":"Slow query","attr":{"command":{"lsid":{"id":{"$uuid":"eef6660c-6ef9-4492-a285-fab357f0b335"}}}}}\n'
+CONN_ACCEPTED = b'{"t":{"$date":"2025-09-25T23:39:51.199+02:00"},"s":"I",  "c":"NETWORK",  "id":22943,   "ctx":"listener","msg":"Connection accepted","attr":{"remote":"127.0.0.1:51011"}}\n'
+WARNING = b'{"t":{"$date":"2025-09-25T23:39:49.656+02:00"},"s":"W",  "c":"ASIO",     "id":22601,   "ctx":"thread1","msg":"No TransportLayer configured during NetworkInterface startup"}\n'
+
+
+def test_line_filter():
+    line_filter = LineFilter([51803], ["W", "E", "F"])
+    assert line_filter.accepts(SLOW_QUERY)
+    assert not line_filter.accepts(CONN_ACCEPTED)
+    assert line_filter.accepts(WARNING)
+    # Lines without a readable header are left to the JSON parser
+    assert line_filter.accepts(b"not a log line\n")
+
+    line_filter = LineFilter([22943], [])
+    assert not line_filter.accepts(SLOW_QUERY)
+    assert line_filter.accepts(CONN_ACCEPTED)
+    assert not line_filter.accepts(WARNING)
+
+    line_filter = LineFilter([], [], accept_all=True)
+    assert line_filter.accepts(CONN_ACCEPTED)
@@ -0,0 +1,88 @@
+import os
+from datetime import datetime
+from libs.log_analysis.log_index import IndexBuilder, LogIndex, decode_postings, encode_postings, file_key
+from libs.log_analysis.reader import merge_lines, read_offsets, read_window, time_window
+
+LINES = [
+    b'{"t":{"$date":"2025-09-25T23:41:00.000+02:00"},"s":"I","c":"NETWORK","id":22943,"ctx":"listener"}\n',
+    b'{"t":{"$date":"2025-09-25T23:41:30.000+02:00"},"s":"I","c":"COMMAND","id":51803,"ctx":"conn1"}\n',
+    b'{"t":{"$date":"2025-09-25T23:42:10.000+02:00"},"s":"W","c":"NETWORK","id":4615610,"ctx":"conn2"}\n',
+    b"not a log line\n",
+    b'{"t":{"$date":"2025-09-25T23:43:00.000+02:00"},"s":"I","c":"COMMAND","id":51803,"ctx":"conn1"}\n',
+    b'{"t":{"$date":"2025-09-25T23:44:00.000+02:00"},"s":"I","c":"NETWORK","id":22944,"ctx":"conn1"}\n',
+]
+OFFSETS = [sum(len(line) for line in LINES[:i]) for i in range(len(LINES))]
+
+
+def test_postings():
+    offsets = [0, 1, 127, 128, 300, 70000, 2**40]
+    data = encode_postings(offsets)
+    assert len(data) < 8 * len(offsets)
+    assert decode_postings(data) == offsets
+    assert decode_postings(encode_postings([])) == []
+
+
+def test_log_index(tmp_path):
+    log_file = tmp_path / "mongod.log"
+    log_file.write_bytes(b"".join(LINES))
+    index = LogIndex.build(str(log_file))
+    index.save(str(log_file))
+    assert os.path.isfile(LogIndex.index_path(str(log_file)))
+
+    index = LogIndex.load(str(log_file))
+    assert index is not None
+    # Lines of the wanted ids and severities, and the line without a header
+    assert index.offsets([51803], []) == [OFFSETS[1], OFFSETS[3], OFFSETS[4]]
+    assert index.offsets([22944], ["W"]) == [OFFSETS[2], OFFSETS[3], OFFSETS[5]]
+    assert index.offsets([], ["I"]) is None
+    # Minute offsets narrow down the time search
+    assert index.minute_bounds(datetime(2025, 9, 25, 21, 42, 30)) == (OFFSETS[2], OFFSETS[4])
+    assert index.minute_bounds(datetime(2025, 9, 25, 21, 50)) == (None, None)
+    since = datetime(2025, 9, 25, 21, 41, 15)
+    assert time_window(str(log_file), since, index=index) == time_window(str(log_file), since)
+
+    # The index is outdated when the file changes
+    log_file.write_bytes(b"".join(LINES[:3]))
+    assert LogIndex.load(str(log_file)) is None
+
+
+def test_index_builder(tmp_path):
+    log_file = tmp_path / "mongod.log"
+    log_file.write_bytes(b"".join(LINES))
+    built = LogIndex.build(str(log_file))
+    # Built from the lines the analysis reads
+    indexer = IndexBuilder(file_key(str(log_file)))
+    assert list(merge_lines([str(log_file)], indexers={str(log_file): indexer})) == LINES
+    assert indexer.complete
+    assert vars(indexer.index()) == vars(built)
+    # Or from the byte ranges of parallel jobs, merged in order
+    parts = [IndexBuilder(indexer.key, start) for start in (0, OFFSETS[2])]
+    list(parts[0].lines(read_window(str(log_file), start=0, end=OFFSETS[2])))
+    list(parts[1].lines(read_window(str(log_file), start=OFFSETS[2])))
+    parts[0].merge(parts[1])
+    assert parts[0].complete
+    assert vars(parts[0].index()) == vars(built)
+    # Lines are missing
+    partial = IndexBuilder(indexer.key)
+    list(partial.lines(read_window(str(log_file), end=OFFSETS[2])))
+    assert not partial.complete
+    rest = IndexBuilder(indexer.key, OFFSETS[3])
+    list(rest.lines(read_window(str(log_file), start=OFFSETS[3])))
+    partial.merge(rest)
+    assert not partial.complete
+
+    # The same minute of another time zone
+    indexer = IndexBuilder(indexer.key)
+    indexer.add(LINES[0])
+    indexer.add(LINES[1].replace(b"+02:00", b"Z"))
+    assert indexer.index().minute_bounds(datetime(2025, 9, 25, 23, 41)) == (OFFSETS[1], None)
+
+
+def test_read_offsets(tmp_path):
+    log_file = tmp_path / "mongod.log"
+    log_file.write_bytes(b"".join(LINES))
+    # The first and the last line are always read
+    assert list(read_offsets(str(log_file), [OFFSETS[1], OFFSETS[4]])) == [LINES[0], LINES[1], LINES[4], LINES[5]]
+    assert list(read_offsets(str(log_file), [OFFSETS[0], OFFSETS[5]])) == [LINES[0], LINES[5]]
+    assert list(read_offsets(str(log_file), [OFFSETS[1]], OFFSETS[1], OFFSETS[3])) == [LINES[1], LINES[2]]
+    assert list(read_offsets(str(log_file), [], OFFSETS[2], OFFSETS[3])) == [LINES[2]]
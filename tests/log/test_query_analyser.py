@@ -1,5 +1,5 @@
 from bson import json_util
-from libs.log_analysis.query_analyzer import analyze_query_pattern, query_to_pattern
+from libs.log_analysis.query_analyzer import analyze_query_pattern, query_to_pattern, shape_cache
 
 slow_insert = json_util.loads(
     '{"t": {"$date": "2025-09-24T13:14:17.239Z"}, "s": "I", "c": "COMMAND", "id": 51803, "ctx": "monitoring-keys-for-HMAC", "msg": "Slow query", "attr": {"type": "command", "ns": "admin.system.keys", "command": {"insert": "system.keys", "bypassDocumentValidation": false, "ordered": true, "documents": [{"purpose": "HMAC", "key": {"$binary": {"base64": "BV7WzBYMtJ+FoTcRK8LryAmIuBk=", "subType": "00"}}, "expiresAt": {"$timestamp": {"t": 1766495656, "i": 0}}, "_id": 7553643405352370178}], "writeConcern": {"w": "majority", "wtimeout": 60000}, "$db": "admin"}, "ninserted": 1, "keysInserted": 1, "numYields": 0, "reslen": 230, "locks": {"ParallelBatchWriterMode": {"acquireCount": {"r": 1}}, "FeatureCompatibilityVersion": {"acquireCount": {"r": 1, "w": 1}}, "ReplicationStateTransition": {"acquireCount": {"w": 1}, "acquireWaitCount": {"w": 1}, "timeAcquiringMicros": {"w": 1401}}, "Global": {"acquireCount": {"r": 1, "w": 1}}, "Database": {"acquireCount": {"w": 1}}, "Collection": {"acquireCount": {"w": 1}}, "Mutex": {"acquireCount": {"r": 2}}}, "flowControl": {"acquireCount": 1, "timeAcquiringMicros": 2}, "writeConcern": {"w": "majority", "wtimeout": 60000, "provenance": "clientSupplied"}, "storage": {"data": {"bytesRead": 473, "timeReadingMicros": 9}}, "protocol": "op_msg", "durationMillis": 778}}'
@@ -113,3 +113,29 @@ def test_query_to_shape_no_operator():
     query = {}
     shape = query_to_pattern(query)
     assert shape == {}
+
+
+def test_shape_cache():
+    shape_cache.clear()
+    # The same query hash with other commands
+    assert analyze_query_pattern(slow_delete)["type"] == "remove"
+    assert analyze_query_pattern(slow_update)["type"] == "update"
+    assert (shape_cache.hits, shape_cache.misses) == (0, 2)
+    assert analyze_query_pattern(slow_update)["type"] == "update"
+    assert (shape_cache.hits, shape_cache.misses) == (1, 2)
+
+    # Without a query hash, queries with the same structure share the pattern
+    expected = analyze_query_pattern(slow_getmore)
+    other = json_util.loads(json_util.dumps(slow_getmore).replace('"small", "medium", "large"', '"large"'))
+    assert analyze_query_pattern(other) is expected
+    other["attr"]["originatingCommand"]["filter"] = {"size": {"$nin": ["large"]}}
+    assert analyze_query_pattern(other)["pattern"] == {"size": {"$nin": 1}}
+    assert (shape_cache.hits, shape_cache.misses) == (2, 4)
+
+    # The server hashes another order of the fields, or an equality instead of a single `$in`, the same
+    query = json_util.loads(json_util.dumps(slow_update))
+    query["attr"]["command"]["q"] = {"a": 1, "b": 2}
+    reordered = json_util.loads(json_util.dumps(query))
+    reordered["attr"]["command"]["q"] = {"b": 2, "a": {"$in": [1]}}
+    for log_line in [query, reordered]:
+        assert analyze_query_pattern(log_line)["pattern"] == query_to_pattern(log_line["attr"]["command"]["q"])
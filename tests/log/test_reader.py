@@ -0,0 +1,190 @@
+import bz2
+import gzip
+import lzma
+import os
+from datetime import datetime
+from libs.log_analysis.reader import (
+    MappedLog,
+    detect_compression,
+    estimate_size,
+    filter_time,
+    follow_lines,
+    merge_lines,
+    read_lines,
+    read_timestamp,
+    resolve_log_files,
+    split_ranges,
+    time_window,
+)
+
+LINES = [f'{{"t":{{"$date":"2025-09-25T23:41:0{i}.000+02:00"}},"s":"I","id":{i}}}\n'.encode() for i in range(10)]
+
+
+def test_split_ranges(tmp_path):
+    log_file = tmp_path / "mongod.log"
+    log_file.write_bytes(b"".join(LINES))
+    size = log_file.stat().st_size
+
+    assert split_ranges(str(log_file), 1) == [(0, size)]
+    ranges = split_ranges(str(log_file), 3)
+    assert len(ranges) == 3
+    assert ranges[0][0] == 0 and ranges[-1][1] == size
+    for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+        assert end == start
+    # Every line is read exactly once
+    lines = [line for start, end in ranges for line in read_lines(str(log_file), start, end)]
+    assert lines == LINES
+    # More parts than lines
+    ranges = split_ranges(str(log_file), 100)
+    assert [line for start, end in ranges for line in read_lines(str(log_file), start, end)] == LINES
+
+
+def test_read_lines(tmp_path):
+    log_file = tmp_path / "mongod.log"
+    log_file.write_bytes(b"".join(LINES))
+    start = len(LINES[0])
+    end = start + len(LINES[1]) + 1
+    # Lines starting in the range are returned in full
+    assert list(read_lines(str(log_file), start, end)) == LINES[1:3]
+    assert list(read_lines(str(log_file))) == LINES
+
+
+def test_mapped_log(tmp_path):
+    log_file = tmp_path / "mongod.log"
+    log_file.write_bytes(b"".join(LINES) + b"no newline")
+    with MappedLog(str(log_file)) as log:
+        second = len(LINES[0])
+        assert log.line_start(0) == 0
+        assert log.line_start(second) == second
+        assert log.line_start(1) == second
+        assert log.line_start(log.size + 1) == log.size
+        assert log.line_end(0) == second
+        assert log.line(second) == LINES[1]
+        assert log.complete_end() == len(b"".join(LINES))
+        # Lines are slices of the mapping, not copies
+        lines = list(log.lines())
+        assert all(isinstance(line, memoryview) for line in lines)
+        assert lines == LINES + [b"no newline"]
+        assert list(log.lines(second, second + 1)) == [LINES[1]]
+    (tmp_path / "empty.log").write_bytes(b"")
+    with MappedLog(str(tmp_path / "empty.log")) as log:
+        assert log.size == 0 and list(log.lines()) == []
+
+
+def test_compressed_logs(tmp_path):
+    data = b"".join(LINES)
+    compressors = [("mongod.log.gz", gzip.compress), ("mongod.log.bz2", bz2.compress), ("mongod.log.xz", lzma.compress)]
+    for name, compress in compressors:
+        log_file = tmp_path / name
+        log_file.write_bytes(compress(data))
+        assert detect_compression(str(log_file)) is not None
+        # Only multi-member gzip files can be split
+        assert split_ranges(str(log_file), 3) == [(0, log_file.stat().st_size)]
+        assert list(read_lines(str(log_file))) == LINES
+        assert estimate_size(str(log_file)) == len(data)
+    assert detect_compression(str(tmp_path / "mongod.log.gz")) == "gzip"
+
+
+def test_split_gzip_members(tmp_path):
+    data = b"".join(LINES)
+    # Members don't end at line boundaries
+    log_file = tmp_path / "mongod.log.gz"
+    log_file.write_bytes(b"".join(gzip.compress(data[i : i + 50]) for i in range(0, len(data), 50)))
+    size = log_file.stat().st_size
+    for parts in [2, 3, 7, 100]:
+        ranges = split_ranges(str(log_file), parts)
+        assert 1 < len(ranges) <= parts
+        assert ranges[0][0] == 0 and ranges[-1][1] == size
+        lines = [line for start, end in ranges for line in read_lines(str(log_file), start, end)]
+        assert lines == LINES
+    # All the members are decompressed
+    assert estimate_size(str(log_file)) == len(data)
+
+
+def test_read_timestamp():
+    assert read_timestamp(LINES[3]) == datetime(2025, 9, 25, 21, 41, 3)
+    assert read_timestamp(b'{"t":{"$date":{"$numberLong":"1000"}},"s":"I"}') == datetime(1970, 1, 1, 0, 0, 1)
+    assert read_timestamp(b"not a log line") is None
+
+
+def test_resolve_log_files(tmp_path):
+    for name in ["mongod.log", "mongod.log.2025-09-25T23-00-00", ".hidden", "mongod.log.xray-index"]:
+        (tmp_path / name).write_bytes(LINES[0])
+    (tmp_path / "sub").mkdir()
+    expected = [str(tmp_path / "mongod.log"), str(tmp_path / "mongod.log.2025-09-25T23-00-00")]
+    assert resolve_log_files(str(tmp_path)) == expected
+    assert resolve_log_files(str(tmp_path / "mongod.log*")) == expected
+    assert resolve_log_files([str(tmp_path / "mongod.log"), str(tmp_path / "*")]) == expected
+    assert resolve_log_files(str(tmp_path / "missing*")) == []
+
+
+def test_merge_lines(tmp_path):
+    # Rotated files are merged in time order, whatever their names are
+    (tmp_path / "b.log").write_bytes(b"".join(LINES[:4]))
+    (tmp_path / "a.log.gz").write_bytes(gzip.compress(b"".join(LINES[4:])))
+    files = resolve_log_files(str(tmp_path))
+    assert list(merge_lines(files)) == LINES
+    # Interleaved files. A line without timestamp stays after the line before it.
+    (tmp_path / "a.log.gz").unlink()
+    (tmp_path / "b.log").write_bytes(b"".join(LINES[0::2]) + b"garbage\n")
+    (tmp_path / "c.log").write_bytes(b"".join(LINES[1::2]))
+    files = resolve_log_files(str(tmp_path))
+    assert list(merge_lines(files)) == LINES[:9] + [b"garbage\n", LINES[9]]
+
+
+def test_follow_lines(tmp_path):
+    log_file = tmp_path / "mongod.log"
+    log_file.write_bytes(b"".join(LINES[:3]) + LINES[3][:10])
+    lines = follow_lines(str(log_file), poll_interval=0)
+    assert [next(lines) for _ in range(4)] == LINES[:3] + [None]
+    # The partial line is completed, then the file is rotated
+    with open(log_file, "ab") as f:
+        f.write(LINES[3][10:] + LINES[4])
+    os.rename(log_file, tmp_path / "mongod.log.1")
+    assert [next(lines) for _ in range(3)] == LINES[3:5] + [None]
+    with open(tmp_path / "mongod.log.1", "ab") as f:
+        f.write(LINES[5])
+    log_file.write_bytes(b"".join(LINES[6:8]))
+    assert [next(lines) for _ in range(4)] == LINES[5:8] + [None]
+    # Truncated
+    log_file.write_bytes(LINES[8])
+    assert [next(lines) for _ in range(2)] == [LINES[8], None]
+    lines.close()
+
+
+def test_follow_lines_busy(tmp_path):
+    # The lines are appended faster than they are read, the log never pauses
+    log_file = tmp_path / "mongod.log"
+    log_file.write_bytes(LINES[0] * 2500)
+    lines = follow_lines(str(log_file), poll_interval=0)
+    assert [next(lines) for _ in range(2503)] == ([LINES[0]] * 1000 + [None]) * 2 + [LINES[0]] * 500 + [None]
+    lines.close()
+    # Not before the poll interval has passed
+    lines = follow_lines(str(log_file), poll_interval=60)
+    assert [next(lines) for _ in range(2501)] == [LINES[0]] * 2500 + [None]
+    lines.close()
+
+
+def test_time_window(tmp_path):
+    # LINES[i] is at 21:41:0i UTC
+    log_file = tmp_path / "mongod.log"
+    log_file.write_bytes(b"".join(LINES[:5]) + b"no timestamp\n" + b"".join(LINES[5:]))
+    offsets = [0]
+    for line in LINES[:5] + [b"no timestamp\n"] + LINES[5:]:
+        offsets.append(offsets[-1] + len(line))
+    since = datetime(2025, 9, 25, 21, 41, 3)
+    until = datetime(2025, 9, 25, 21, 41, 7, 500000)
+    assert time_window(str(log_file)) == (0, offsets[-1])
+    assert time_window(str(log_file), since, until) == (offsets[3], offsets[9])
+    # The line without timestamp goes with the next line
+    assert time_window(str(log_file), datetime(2025, 9, 25, 21, 41, 4, 500000)) == (offsets[5], offsets[-1])
+    assert time_window(str(log_file), until=datetime(2025, 9, 25, 21, 41)) == (0, 0)
+    assert time_window(str(log_file), datetime(2025, 9, 26)) == (offsets[-1], offsets[-1])
+    # Limited to a byte range
+    assert time_window(str(log_file), since, until, start=offsets[4], end=offsets[7]) == (offsets[4], offsets[7])
+    assert time_window(str(log_file), until=until, start=offsets[9]) == (offsets[9], offsets[9])
+    # Compressed files are filtered while reading
+    gz_file = tmp_path / "mongod.log.gz"
+    gz_file.write_bytes(gzip.compress(log_file.read_bytes()))
+    assert time_window(str(gz_file), since, until) == (0, gz_file.stat().st_size)
+    assert list(filter_time(read_lines(str(gz_file)), since, until)) == LINES[3:5] + [b"no timestamp\n"] + LINES[5:8]
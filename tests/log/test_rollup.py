@@ -0,0 +1,78 @@
+from libs.log_analysis.rollup import CHUNK_SIZE, PAGE_SIZE, Rollup
+
+# 2025-09-25T21:40:00Z
+START = 1758836400000
+
+
+def _connections():
+    # A connection created every 2.5 seconds for 25 minutes, the open connections as the gauge
+    rollup = Rollup(["created", "ended"], ["total"])
+    for i in range(600):
+        rollup.add(START + i * 2500, (1, 0), gauges=(i + 1,))
+    return rollup
+
+
+def test_rollup():
+    report = _connections().report()
+    assert list(report) == ["1", "10", "60", "600", "3600"]
+    assert len(report["1"]["time"]) == 600
+    minutes = report["60"]
+    assert minutes["time"][:2] == [START, START + 60000]
+    assert minutes["created"] == [24] * 25
+    assert minutes["lines"] == [24] * 25
+    # The latest number of connections of each minute
+    assert minutes["total"][:2] == [24, 48]
+    # 21:00 and 22:00
+    assert report["3600"]["created"] == [480, 120]
+    assert report["3600"]["total"] == [480, 600]
+    assert "variance" not in minutes
+    assert "chunks" not in report["1"]
+    # The finer resolutions with too many buckets are left out, but for the chunks that fit
+    assert list(_connections().report(max_points=100)) == ["1", "60", "600", "3600"]
+    assert list(_connections().report(max_points=0)) == ["3600"]
+
+
+def test_rollup_chunks():
+    # The seconds are reported in the chunks with the most lines that fit. The 25 minutes span 3 chunks of the
+    # seconds: 135 buckets before the first chunk boundary, 409 in the next chunk and 56 in the last one.
+    report = _connections().report(max_points=500)
+    seconds = report["1"]
+    boundary = (START // 1000 // CHUNK_SIZE + 1) * CHUNK_SIZE * 1000
+    assert seconds["chunks"] == [[boundary, boundary + 2 * CHUNK_SIZE * 1000]]
+    assert len(seconds["time"]) == 465
+    # The 136th connection, 337.5s after the start
+    assert boundary == START + 336000
+    assert seconds["time"][0] == START + 337000
+    assert seconds["total"][0] == 136
+    assert "chunks" not in report["10"]
+
+
+def test_rollup_sampled():
+    rollup = Rollup(["count", "total_slow_ms"])
+    rollup.add(START, (1, 10), probability=0.5)
+    rollup.add(START + 500, (1, 4), probability=0.5)
+    seconds = rollup.report()["1"]
+    assert seconds["count"] == [4]
+    assert seconds["total_slow_ms"] == [28]
+    assert seconds["variance"] == {"count": [4], "total_slow_ms": [232]}
+
+
+def test_rollup_merge():
+    rollup = _connections()
+    # Split in the middle of a page, and of a 10 seconds bucket
+    split = PAGE_SIZE + 3
+    first, second = Rollup(["created", "ended"], ["total"]), Rollup(["created", "ended"], ["total"])
+    for i in range(600):
+        part = first if i < split else second
+        part.add(START + i * 2500, (1, 0), gauges=(i + 1,))
+    first.merge(second)
+    assert first.report() == rollup.report()
+
+
+def test_rollup_state():
+    rollup = Rollup(["count", "total_slow_ms"])
+    for i in range(100):
+        rollup.add(START + i * 7000, (1, i), probability=0.5 if i % 2 else 1.0)
+    restored = Rollup(["count", "total_slow_ms"])
+    restored.set_state(rollup.get_state())
+    assert restored.report() == rollup.report()
@@ -0,0 +1,31 @@
+from libs.log_analysis.sampler import Sampler
+
+
+def _line(log_id, second, severity="I"):
+    minute, second = divmod(second, 60)
+    t = f"2025-09-25T23:{41 + minute:02d}:{second:02d}.000+02:00"
+    return f'{{"t":{{"$date":"{t}"}},"s":"{severity}","c":"NETWORK","id":{log_id},"ctx":"conn1"}}\n'.encode()
+
+
+def test_sampler():
+    lines = [_line(22943, i) for i in range(120)] + [_line(4615610, i, "W") for i in range(120)]
+    sampler = Sampler(0.1)
+    kept = [line for line in lines if sampler.keep(line)]
+    # Every minute keeps its share of the sampled lines. Rare lines are all kept.
+    assert len([line for line in kept[:-120] if b"23:41:" in line]) == 6
+    assert len([line for line in kept[:-120] if b"23:42:" in line]) == 6
+    assert kept[-120:] == lines[120:]
+    # The same lines are kept in every run
+    sampler = Sampler(0.1)
+    assert [line for line in lines if sampler.keep(line)] == kept
+    sampler = Sampler(0.1, seed=1)
+    assert [line for line in lines if sampler.keep(line)] != kept
+    # Only the configured log ids are sampled. Lines without a header are kept.
+    sampler = Sampler(0.1, sampled_ids=[51803])
+    assert all(sampler.keep(line) for line in lines + [b"not a log line\n"])
+
+
+def test_sampler_from_config():
+    assert Sampler.from_config({"sample_rate": 1.0}) is None
+    assert Sampler.from_config({}) is None
+    assert Sampler.from_config({"sample_rate": 0.5}).rate == 0.5
@@ -0,0 +1,40 @@
+import random
+from libs.log_analysis.sketch import SUB_BUCKETS, add_value, merge_sketch, new_sketch, quantile, summarize
+
+
+def test_quantiles():
+    values = list(range(1, 10001))
+    random.Random(0).shuffle(values)
+    sketch = new_sketch()
+    for value in values:
+        add_value(sketch, value)
+    assert sketch["count"] == 10000 and sketch["max"] == 10000
+    # Within the width of a bucket
+    for q in [0.5, 0.95, 0.99]:
+        assert abs(quantile(sketch, q) - q * 10000) <= q * 10000 / SUB_BUCKETS
+    assert quantile(sketch, 1.0) == 10000
+    # Bounded memory
+    assert len(sketch["buckets"]) <= 14 * SUB_BUCKETS
+    summary = summarize(sketch)
+    assert list(summary) == ["p50", "p95", "p99", "max"]
+    assert summary["max"] == 10000
+
+
+def test_small_values():
+    sketch = new_sketch()
+    assert quantile(sketch, 0.5) is None
+    for value in [0, 0, 1, 3, 7]:
+        add_value(sketch, value)
+    # Small integers are exact
+    assert summarize(sketch) == {"p50": 1, "p95": 7, "p99": 7, "max": 7}
+    assert quantile(sketch, 0.4) == 0
+    assert quantile(sketch, 0.8) == 3
+
+
+def test_merge_sketch():
+    sketch, other, expected = new_sketch(), new_sketch(), new_sketch()
+    for value in range(100):
+        add_value(sketch if value % 3 else other, value * 7)
+        add_value(expected, value * 7)
+    merge_sketch(sketch, other)
+    assert sketch == expected
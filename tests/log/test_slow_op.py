@@ -0,0 +1,34 @@
+from bson import json_util
+from libs.log_analysis import decoder
+from libs.log_analysis.query_analyzer import shape_cache
+from libs.log_analysis.slow_op import get_slow_op
+from tests.log.test_TopSlow import LOGS
+
+GETMORE = b'{"t":{"$date":"2025-09-25T23:41:05.347+02:00"},"s":"I","c":"COMMAND","id":51803,"ctx":"conn26","msg":"Slow query","attr":{"type":"command","ns":"Restaurant.pizzas","command":{"getMore":{"$numberLong":"4878020600984711450"},"collection":"pizzas"},"originatingCommand":{"find":"pizzas","filter":{"size":{"$in":["small","medium","large"]}}},"planSummary":"COLLSCAN","keysExamined":0,"docsExamined":1,"nreturned":1,"storage":{"data":{"bytesRead":{"$numberLong":"4096"}}},"durationMillis":10}}'
+
+
+def test_slow_op():
+    op = get_slow_op(LOGS[0])
+    assert op.ns == "Restaurant.pizzas"
+    assert (op.duration, op.keys_examined, op.docs_examined, op.n_returned) == (20, 0, 1, 1)
+    assert op.plan_summary == "COLLSCAN"
+    assert op.bytes_read == 0
+    assert op.query_hash == "904CC0B3"
+    assert op.query_pattern["type"] == "find"
+    # Commands without queryHash are identified by their query pattern
+    op = get_slow_op(LOGS[1])
+    assert op.query_hash == "7178B674"
+    assert op.query_pattern["type"] == "getmore"
+    assert get_slow_op(json_util.loads('{"id":22943,"msg":"Connection accepted"}')) is None
+
+
+def test_slow_op_cached():
+    log_line = decoder.loads(GETMORE)
+    op = get_slow_op(log_line)
+    assert get_slow_op(log_line) is op
+    assert op.bytes_read == 4096
+    # The hash of the query pattern comes with the pattern from the shape cache
+    query_hash = op.query_hash
+    hits = shape_cache.hits
+    assert get_slow_op(LOGS[1]).query_hash == query_hash
+    assert shape_cache.hits == hits + 1
@@ -89,10 +89,21 @@ def test_to_ejson():
 
 
 def test_json_hash():
-    from libs.utils import json_hash
+    import hashlib
+    from datetime import datetime
+    from enum import Enum
+    from libs.utils import json_hash, to_ejson
+    from libs.version import Version
+
+    class LogLevel(Enum):
+        WARNING = 2
 
     data = {"a": 1, "b": 2}
     hash1 = json_hash(data)
     assert hash1 == "EC55C9EC4B598E6F"
     hash2 = json_hash(data, digest_size=4)
     assert hash2 == "C5F6113B"
+    # The same values as hashing the `to_ejson` text
+    data = {"when": datetime(2025, 9, 25, 21, 41), "version": Version.parse("8.0.1"), "level": LogLevel.WARNING}
+    expected = hashlib.blake2b(to_ejson(data, indent=None).encode("utf-8"), digest_size=8).digest().hex().upper()
+    assert json_hash(data) == expected